@@ -0,0 +1,70 @@
+from functools import lru_cache
+
+from fpdf import FPDF
+
+# --- AJUSTE DE TEXTO EN COLUMNAS ---
+# Mide cada palabra una sola vez con las métricas de la fuente y reparte las
+# palabras en líneas en tiempo lineal. Los nombres de catálogo se repiten en
+# cientos de facturas, así que el resultado completo también se memoiza.
+# Los anchos se calculan con la misma aritmética que `FPDF.get_string_width`,
+# por lo que los cortes de línea son idénticos a los de antes.
+
+K_MM = 72 / 25.4  # Factor de escala de FPDF con unit='mm'
+
+# Fuentes TrueType Unicode: (familia, estilo) -> (anchos por código, ancho por defecto)
+_METRICAS_TTF = {}
+
+def registrar_fuente_ttf(familia, estilo, cw, ancho_faltante):
+    """Registra las métricas de una fuente TTF para medir palabras sin un FPDF"""
+    _METRICAS_TTF[(familia.lower(), estilo)] = (cw, ancho_faltante or 500)
+
+@lru_cache(maxsize=None)
+def metricas_fuente(familia, estilo):
+    """Tabla de anchos (milésimas de em) de una fuente estándar de FPDF"""
+    pdf = FPDF(unit='mm')
+    pdf.set_font(familia, estilo, 10)
+    return pdf.current_font['cw']
+
+@lru_cache(maxsize=65536)
+def ancho_palabra(palabra, familia, estilo):
+    """Ancho de una palabra en milésimas de em"""
+    ttf = _METRICAS_TTF.get((familia, estilo))
+    if ttf is not None:
+        cw, faltante = ttf
+        n = len(cw)
+        return sum(cw[o] if o < n else faltante for o in map(ord, palabra))
+    cw = metricas_fuente(familia, estilo)
+    return sum(cw.get(c, 0) for c in palabra)
+
+@lru_cache(maxsize=8192)
+def ajustar_texto(texto, familia, estilo, tamano, ancho, max_corte, k=K_MM):
+    """Divide `texto` en líneas que caben en `ancho` (unidades de usuario).
+
+    Devuelve una tupla de líneas; si no hay palabras, el texto recortado a
+    `max_corte` caracteres.
+    """
+    tamano_fuente = tamano / k
+    espacio = ancho_palabra(" ", familia, estilo)
+
+    lineas = []
+    actual = []
+    ancho_actual = 0
+
+    for palabra in texto.split():
+        w = ancho_palabra(palabra, familia, estilo)
+        prueba = ancho_actual + espacio + w if actual else w
+        if prueba * tamano_fuente / 1000.0 <= ancho:
+            actual.append(palabra)
+            ancho_actual = prueba
+        else:
+            if actual:
+                lineas.append(" ".join(actual))
+            actual = [palabra]
+            ancho_actual = w
+
+    if actual:
+        lineas.append(" ".join(actual))
+
+    if not lineas:
+        lineas = [texto[:max_corte] + "..." if len(texto) > max_corte else texto]
+    return tuple(lineas)
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from lineas import LineasFactura
+from totales import sumar_totales
+
+# --- ALMACÉN PERSISTENTE DE FACTURAS (SQLITE) ---
+# Encabezados y líneas en tablas separadas: las búsquedas solo leen encabezados
+# (con totales precalculados) y las líneas se cargan al abrir cada factura.
+# La tabla `huellas` recuerda de qué PDF salió cada factura importada: el hash
+# de los bytes del archivo y el del contenido normalizado (ver importador.py).
+
+RUTA_POR_DEFECTO = os.environ.get("FACTURAS_DB", "facturas.db")
+
+# Mayor carácter posible: todo texto que empieza con un prefijo queda antes de prefijo + este
+_FIN_PREFIJO = "\U0010ffff"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS facturas (
+    id          INTEGER PRIMARY KEY,
+    cliente     TEXT NOT NULL,
+    fecha_pago  TEXT,
+    campana     TEXT NOT NULL DEFAULT '',
+    lineas      INTEGER NOT NULL DEFAULT 0,
+    t_cat       INTEGER NOT NULL DEFAULT 0,
+    t_list      INTEGER NOT NULL DEFAULT 0,
+    gan         INTEGER NOT NULL DEFAULT 0,
+    creada      TEXT NOT NULL,
+    actualizada TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lineas (
+    factura_id  INTEGER NOT NULL REFERENCES facturas(id) ON DELETE CASCADE,
+    pos         INTEGER NOT NULL,
+    pag         TEXT NOT NULL DEFAULT '',
+    prod        TEXT NOT NULL DEFAULT '',
+    cant        INTEGER NOT NULL DEFAULT 1,
+    cat_u       INTEGER NOT NULL DEFAULT 0,
+    list_u      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (factura_id, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_facturas_cliente ON facturas (cliente COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_facturas_fecha ON facturas (fecha_pago);
+CREATE INDEX IF NOT EXISTS idx_facturas_campana ON facturas (campana, fecha_pago);
+CREATE TABLE IF NOT EXISTS huellas (
+    archivo     TEXT PRIMARY KEY,
+    contenido   TEXT NOT NULL,
+    factura_id  INTEGER NOT NULL REFERENCES facturas(id) ON DELETE CASCADE,
+    nombre      TEXT NOT NULL DEFAULT '',
+    registrada  TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_huellas_contenido ON huellas (contenido);
+CREATE INDEX IF NOT EXISTS idx_huellas_factura ON huellas (factura_id);
+"""
+
+def _fecha_iso(fecha):
+    if isinstance(fecha, (date, datetime)):
+        return fecha.strftime("%Y-%m-%d")
+    return fecha or None
+
+class AlmacenFacturas:
+    """Repositorio de facturas y líneas sobre un archivo SQLite compartible entre procesos"""
+
+    def __init__(self, ruta=RUTA_POR_DEFECTO):
+        self.ruta = ruta
+        # Una conexión por almacén, compartida entre los hilos de Streamlit bajo un lock
+        self._con = sqlite3.connect(ruta, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA foreign_keys=ON")
+            self._con.executescript(_ESQUEMA)
+
+    def guardar(self, facturas):
+        """Inserta o actualiza varias facturas en una sola transacción.
+
+        Cada factura es {"id" (opcional), "cliente", "fecha", "campana", "productos",
+        "huellas" (opcional)}. Devuelve los ids en el mismo orden.
+        """
+        ahora = datetime.now().isoformat(timespec="seconds")
+        ids = []
+        with self._lock, self._con:
+            for factura in facturas:
+                productos = LineasFactura.desde(factura.get("productos") or [])
+                totales = sumar_totales(productos)
+                valores = (
+                    factura["cliente"], _fecha_iso(factura.get("fecha")), factura.get("campana") or "",
+                    len(productos), totales["T_Cat"], totales["T_List"], totales["Gan"],
+                )
+                fid = factura.get("id")
+                if fid is not None and self._con.execute("SELECT 1 FROM facturas WHERE id = ?", (fid,)).fetchone():
+                    self._con.execute(
+                        "UPDATE facturas SET cliente = ?, fecha_pago = ?, campana = ?, lineas = ?, "
+                        "t_cat = ?, t_list = ?, gan = ?, actualizada = ? WHERE id = ?",
+                        valores + (ahora, fid),
+                    )
+                    self._con.execute("DELETE FROM lineas WHERE factura_id = ?", (fid,))
+                else:
+                    fid = self._con.execute(
+                        "INSERT INTO facturas (cliente, fecha_pago, campana, lineas, t_cat, t_list, gan, creada, actualizada) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        valores + (ahora, ahora),
+                    ).lastrowid
+                self._con.executemany(
+                    "INSERT INTO lineas (factura_id, pos, pag, prod, cant, cat_u, list_u) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (fid, pos) + fila
+                        for pos, fila in enumerate(zip(
+                            productos.pag, productos.prod,
+                            *(productos.columna(c).tolist() for c in ("Cant", "Cat_U", "List_U")),
+                        ))
+                    ),
+                )
+                self._registrar_huellas(fid, factura.get("huellas") or (), ahora)
+                ids.append(fid)
+        return ids
+
+    def _registrar_huellas(self, factura_id, huellas, ahora):
+        self._con.executemany(
+            "INSERT OR REPLACE INTO huellas (archivo, contenido, factura_id, nombre, registrada) VALUES (?, ?, ?, ?, ?)",
+            ((h["archivo"], h["contenido"], factura_id, h.get("nombre") or "", ahora) for h in huellas),
+        )
+
+    def registrar_huellas(self, factura_id, huellas):
+        """Asocia archivos ({"archivo", "contenido", "nombre"}) a una factura ya guardada"""
+        with self._lock, self._con:
+            self._registrar_huellas(factura_id, huellas, datetime.now().isoformat(timespec="seconds"))
+
+    def _factura_de_huella(self, columna, huella):
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT h.factura_id, h.nombre, f.cliente, f.fecha_pago FROM huellas h "
+                f"JOIN facturas f ON f.id = h.factura_id WHERE h.{columna} = ? LIMIT 1",
+                (huella,),
+            ).fetchone()
+        return dict(fila) if fila else None
+
+    def buscar_huella(self, huella):
+        """Factura importada de un archivo con exactamente esos bytes, o None"""
+        return self._factura_de_huella("archivo", huella)
+
+    def buscar_contenido(self, huella):
+        """Factura importada con el mismo cliente y líneas (aunque el PDF sea otro), o None"""
+        return self._factura_de_huella("contenido", huella)
+
+    def buscar(self, cliente="", campana="", desde=None, hasta=None, limite=200):
+        """Encabezados de facturas (sin líneas), los más recientes primero"""
+        condiciones, parametros = [], []
+        if cliente:
+            # Prefijo como rango NOCASE (no LIKE): usa idx_facturas_cliente y trata % y _ como texto
+            condiciones.append("cliente >= ? COLLATE NOCASE AND cliente < ? COLLATE NOCASE")
+            parametros += [cliente, cliente + _FIN_PREFIJO]
+        if campana:
+            condiciones.append("campana = ?")
+            parametros.append(campana)
+        if desde:
+            condiciones.append("fecha_pago >= ?")
+            parametros.append(_fecha_iso(desde))
+        if hasta:
+            condiciones.append("fecha_pago <= ?")
+            parametros.append(_fecha_iso(hasta))
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        consulta = (
+            "SELECT id, cliente, fecha_pago, campana, lineas, t_cat, t_list, gan, actualizada "
+            f"FROM facturas {where} ORDER BY fecha_pago DESC, id DESC LIMIT ?"
+        )
+        with self._lock:
+            return [dict(f) for f in self._con.execute(consulta, parametros + [limite])]
+
+    def campanas(self):
+        with self._lock:
+            return [f[0] for f in self._con.execute("SELECT DISTINCT campana FROM facturas WHERE campana != '' ORDER BY campana")]
+
+    def cargar_lineas(self, factura_id):
+        """Líneas de una factura como `LineasFactura` (el formato de `st.session_state.datos`)"""
+        with self._lock:
+            filas = self._con.execute(
+                "SELECT pag, prod, cant, cat_u, list_u FROM lineas WHERE factura_id = ? ORDER BY pos", (factura_id,)
+            ).fetchall()
+        return LineasFactura.desde_columnas(*zip(*filas)) if filas else LineasFactura()
+
+    def cargar(self, factura_id):
+        with self._lock:
+            encabezado = self._con.execute(
+                "SELECT id, cliente, fecha_pago, campana FROM facturas WHERE id = ?", (factura_id,)
+            ).fetchone()
+        if encabezado is None:
+            return None
+        factura = dict(encabezado)
+        factura["productos"] = self.cargar_lineas(factura_id)
+        return factura
+
+    def eliminar(self, factura_id):
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM facturas WHERE id = ?", (factura_id,))
+
+    def cerrar(self):
+        with self._lock:
+            self._con.close()
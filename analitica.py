@@ -0,0 +1,73 @@
+import numpy as np
+
+from lineas import LineasFactura
+from totales import totales_columnas
+
+# --- ANALÍTICA DE LA CAMPAÑA ---
+# Todas las facturas (las abiertas en la sesión o un lote de PDFs importados)
+# se juntan en una sola tabla columnar, una fila por línea válida, y se agrupan
+# por producto, página o cliente con un único groupby por agrupación.
+#
+# factura = {"cliente": str, "productos": LineasFactura | [filas]}
+
+# Agrupaciones que ofrece la vista: nombre -> columna de la tabla
+AGRUPACIONES = {"Producto": "Prod", "Página": "Pag", "Cliente": "Cliente"}
+
+COLUMNAS_TABLA = ["Cliente", "Pag", "Prod", "Cant", "Cat_U", "List_U", "T_Cat", "T_List", "Gan"]
+
+def huella_facturas(facturas):
+    """Identifica el contenido de las facturas sin recorrer sus líneas (usa la revisión de cada una)"""
+    return tuple((f["cliente"], f["productos"].revision) for f in facturas)
+
+def tabla_campana(facturas):
+    """DataFrame con una fila por línea válida de todas las facturas y sus totales por fila"""
+    import pandas as pd
+
+    codigos, clientes, largos, pag, prod = {}, [], [], [], []
+    enteros = {"Cant": [], "Cat_U": [], "List_U": []}
+    for factura in facturas:
+        lineas = LineasFactura.desde(factura["productos"])
+        # Un código por cliente: la columna Cliente es categórica, sin repetir el texto
+        clientes.append(codigos.setdefault(factura["cliente"], len(codigos)))
+        largos.append(len(lineas))
+        pag.extend(lineas.pag)
+        prod.extend(lineas.prod)
+        for campo, partes in enteros.items():
+            partes.append(lineas.columna(campo))
+
+    # Columnas de todas las facturas juntas; las líneas sin producto se filtran de una vez
+    validas = np.fromiter((p.strip() != "" for p in prod), dtype=bool, count=len(prod))
+    columnas = {
+        campo: np.concatenate(partes)[validas] if partes else np.zeros(0, dtype=np.int64)
+        for campo, partes in enteros.items()
+    }
+    t_cat, t_list, gan = totales_columnas(columnas["Cant"], columnas["Cat_U"], columnas["List_U"])
+    return pd.DataFrame({
+        "Cliente": pd.Categorical.from_codes(
+            np.repeat(np.array(clientes, dtype=np.int64), largos)[validas], categories=list(codigos)),
+        "Pag": pd.Categorical(pd.Series(pag, dtype=object)[validas]),
+        "Prod": pd.Categorical(pd.Series(prod, dtype=object)[validas]),
+        **columnas, "T_Cat": t_cat, "T_List": t_list, "Gan": gan,
+    }, columns=COLUMNAS_TABLA)
+
+def agrupar(tabla, por):
+    """Totales por `por` (columna de la tabla) ordenados por ganancia, con el margen sobre catálogo"""
+    grupos = tabla.groupby(por, observed=True, sort=False).agg(
+        **{"Líneas": ("Cant", "size")}, Cant=("Cant", "sum"),
+        T_Cat=("T_Cat", "sum"), T_List=("T_List", "sum"), Gan=("Gan", "sum"),
+    )
+    grupos["Margen %"] = (grupos["Gan"] / grupos["T_Cat"].where(grupos["T_Cat"] != 0) * 100).round(1)
+    return grupos.sort_values("Gan", ascending=False).reset_index()
+
+def resumen_campana(tabla):
+    """Totales de toda la campaña"""
+    t_cat, t_list = int(tabla["T_Cat"].sum()), int(tabla["T_List"].sum())
+    return {
+        "Clientes": int(tabla["Cliente"].nunique()), "Líneas": len(tabla),
+        "T_Cat": t_cat, "T_List": t_list, "Gan": t_cat - t_list,
+        "Margen %": round((t_cat - t_list) / t_cat * 100, 1) if t_cat else 0.0,
+    }
+
+def a_csv(tabla):
+    """CSV (UTF-8 con BOM, para que Excel respete las tildes)"""
+    return tabla.to_csv(index=False).encode("utf-8-sig")
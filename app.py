@@ -1,15 +1,41 @@
 import streamlit as st
-import pandas as pd
-from fpdf import FPDF
 from datetime import date
+import atexit
+import bisect
+import copy
+import hashlib
 import os
-import tempfile
-import re
-from pypdf import PdfReader
+from importlib.machinery import ModuleSpec
+import time
+import perfil
+from almacen import AlmacenFacturas
+from analitica import AGRUPACIONES, a_csv, agrupar, huella_facturas, resumen_campana, tabla_campana
+from cache_pdf import CacheRender, clave_render
+from lineas import FILA_VACIA, LineasFactura, filas_validas
+from totales import AcumuladoTotales, calcular_totales, fmt, totales_por_fila
+from trabajos import ERROR, PENDIENTE, ColaTrabajos
+
+# pandas, fpdf y pypdf no se importan aquí: Streamlit vuelve a ejecutar este
+# script en cada interacción y el primer pintado no los necesita. Cada función
+# que los usa (tabla, exportar, importar, renderizar) los importa al llamarse.
+
+# Los pools de procesos de la app no usan fork, y sin fork cada proceso nuevo vuelve
+# a ejecutar el script `__main__`. Streamlit carga este archivo como `__main__`: se
+# declara módulo para que los procesos no repitan la página entera
+__spec__ = ModuleSpec("__main__", None)
 
 # Configuración inicial de la página
 st.set_page_config(page_title="Facturación Pro", layout="wide")
 
+# Con FACTURAS_DEBUG=1 los totales incrementales se comparan con un cálculo completo
+MODO_DEPURACION = os.environ.get("FACTURAS_DEBUG") == "1"
+
+# Panel de tiempos por tramo y perfilador (con FACTURAS_DEBUG=1 o FACTURAS_PERFIL=1)
+PANEL_PERFIL = MODO_DEPURACION or os.environ.get("FACTURAS_PERFIL") == "1"
+
+# Catálogo de la campaña que se usa si no se sube uno desde la barra lateral
+RUTA_CATALOGO = os.environ.get("FACTURAS_CATALOGO")
+
 # --- CONFIGURACIÓN DEL TEMA ---
 if 'tema_oscuro' not in st.session_state:
     st.session_state.tema_oscuro = False
@@ -48,75 +74,639 @@ def aplicar_tema():
 aplicar_tema()
 
 # --- FUNCIONES DE APOYO ---
-def fmt(valor):
-    try:
-        return f"{int(valor):,}".replace(",", ".")
-    except:
-        return "0"
-
-def agregar_imagen_segura(pdf, uploaded_file, x, y, w):
-    if uploaded_file is not None:
-        try:
-            suffix = os.path.splitext(uploaded_file.name)[1]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp.write(uploaded_file.getvalue())
-                tmp_path = tmp.name
-            pdf.image(tmp_path, x=x, y=y, w=w)
-            os.unlink(tmp_path)
-        except:
-            pass
-
-def limpiar_texto_para_pdf(texto):
-    """Reemplaza caracteres problemáticos para PDF"""
-    if not isinstance(texto, str):
-        texto = str(texto)
-    reemplazos = {
-        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-        'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
-        'ñ': 'n', 'Ñ': 'N',
-        '´': "'", '`': "'",
-        '&': 'y'
-    }
-    for char, replacement in reemplazos.items():
-        texto = texto.replace(char, replacement)
-    return texto
-
-def importar_datos_pdf(file):
-    try:
-        reader = PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        
-        cliente_match = re.search(r"CLIENTE:\s*(.*)\s*\|", text)
-        cliente = cliente_match.group(1).strip() if cliente_match else "Cliente Importado"
-        
-        patron = r"(\d+)\s+(.*?)\s+(\d+)\s+\$([\d\.]+)\s+\$([\d\.]+)\s+\$([\d\.]+)\s+\$([\d\.]+)\s+\$([\d\.]+)"
-        matches = re.findall(patron, text)
-        
-        productos = []
-        for m in matches:
-            productos.append({
-                "Pag": m[0], 
-                "Prod": m[1].strip(), 
-                "Cant": int(m[2]),
-                "Cat_U": int(m[3].replace('.', '')), 
-                "List_U": int(m[5].replace('.', ''))
-            })
-        return {"cliente": cliente, "productos": productos if productos else None}
-    except Exception as e:
-        st.error(f"Error al leer el PDF: {e}")
-        return None
+@st.cache_resource
+def obtener_almacen():
+    """Almacén SQLite compartido por todas las sesiones del proceso"""
+    return AlmacenFacturas()
+
+@st.cache_resource
+def obtener_cache_render():
+    """PDFs ya generados, compartidos entre sesiones (misma factura = mismo PDF)"""
+    return CacheRender()
+
+@st.cache_resource(max_entries=4)
+def obtener_catalogo(huella, nombre, _leer):
+    """Índice del catálogo compartido por las sesiones; se rehace solo si cambia el archivo"""
+    from catalogo import IndiceCatalogo
+
+    return IndiceCatalogo.desde_archivo(_leer(), nombre)
+
+def catalogo_activo(subido):
+    """Índice del catálogo subido o, si no hay, del de FACTURAS_CATALOGO (None si no hay ninguno)"""
+    if subido is not None:
+        datos = subido.getvalue()
+        return obtener_catalogo(hashlib.sha1(datos).hexdigest(), subido.name, lambda: datos)
+    if RUTA_CATALOGO and os.path.exists(RUTA_CATALOGO):
+        info = os.stat(RUTA_CATALOGO)
+        huella = f"{RUTA_CATALOGO}:{info.st_mtime_ns}:{info.st_size}"
+        return obtener_catalogo(huella, RUTA_CATALOGO, lambda: open(RUTA_CATALOGO, "rb").read())
+    return None
+
+@st.cache_resource(on_release=ColaTrabajos.cerrar)
+def obtener_cola_trabajos():
+    """Pool de procesos que genera los PDFs sin bloquear el hilo de ninguna sesión"""
+    cola = ColaTrabajos(obtener_cache_render())
+    # Al cerrar la app se cancela lo pendiente y se espera a los procesos
+    atexit.register(cola.cerrar)
+    return cola
 
 # --- INICIALIZACIÓN DEL ESTADO DE SESIÓN ---
 if 'facturas' not in st.session_state:
     st.session_state.facturas = [{"id": 0, "name": "Nueva Factura"}]
 if 'datos' not in st.session_state:
     st.session_state.datos = {}
-if 'delete_row' not in st.session_state:
-    st.session_state.delete_row = None
 if 'next_factura_id' not in st.session_state:
     st.session_state.next_factura_id = 1
+if 'pagina_editor' not in st.session_state:
+    st.session_state.pagina_editor = {}
+if 'base_editor' not in st.session_state:
+    st.session_state.base_editor = {}
+if 'acumulados' not in st.session_state:
+    st.session_state.acumulados = {}
+if 'reporte_importacion' not in st.session_state:
+    st.session_state.reporte_importacion = None
+if 'trabajos_pdf' not in st.session_state:
+    st.session_state.trabajos_pdf = {}
+if 'claves_render' not in st.session_state:
+    st.session_state.claves_render = {}
+if 'lote_pdf' not in st.session_state:
+    st.session_state.lote_pdf = []
+if 'analitica' not in st.session_state:
+    st.session_state.analitica = {}
+if 'perfil' not in st.session_state:
+    st.session_state.perfil = perfil.RegistroTramos()
+
+# Los tramos medidos en este hilo cuentan también para la sesión
+perfil.usar_registro(st.session_state.perfil)
+inicio_rerun = time.perf_counter()
+if 'perfilar' in st.session_state and 'perfil_en_curso' not in st.session_state:
+    # Perfil de esta interacción completa (sigue si un st.rerun() corta el script)
+    st.session_state.perfil_en_curso = perfil.iniciar_perfil(st.session_state.pop('perfilar'))
+
+def agregar_factura(nombre, productos, **extra):
+    """Abre una factura nueva (importada o guardada) y la deja como activa"""
+    nid = st.session_state.next_factura_id
+    st.session_state.facturas.append({"id": nid, "name": nombre, **extra})
+    st.session_state.datos[f"f_{nid}"] = LineasFactura.desde(productos)
+    st.session_state.next_factura_id += 1
+    st.session_state.factura_activa = nid
+
+def abrir_importada(res):
+    """Abre un PDF importado sin duplicar pestañas; devuelve el aviso de duplicado ("" si es una factura nueva)"""
+    abiertas = st.session_state.facturas
+    duplicado = res["duplicado"]
+    if duplicado and duplicado["tipo"] == "archivo":
+        # Archivo ya visto: no se leyó, se reutiliza la pestaña o la factura guardada
+        if "pestana" in duplicado:
+            st.session_state.factura_activa = duplicado["pestana"]
+            return "Ya abierta"
+        if "factura_id" not in duplicado:
+            return f"Repetido de {duplicado['archivo']}"
+        pestana = next((f["id"] for f in abiertas if f.get("db_id") == duplicado["factura_id"]), None)
+        if pestana is not None:
+            st.session_state.factura_activa = pestana
+            return "Ya abierta"
+        guardada = obtener_almacen().cargar(duplicado["factura_id"])
+        if guardada is None:
+            return "Ya importada"
+        agregar_factura(
+            guardada["cliente"], guardada["productos"] or [FILA_VACIA],
+            fecha=date.fromisoformat(guardada["fecha_pago"]) if guardada["fecha_pago"] else date.today(),
+            db_id=guardada["id"],
+        )
+        return "Abierta desde facturas guardadas"
+    if res["error"]:
+        return ""
+    # Mismo cliente y líneas que otro PDF (p. ej. regenerado): se reutiliza la pestaña si está abierta
+    huella = {"archivo": res["huella"], "contenido": res["huella_contenido"], "nombre": res["archivo"]}
+    similar = obtener_almacen().buscar_contenido(res["huella_contenido"])
+    pestana = next((
+        f for f in abiertas
+        if f.get("huella", {}).get("contenido") == res["huella_contenido"]
+        or (similar and f.get("db_id") == similar["factura_id"])
+    ), None)
+    if pestana is not None:
+        # El archivo queda asociado a esa factura: no se guarda como otra ni se cuenta dos veces
+        if pestana.get("db_id") is not None:
+            obtener_almacen().registrar_huellas(pestana["db_id"], [huella])
+        else:
+            pestana.setdefault("otras_huellas", []).append(huella)
+        st.session_state.factura_activa = pestana["id"]
+        return "Mismo cliente y líneas que una pestaña abierta"
+    if similar:
+        # Misma factura en otro PDF: se abre como la guardada y el archivo queda reconocido
+        obtener_almacen().registrar_huellas(similar["factura_id"], [huella])
+        agregar_factura(res["cliente"], res["productos"], fecha=res["fecha"] or date.today(),
+                        huella=huella, db_id=similar["factura_id"])
+        return f"Misma factura que una guardada de {similar['cliente']}"
+    agregar_factura(res["cliente"], res["productos"], fecha=res["fecha"] or date.today(), huella=huella)
+    return ""
+
+def huellas_pestana(factura):
+    """Archivos de los que salió la factura de una pestaña (el importado y los repetidos de contenido)"""
+    return ([factura["huella"]] if factura.get("huella") else []) + factura.get("otras_huellas", [])
+
+def guardar_importadas():
+    """Guarda enseguida las pestañas importadas que aún no están en el almacén.
+
+    Así las huellas de sus PDFs quedan registradas al importar: el mismo archivo
+    se reconoce después aunque no se pulse "Guardar", y también desde otras sesiones.
+    """
+    nuevas = [f for f in st.session_state.facturas if f.get("huella") and f.get("db_id") is None]
+    if not nuevas:
+        return
+    ids = obtener_almacen().guardar([
+        {
+            "cliente": f["name"],
+            "fecha": f.get("fecha", date.today()),
+            "campana": st.session_state.get("campana", ""),
+            "productos": filas_validas(st.session_state.datos.get(f"f_{f['id']}", [])),
+            "huellas": huellas_pestana(f),
+        }
+        for f in nuevas
+    ])
+    for f, db_id in zip(nuevas, ids):
+        f["db_id"] = db_id
+        f.pop("otras_huellas", None)
+
+# --- EDITOR DE PRODUCTOS ---
+# Solo se construyen los widgets de la página visible (modo "Filas") o una única
+# grilla `st.data_editor` (modo "Tabla"). Los totales de cada factura se llevan
+# por diferencias (`AcumuladoTotales`): editar una celda no vuelve a sumar todo.
+# Las líneas de cada factura viven en columnas (`LineasFactura`), no en dicts.
+
+CAMPOS_FILA = {"Pag": "pag", "Prod": "prod", "Cant": "cant", "Cat_U": "cat_u", "List_U": "list_u"}
+
+def lineas_factura(key_f):
+    """Líneas de la factura como columnas (convierte una lista de dicts la primera vez)"""
+    lineas = st.session_state.datos.get(key_f)
+    if not isinstance(lineas, LineasFactura):
+        lineas = LineasFactura(lineas or [FILA_VACIA])
+        st.session_state.datos[key_f] = lineas
+    return lineas
+
+def acumulado(key_f):
+    """Totales incrementales de la factura; el cálculo completo se hace una sola vez"""
+    acum = st.session_state.acumulados.get(key_f)
+    if acum is None:
+        acum = AcumuladoTotales.desde_filas(st.session_state.datos.get(key_f, []))
+        st.session_state.acumulados[key_f] = acum
+    return acum
+
+def olvidar_widgets_filas(fid, idx, desde, hasta):
+    """Descarta el estado de los widgets de esas filas para que se vuelvan a leer de los datos"""
+    for i in range(desde, hasta):
+        for prefijo in CAMPOS_FILA.values():
+            st.session_state.pop(f"{prefijo}_{fid}_{idx}_{i}", None)
+
+def agregar_fila(key_f, fid, idx, fila=FILA_VACIA):
+    lineas = lineas_factura(key_f)
+    lineas.agregar(fila)
+    acumulado(key_f).sumar(fila)
+    olvidar_widgets_filas(fid, idx, len(lineas) - 1, len(lineas))
+    # Ir a la última página para ver la fila nueva
+    st.session_state.pagina_editor[key_f] = len(lineas)
+
+def borrar_fila(key_f, fid, idx, i, hasta):
+    lineas = lineas_factura(key_f)
+    if i < len(lineas):
+        acumulado(key_f).restar(lineas.borrar(i))
+        if not len(lineas):
+            lineas.agregar(FILA_VACIA)
+            acumulado(key_f).sumar(FILA_VACIA)
+    # Las filas siguientes cambian de posición: sus widgets se rehacen desde los datos
+    olvidar_widgets_filas(fid, idx, i, hasta)
+
+def agregar_de_catalogo(key_f, fid, idx, producto):
+    lineas = lineas_factura(key_f)
+    ultima = lineas.fila(-1)
+    if not ultima["Prod"].strip() and not ultima["Cat_U"] and not ultima["List_U"]:
+        # La fila vacía del final se reemplaza en lugar de quedar sobrando
+        acumulado(key_f).restar(lineas.borrar(len(lineas) - 1))
+    fila = dict(FILA_VACIA, **{c: producto[c] for c in ("Pag", "Prod", "Cat_U", "List_U")})
+    agregar_fila(key_f, fid, idx, fila)
+    st.session_state.pop(f"busca_cat_{fid}_{idx}", None)
+
+def completar_desde_catalogo(key_f, fid, idx, i, catalogo):
+    """Si el producto escrito (nombre o código) está en el catálogo, completa nombre, página y precios"""
+    lineas = lineas_factura(key_f)
+    if catalogo is None or i >= len(lineas):
+        return
+    pag = st.session_state.get(f"pag_{fid}_{idx}_{i}", lineas.pag[i])
+    producto = catalogo.producto(pag, st.session_state.get(f"prod_{fid}_{idx}_{i}", ""))
+    if producto is None:
+        return
+    campos = ["Prod", "Cat_U", "List_U"] + ([] if str(pag).strip() else ["Pag"])
+    for campo in campos:
+        acumulado(key_f).cambiar(lineas, i, campo, producto[campo])
+        # El widget se rehace con el valor del catálogo
+        st.session_state.pop(f"{CAMPOS_FILA[campo]}_{fid}_{idx}_{i}", None)
+
+def limpiar_filas(key_f, fid, idx):
+    olvidar_widgets_filas(fid, idx, 0, len(lineas_factura(key_f)))
+    st.session_state.datos[key_f] = LineasFactura([FILA_VACIA])
+    st.session_state.acumulados[key_f] = AcumuladoTotales.desde_filas(st.session_state.datos[key_f])
+    st.session_state.pagina_editor[key_f] = 0
+
+def cambiar_pagina(key_f, delta):
+    st.session_state.pagina_editor[key_f] = st.session_state.pagina_editor.get(key_f, 0) + delta
+
+def pintar_celdas_calculadas(celdas_calc, t_cat, t_list, gan):
+    for (celda_tc, celda_tl, celda_gan), tc, tl, gan in zip(celdas_calc, t_cat.tolist(), t_list.tolist(), gan.tolist()):
+        celda_tc.markdown(f"<div style='text-align: right;'><strong>${fmt(tc)}</strong></div>", unsafe_allow_html=True)
+        celda_tl.markdown(f"<div style='text-align: right;'><strong>${fmt(tl)}</strong></div>", unsafe_allow_html=True)
+        color_gan = "#2e7d32" if gan >= 0 else "#d32f2f"
+        celda_gan.markdown(f"<div style='text-align: right; color:{color_gan};'><strong>${fmt(gan)}</strong></div>", unsafe_allow_html=True)
+
+def editor_filas_paginado(key_f, fid, idx, filas_por_pagina, catalogo=None):
+    """Dibuja solo la página visible de filas y devuelve los totales de la factura completa"""
+    filas = lineas_factura(key_f)
+    n_paginas = max(1, -(-len(filas) // filas_por_pagina))
+    pagina = min(max(st.session_state.pagina_editor.get(key_f, 0), 0), n_paginas - 1)
+    st.session_state.pagina_editor[key_f] = pagina
+    inicio = pagina * filas_por_pagina
+    fin = min(inicio + filas_por_pagina, len(filas))
+    
+    # Celdas calculadas: se llenan después con el motor de totales
+    celdas_calc = []
+    
+    st.markdown("<small style='color:gray;'>Pág | Producto | Cant | Precio Catálogo | Total Catálogo | Precio Lista | Total Lista | Ganancia (Cat-List) | </small>", unsafe_allow_html=True)
+    
+    acum = acumulado(key_f)
+    for i in range(inicio, fin):
+        fila = filas.fila(i)
+        valores = {}
+        cols = st.columns([0.5, 2.5, 0.6, 1.2, 1.2, 1.2, 1.2, 1.2, 0.4])
+        
+        with cols[0]:
+            valores['Pag'] = st.text_input(
+                "P", 
+                value=fila.get('Pag', ''),
+                key=f"pag_{fid}_{idx}_{i}",
+                label_visibility="collapsed"
+            )
+        
+        with cols[1]:
+            valores['Prod'] = st.text_input(
+                "Pr", 
+                value=fila.get('Prod', ''),
+                key=f"prod_{fid}_{idx}_{i}",
+                label_visibility="collapsed",
+                on_change=completar_desde_catalogo, args=(key_f, fid, idx, i, catalogo),
+            )
+        
+        with cols[2]:
+            valores['Cant'] = st.number_input(
+                "C", 
+                value=int(fila.get('Cant', 1)),
+                min_value=1,
+                key=f"cant_{fid}_{idx}_{i}",
+                label_visibility="collapsed"
+            )
+        
+        with cols[3]:
+            valores['Cat_U'] = st.number_input(
+                "PC", 
+                value=int(fila.get('Cat_U', 0)),
+                min_value=0,
+                key=f"cat_u_{fid}_{idx}_{i}",
+                label_visibility="collapsed"
+            )
+        
+        with cols[4]:
+            celda_tc = st.empty()
+        
+        with cols[5]:
+            valores['List_U'] = st.number_input(
+                "PL", 
+                value=int(fila.get('List_U', 0)),
+                min_value=0,
+                key=f"list_u_{fid}_{idx}_{i}",
+                label_visibility="collapsed"
+            )
+        
+        with cols[6]:
+            celda_tl = st.empty()
+        
+        with cols[7]:
+            celda_gan = st.empty()
+        
+        with cols[8]:
+            st.button("🗑️", key=f"del_{fid}_{idx}_{i}", type="secondary",
+                      on_click=borrar_fila, args=(key_f, fid, idx, i, fin))
+        
+        # Solo las celdas que cambiaron ajustan los totales de la factura
+        for campo, valor in valores.items():
+            if fila.get(campo) != valor:
+                acum.cambiar(filas, i, campo, valor)
+        
+        celdas_calc.append((celda_tc, celda_tl, celda_gan))
+    
+    # Las celdas calculadas salen solo de las filas visibles
+    pintar_celdas_calculadas(celdas_calc, *totales_por_fila(filas[inicio:fin]))
+    
+    if n_paginas > 1:
+        p1, p2, p3 = st.columns([1, 4, 1])
+        with p1:
+            st.button("◀ Anterior", key=f"prev_{fid}_{idx}", on_click=cambiar_pagina, args=(key_f, -1),
+                      disabled=pagina == 0, use_container_width=True)
+        with p2:
+            st.caption(f"Filas {inicio + 1}–{fin} de {len(filas)} · Página {pagina + 1} de {n_paginas}")
+        with p3:
+            st.button("Siguiente ▶", key=f"next_{fid}_{idx}", on_click=cambiar_pagina, args=(key_f, 1),
+                      disabled=pagina >= n_paginas - 1, use_container_width=True)
+    
+    return acum.totales()
+
+def _texto_celda(valor):
+    import pandas as pd
+
+    return "" if valor is None or pd.isna(valor) else str(valor).strip()
+
+def _entero_celda(valor, defecto):
+    import pandas as pd
+
+    return defecto if valor is None or pd.isna(valor) else int(valor)
+
+def _valor_celda(campo, valor):
+    return _texto_celda(valor) if campo in ("Pag", "Prod") else _entero_celda(valor, FILA_VACIA[campo])
+
+SIN_EDICIONES = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+
+def aplicar_ediciones_tabla(key_f, base, ediciones):
+    """Aplica a las líneas y a los totales solo lo que cambió en la grilla desde el rerun anterior.
+
+    La grilla acumula sus ediciones sobre el DataFrame base (celdas editadas y
+    filas borradas por posición base, filas nuevas al final); se comparan con las
+    ya aplicadas. Devuelve False si el cambio no se puede seguir por diferencias.
+    """
+    lineas, acum, df = lineas_factura(key_f), acumulado(key_f), base["df"]
+    previas = base["ediciones"] or SIN_EDICIONES
+    borradas_antes = sorted(previas["deleted_rows"])
+    borradas = sorted(ediciones["deleted_rows"])
+    agregadas_antes, agregadas = previas["added_rows"], ediciones["added_rows"]
+    if (not set(borradas_antes) <= set(borradas) or len(agregadas) < len(agregadas_antes)
+            or any(f >= len(df) for f in borradas)
+            or len(lineas) != len(df) - len(borradas_antes) + len(agregadas_antes)):
+        return False
+    
+    # Filas borradas: su posición en las líneas descuenta las ya borradas antes que ella
+    eliminadas = list(borradas_antes)
+    for fila in borradas:
+        if fila not in previas["deleted_rows"]:
+            acum.restar(lineas.borrar(fila - bisect.bisect_left(eliminadas, fila)))
+            bisect.insort(eliminadas, fila)
+    
+    # Celdas editadas: la que ya no figura volvió a su valor base
+    editadas_antes = {int(f): c for f, c in previas["edited_rows"].items()}
+    editadas = {int(f): c for f, c in ediciones["edited_rows"].items()}
+    for fila in set(editadas_antes) | set(editadas):
+        antes, ahora = editadas_antes.get(fila, {}), editadas.get(fila, {})
+        if antes == ahora or fila in eliminadas:
+            continue
+        pos = fila - bisect.bisect_left(eliminadas, fila)
+        for campo in set(antes) | set(ahora):
+            valor = _valor_celda(campo, ahora[campo] if campo in ahora else df[campo].iat[fila])
+            if lineas.fila(pos)[campo] != valor:
+                acum.cambiar(lineas, pos, campo, valor)
+    
+    # Filas nuevas, siempre al final de las líneas
+    inicio = len(df) - len(eliminadas)
+    for j, celdas in enumerate(agregadas):
+        if j < len(agregadas_antes) and agregadas_antes[j] == celdas:
+            continue
+        fila = {campo: _valor_celda(campo, celdas.get(campo)) for campo in CAMPOS_FILA}
+        if j < len(agregadas_antes):
+            for campo, valor in fila.items():
+                if lineas.fila(inicio + j)[campo] != valor:
+                    acum.cambiar(lineas, inicio + j, campo, valor)
+        else:
+            lineas.agregar(fila)
+            acum.sumar(fila)
+    
+    if not len(lineas):
+        lineas.agregar(FILA_VACIA)
+        acum.sumar(FILA_VACIA)
+    return True
+
+def editor_tabla(key_f, fid, idx):
+    """Edita todas las filas en una sola grilla y devuelve los totales de la factura"""
+    lineas = lineas_factura(key_f)
+    base = st.session_state.base_editor.get(key_f)
+    # La grilla guarda sus ediciones sobre un DataFrame base fijo. `revision` es la de
+    # las líneas tal como la grilla las dejó: si no coincide, cambiaron por fuera
+    # (modo Filas, catálogo, agregar, limpiar) y la grilla se rehace desde los datos
+    if base is None or base["revision"] != lineas.revision:
+        base = {"clave": f"editor_{fid}_{lineas.revision}", "df": lineas.a_dataframe(),
+                "revision": lineas.revision, "ediciones": None}
+        st.session_state.base_editor[key_f] = base
+    
+    editado = st.data_editor(
+        base["df"],
+        key=base["clave"],
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Pag": st.column_config.TextColumn("Pág", width="small"),
+            "Prod": st.column_config.TextColumn("Producto", width="large"),
+            "Cant": st.column_config.NumberColumn("Cant", min_value=1, step=1, default=1),
+            "Cat_U": st.column_config.NumberColumn("Precio Catálogo", min_value=0, step=1, default=0),
+            "List_U": st.column_config.NumberColumn("Precio Lista", min_value=0, step=1, default=0),
+        },
+    )
+    
+    # Cada edición de la grilla se aplica por diferencias (O(1) por celda); la tabla
+    # completa se relee solo si el cambio no se puede seguir así
+    ediciones = copy.deepcopy(st.session_state.get(base["clave"])) or SIN_EDICIONES
+    if base["ediciones"] != ediciones:
+        if not aplicar_ediciones_tabla(key_f, base, ediciones):
+            if len(editado):
+                filas = LineasFactura.desde_columnas(
+                    [_texto_celda(v) for v in editado["Pag"].tolist()],
+                    [_texto_celda(v) for v in editado["Prod"].tolist()],
+                    *([_entero_celda(v, FILA_VACIA[c]) for v in editado[c].tolist()] for c in ("Cant", "Cat_U", "List_U")),
+                )
+            else:
+                filas = LineasFactura([FILA_VACIA])
+            st.session_state.datos[key_f] = filas
+            st.session_state.acumulados[key_f] = AcumuladoTotales.desde_filas(filas)
+        base["ediciones"] = ediciones
+        base["revision"] = lineas_factura(key_f).revision
+    
+    with st.expander("Totales por fila", expanded=False):
+        # El cuerpo del expander corre aunque esté cerrado: la tabla se arma solo a pedido
+        if st.toggle("Mostrar", key=f"ver_totales_{fid}_{idx}"):
+            st.dataframe(calcular_totales(st.session_state.datos[key_f])[0], hide_index=True, use_container_width=True)
+    return acumulado(key_f).totales()
+
+def buscador_catalogo(key_f, fid, idx, catalogo):
+    """Autocompletado: busca en el catálogo y agrega el producto elegido como línea"""
+    b1, b2, b3 = st.columns([2, 3, 1])
+    with b1:
+        texto = st.text_input("🔎 Buscar en catálogo", key=f"busca_cat_{fid}_{idx}", placeholder="Nombre o código")
+    sugerencias = catalogo.buscar(texto) if texto.strip() else []
+    elegido = None
+    with b2:
+        if sugerencias:
+            elegido = st.selectbox(
+                f"{len(sugerencias)} sugerencias", sugerencias, key=f"sugerencia_{fid}_{idx}",
+                format_func=lambda p: f"Pág {p['Pag'] or '—'} · {p['Prod']} · ${fmt(p['Cat_U'])} / ${fmt(p['List_U'])}",
+            )
+        elif texto.strip():
+            st.caption("Sin coincidencias en el catálogo")
+    with b3:
+        st.write("")
+        st.button("➕ Agregar", key=f"add_cat_{fid}_{idx}", use_container_width=True, disabled=elegido is None,
+                  on_click=agregar_de_catalogo, args=(key_f, fid, idx, elegido))
+
+# --- GENERACIÓN DE PDF EN SEGUNDO PLANO ---
+@st.fragment(run_every=1.0)
+def esperar_trabajos(ids, mensaje):
+    """Muestra el avance de los trabajos y recarga la página cuando terminan todos"""
+    cola = obtener_cola_trabajos()
+    estados = [cola.estado(i) for i in ids]
+    terminados = sum(1 for t in estados if t is None or t["estado"] != PENDIENTE)
+    if terminados == len(ids):
+        st.rerun()
+    st.progress(terminados / len(ids), text=f"⏳ {mensaje} ({terminados}/{len(ids)}) · puedes seguir editando")
+
+def cliente_factura(factura):
+    return factura["name"] if factura["name"] != "Nueva Factura" else ""
+
+def clave_factura(key_f, cliente, fecha):
+    """`clave_render` de la factura, recalculada solo si cambiaron sus líneas, cliente, fecha o marca"""
+    firma = (lineas_factura(key_f).revision, cliente, fecha, tuple(marca.get(c) for c in sorted(marca)))
+    guardada = st.session_state.claves_render.get(key_f)
+    if guardada is None or guardada[0] != firma:
+        guardada = (firma, clave_render(cliente, fecha, st.session_state.datos[key_f], marca))
+        st.session_state.claves_render[key_f] = guardada
+    return guardada[1]
+
+def generar_pdf(key_f, cliente, fecha, filas):
+    """Encola el PDF de una factura y recuerda el trabajo en la sesión"""
+    clave = clave_factura(key_f, cliente, fecha)
+    trabajo_id = obtener_cola_trabajos().enviar(clave, cliente, fecha, filas, marca)
+    st.session_state.trabajos_pdf[key_f] = trabajo_id
+    return trabajo_id
+
+def exportar_abiertas(abiertas, marca, extension, cache):
+    """Archivo con todas las facturas abiertas; el renderizador se importa recién al descargar"""
+    from exportar import exportar_facturas
+
+    # Streamlit sirve la descarga desde bytes en memoria (no acepta un archivo temporal):
+    # se leen una sola vez, al hacer clic, del archivo que se armó por partes
+    with exportar_facturas(abiertas, marca, extension, cache) as archivo:
+        return archivo.read()
+
+# --- ANALÍTICA DE LA CAMPAÑA ---
+def datos_analitica(fuente, huella, obtener_facturas):
+    """Tabla de la campaña y sus agrupaciones; se rehacen solo cuando cambia la huella de las facturas"""
+    guardado = st.session_state.analitica.get(fuente)
+    if guardado is None or guardado["huella"] != huella:
+        guardado = {"huella": huella, "tabla": tabla_campana(obtener_facturas()), "grupos": {}}
+        st.session_state.analitica[fuente] = guardado
+    return guardado
+
+def facturas_de_pdfs(archivos):
+    """Facturas de un lote de PDFs importados solo para la analítica (no se abren como pestañas)"""
+    from importador import importar_lote
+
+    resultados = list(importar_lote([(a.name, a.getvalue()) for a in archivos]))
+    st.session_state.errores_analitica = sum(1 for r in resultados if r["error"])
+    # Los archivos repetidos en el lote (mismos bytes, o mismo cliente y líneas) no se cuentan dos veces
+    return [{"cliente": r["cliente"] or r["archivo"], "productos": r["productos"]}
+            for r in resultados if r["productos"] and not r["duplicado"]]
+
+def panel_analitica():
+    """Márgenes de todas las facturas agrupados por producto, página o cliente, con exportación CSV"""
+    with st.expander("📊 Analítica de la campaña", expanded=False):
+        if not st.toggle("Calcular", key="ver_analitica", help="Suma todas las facturas; apagado no se calcula nada"):
+            return
+        fuente = st.radio("Facturas", ["Abiertas", "PDFs importados"], horizontal=True, key="fuente_analitica")
+        if fuente == "Abiertas":
+            facturas = [
+                {"cliente": cliente_factura(f), "productos": lineas_factura(f"f_{f['id']}")}
+                for f in st.session_state.facturas
+            ]
+            datos = datos_analitica(fuente, huella_facturas(facturas), lambda: facturas)
+        else:
+            archivos = st.file_uploader("PDFs de la campaña (o un ZIP)", type=["pdf", "zip"],
+                                        accept_multiple_files=True, key="pdfs_analitica")
+            if not archivos:
+                st.caption("Sube los PDFs de la campaña para analizarlos sin abrirlos como facturas.")
+                return
+            with st.spinner("Importando facturas..."):
+                datos = datos_analitica(fuente, tuple(a.file_id for a in archivos), lambda: facturas_de_pdfs(archivos))
+            if st.session_state.get("errores_analitica"):
+                st.warning(f"{st.session_state.errores_analitica} archivo(s) no se pudieron leer.")
+        
+        tabla = datos["tabla"]
+        if not len(tabla):
+            st.caption("No hay líneas con producto en estas facturas.")
+            return
+        resumen = resumen_campana(tabla)
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Total catálogo", f"${fmt(resumen['T_Cat'])}")
+        m2.metric("Total lista", f"${fmt(resumen['T_List'])}")
+        m3.metric("Ganancia", f"${fmt(resumen['Gan'])}")
+        m4.metric("Margen", f"{resumen['Margen %']:.1f} %")
+        st.caption(f"{resumen['Líneas']} líneas de {resumen['Clientes']} clientes")
+        
+        agrupacion = st.radio("Agrupar por", list(AGRUPACIONES), horizontal=True, key="agrupacion_analitica")
+        grupos = datos["grupos"].get(agrupacion)
+        if grupos is None:
+            grupos = datos["grupos"][agrupacion] = agrupar(tabla, AGRUPACIONES[agrupacion])
+        st.dataframe(grupos, hide_index=True, use_container_width=True)
+        
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button(f"⬇️ CSV por {agrupacion.lower()}", data=lambda: a_csv(grupos),
+                               file_name=f"margen_por_{agrupacion.lower()}.csv", mime="text/csv",
+                               on_click="ignore", use_container_width=True)
+        with c2:
+            st.download_button("⬇️ CSV de todas las líneas", data=lambda: a_csv(tabla),
+                               file_name="lineas_campana.csv", mime="text/csv",
+                               on_click="ignore", use_container_width=True)
+
+# --- PERFIL DE RENDIMIENTO ---
+def panel_perfil():
+    """Histogramas de tramos (sesión o proceso), exportación JSON y perfilador de una interacción"""
+    with st.expander("⏱️ Perfil de rendimiento", expanded=False):
+        st.toggle("Medir tramos", value=perfil.activo(), key="medir_tramos",
+                  on_change=lambda: perfil.activar(st.session_state.medir_tramos),
+                  help="Afecta a todo el proceso; apagado no se mide nada")
+        alcance = st.radio("Histogramas", ["Sesión", "Proceso"], horizontal=True, key="alcance_perfil")
+        registro = st.session_state.perfil if alcance == "Sesión" else perfil.PROCESO
+        tabla = registro.tabla()
+        if tabla:
+            st.dataframe(tabla, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Sin tramos medidos todavía.")
+        c1, c2 = st.columns(2)
+        with c1:
+            sesion = st.session_state.perfil
+            st.download_button("⬇️ JSON", data=lambda: perfil.exportar_json(sesion), file_name="tramos.json",
+                               mime="application/json", on_click="ignore", use_container_width=True)
+        with c2:
+            if st.button("🧽 Reiniciar", use_container_width=True):
+                registro.limpiar()
+                st.rerun()
+        
+        herramienta = st.selectbox("Perfilador", perfil.herramientas_perfil(), key="herramienta_perfil")
+        if st.button("🔬 Perfilar la próxima interacción", use_container_width=True):
+            st.session_state.perfilar = herramienta
+        if 'perfilar' in st.session_state:
+            st.caption(f"{st.session_state.perfilar} se activa en la próxima interacción.")
+
+def resultado_perfil():
+    resultado = st.session_state.get("perfil_resultado")
+    if not resultado:
+        return
+    with st.expander("🔬 Último perfil", expanded=True):
+        st.download_button(f"⬇️ {resultado['archivo']}", data=resultado["datos"], file_name=resultado["archivo"],
+                           mime=resultado["mime"], on_click="ignore", use_container_width=True)
+        st.code(resultado["resumen"][:6000], language=None)
 
 # --- SIDEBAR (BARRA LATERAL) ---
 with st.sidebar:
@@ -128,6 +718,22 @@ with st.sidebar:
         aplicar_tema()
         st.rerun()
     
+    with st.expander("🧾 Editor de productos", expanded=False):
+        modo_editor = st.radio("Modo", ["Filas", "Tabla"], horizontal=True,
+                               help="Tabla: una sola grilla editable, recomendada para pedidos grandes")
+        filas_por_pagina = st.selectbox("Filas por página", [10, 25, 50, 100], index=1)
+    
+    with st.expander("📚 Catálogo", expanded=False):
+        archivo_catalogo = st.file_uploader("Catálogo de la campaña", type=["csv", "xlsx"],
+                                            help="Columnas Pag, Prod, Cat_U, List_U y opcionalmente Codigo")
+        try:
+            catalogo = catalogo_activo(archivo_catalogo)
+        except Exception as e:
+            catalogo = None
+            st.error(f"No se pudo leer el catálogo: {e}")
+        if catalogo is not None:
+            st.caption(f"{len(catalogo)} productos · al escribir un producto se completan sus precios")
+    
     with st.expander("🖼️ Marca", expanded=False):
         logo_rev = st.file_uploader("Logo Revista", type=["png", "jpg", "jpeg"])
         nombre_rev = st.text_input("Nombre Revista", "MI REVISTA")
@@ -137,21 +743,121 @@ with st.sidebar:
         logo_pago = st.file_uploader("Logo Pago", type=["png", "jpg", "jpeg"])
         qr_pago = st.file_uploader("QR Pago", type=["png", "jpg", "jpeg"])
     
+    # Datos planos de marca para el renderizador
+    marca = {
+        "nombre_rev": nombre_rev,
+        "logo_rev": logo_rev.getvalue() if logo_rev else None,
+        "num_pago": num_pago,
+        "logo_pago": logo_pago.getvalue() if logo_pago else None,
+        "qr_pago": qr_pago.getvalue() if qr_pago else None,
+    }
+    
     st.divider()
     
     st.subheader("🔄 Re-editar")
-    archivo_pdf = st.file_uploader("Subir factura PDF anterior", type=["pdf"])
-    if archivo_pdf and st.button("📥 Cargar Datos del PDF"):
-        res = importar_datos_pdf(archivo_pdf)
-        if res and res["productos"]:
-            nid = st.session_state.next_factura_id
-            st.session_state.facturas.append({"id": nid, "name": res["cliente"]})
-            st.session_state.datos[f"f_{nid}"] = res["productos"]
-            st.session_state.next_factura_id += 1
-            st.success("¡Datos cargados en una nueva pestaña!")
+    archivos_pdf = st.file_uploader(
+        "Subir facturas PDF anteriores (o un ZIP)", type=["pdf", "zip"], accept_multiple_files=True,
+        help="Las facturas importadas se guardan al cargarlas, así un PDF ya importado se reconoce aunque no se pulse Guardar.",
+    )
+    if archivos_pdf and st.button("📥 Cargar Datos del PDF"):
+        inicio = time.perf_counter()
+        abiertas = {f["huella"]["archivo"]: f for f in st.session_state.facturas if f.get("huella")}
+        almacen = obtener_almacen()
+
+        def conocida(huella):
+            # Primero las pestañas abiertas, después las facturas guardadas
+            if huella in abiertas:
+                return {"pestana": abiertas[huella]["id"], "cliente": abiertas[huella]["name"]}
+            return almacen.buscar_huella(huella)
+
+        with st.spinner("Importando facturas..."):
+            # Un proceso por núcleo; cada PDF se lee página a página (los ya conocidos no se leen)
+            from importador import importar_lote
+            resultados = list(importar_lote([(a.name, a.getvalue()) for a in archivos_pdf], conocida=conocida))
+        antes = len(st.session_state.facturas)
+        for res in resultados:
+            res["aviso"] = abrir_importada(res)
+        guardar_importadas()
+        st.session_state.reporte_importacion = {
+            "resultados": resultados, "nuevas": len(st.session_state.facturas) - antes,
+            "segundos": time.perf_counter() - inicio,
+        }
+        if any(not r["error"] for r in resultados):
             st.rerun()
-        else:
+    
+    reporte = st.session_state.reporte_importacion
+    if reporte:
+        resultados = reporte["resultados"]
+        errores = [r for r in resultados if r["error"]]
+        avisos = [r for r in resultados if r["aviso"]]
+        if reporte["nuevas"]:
+            st.success(f"¡{reporte['nuevas']} factura(s) cargadas en nuevas pestañas y guardadas en {reporte['segundos']:.1f}s!")
+        elif len(resultados) == 1 and errores:
             st.warning("No se detectaron productos legibles en el PDF.")
+        if avisos:
+            st.info(f"{len(avisos)} archivo(s) repetidos o parecidos a facturas existentes (ver detalle).")
+        if len(resultados) > 1 or errores or avisos:
+            with st.expander(f"Detalle de importación ({len(errores)} errores)", expanded=bool(errores)):
+                st.dataframe(
+                    [
+                        {"Archivo": r["archivo"], "Cliente": r["cliente"] or "", "Líneas": len(r["productos"] or []),
+                         "ms": round(r["segundos"] * 1000), "Error": r["error"] or "", "Aviso": r["aviso"]}
+                        for r in resultados
+                    ],
+                    hide_index=True, use_container_width=True,
+                )
+    
+    st.divider()
+    
+    st.subheader("💾 Facturas guardadas")
+    almacen = obtener_almacen()
+    campana = st.text_input("Campaña", key="campana", help="Se guarda junto con las facturas")
+    if st.button("💾 Guardar facturas abiertas", use_container_width=True):
+        abiertas = st.session_state.facturas
+        # Una sola transacción para todas las facturas abiertas
+        ids = almacen.guardar([
+            {
+                "id": f.get("db_id"),
+                "cliente": f["name"],
+                "fecha": f.get("fecha", date.today()),
+                "campana": campana,
+                "productos": filas_validas(st.session_state.datos.get(f"f_{f['id']}", [])),
+                "huellas": huellas_pestana(f),
+            }
+            for f in abiertas
+        ])
+        for f, db_id in zip(abiertas, ids):
+            f["db_id"] = db_id
+            f.pop("otras_huellas", None)
+        st.success(f"{len(ids)} facturas guardadas.")
+    
+    with st.expander("📂 Abrir factura guardada", expanded=False):
+        busca_cliente = st.text_input("Cliente empieza por")
+        campanas = almacen.campanas()
+        busca_campana = st.selectbox("Campaña", [""] + campanas, format_func=lambda c: c or "Todas")
+        busca_desde = st.date_input("Pago desde", value=None)
+        encontradas = almacen.buscar(busca_cliente.strip(), busca_campana, busca_desde)
+        if encontradas:
+            elegida = st.selectbox(
+                f"{len(encontradas)} facturas",
+                encontradas,
+                format_func=lambda f: f"{f['cliente']} · {f['fecha_pago'] or '—'} · ${fmt(f['gan'])} ({f['lineas']} líneas)",
+            )
+            if st.button("📂 Abrir", use_container_width=True):
+                # Las líneas se leen solo al abrir la factura
+                agregar_factura(
+                    elegida["cliente"],
+                    almacen.cargar_lineas(elegida["id"]) or [FILA_VACIA],
+                    fecha=date.fromisoformat(elegida["fecha_pago"]) if elegida["fecha_pago"] else date.today(),
+                    db_id=elegida["id"],
+                )
+                st.rerun()
+        else:
+            st.caption("No hay facturas guardadas con esos filtros.")
+
+    if PANEL_PERFIL:
+        st.divider()
+        panel_perfil()
 
 # --- PANEL PRINCIPAL ---
 st.title("📑 Facturación Profesional")
@@ -160,478 +866,208 @@ if st.button("➕ Crear Nueva Factura"):
     nid = st.session_state.next_factura_id
     st.session_state.facturas.append({"id": nid, "name": f"Factura {nid}"})
     st.session_state.next_factura_id += 1
+    st.session_state.factura_activa = nid
     st.rerun()
 
-if st.session_state.delete_row is not None:
-    delete_fid, delete_i = st.session_state.delete_row
-    if delete_fid in st.session_state.datos and delete_i < len(st.session_state.datos[delete_fid]):
-        st.session_state.datos[delete_fid].pop(delete_i)
-        if len(st.session_state.datos[delete_fid]) == 0:
-            st.session_state.datos[delete_fid].append({"Pag": "", "Prod": "", "Cant": 1, "Cat_U": 0, "List_U": 0})
-    st.session_state.delete_row = None
-    st.rerun()
-
-tab_titles = [f["name"] for f in st.session_state.facturas]
-tabs = st.tabs(tab_titles)
-
-for idx, tab in enumerate(tabs):
-    with tab:
-        factura_actual = st.session_state.facturas[idx]
-        fid = factura_actual["id"]
-        key_f = f"f_{fid}"
-        
-        if key_f not in st.session_state.datos:
-            st.session_state.datos[key_f] = [{"Pag": "", "Prod": "", "Cant": 1, "Cat_U": 0, "List_U": 0}]
-        
-        c1, c2 = st.columns(2)
-        with c1:
-            nom_cli = st.text_input(
-                "Cliente", 
-                value=factura_actual["name"] if factura_actual["name"] != "Nueva Factura" else "",
-                key=f"cliente_{fid}_{idx}"
-            )
-        
-        with c2:
-            fec_p = st.date_input(
-                "Fecha de Pago", 
-                date.today(), 
-                key=f"fecha_{fid}_{idx}"
-            )
-        
-        if nom_cli and nom_cli != factura_actual["name"]:
-            st.session_state.facturas[idx]["name"] = nom_cli
-        
-        s_tc, s_tl, s_tg = 0, 0, 0
-        
-        st.markdown("<small style='color:gray;'>Pág | Producto | Cant | Precio Catálogo | Total Catálogo | Precio Lista | Total Lista | Ganancia (Cat-List) | </small>", unsafe_allow_html=True)
-        
-        for i, fila in enumerate(st.session_state.datos[key_f]):
-            cols = st.columns([0.5, 2.5, 0.6, 1.2, 1.2, 1.2, 1.2, 1.2, 0.4])
-            
-            with cols[0]:
-                fila['Pag'] = st.text_input(
-                    "P", 
-                    value=fila.get('Pag', ''),
-                    key=f"pag_{fid}_{idx}_{i}",
-                    label_visibility="collapsed"
-                )
-            
-            with cols[1]:
-                fila['Prod'] = st.text_input(
-                    "Pr", 
-                    value=fila.get('Prod', ''),
-                    key=f"prod_{fid}_{idx}_{i}",
-                    label_visibility="collapsed"
-                )
-            
-            with cols[2]:
-                fila['Cant'] = st.number_input(
-                    "C", 
-                    value=int(fila.get('Cant', 1)),
-                    min_value=1,
-                    key=f"cant_{fid}_{idx}_{i}",
-                    label_visibility="collapsed"
-                )
-            
-            with cols[3]:
-                fila['Cat_U'] = st.number_input(
-                    "PC", 
-                    value=int(fila.get('Cat_U', 0)),
-                    min_value=0,
-                    key=f"cat_u_{fid}_{idx}_{i}",
-                    label_visibility="collapsed"
-                )
-            
-            with cols[4]:
-                tc = fila['Cant'] * fila['Cat_U']
-                st.markdown(f"<div style='text-align: right;'><strong>${fmt(tc)}</strong></div>", unsafe_allow_html=True)
-            
-            with cols[5]:
-                fila['List_U'] = st.number_input(
-                    "PL", 
-                    value=int(fila.get('List_U', 0)),
-                    min_value=0,
-                    key=f"list_u_{fid}_{idx}_{i}",
-                    label_visibility="collapsed"
-                )
-            
-            with cols[6]:
-                tl = fila['Cant'] * fila['List_U']
-                st.markdown(f"<div style='text-align: right;'><strong>${fmt(tl)}</strong></div>", unsafe_allow_html=True)
-            
-            with cols[7]:
-                gan = tc - tl
-                color_gan = "#2e7d32" if gan >= 0 else "#d32f2f"
-                st.markdown(f"<div style='text-align: right; color:{color_gan};'><strong>${fmt(gan)}</strong></div>", unsafe_allow_html=True)
-            
-            with cols[8]:
-                if st.button("🗑️", key=f"del_{fid}_{idx}_{i}", type="secondary"):
-                    st.session_state.delete_row = (key_f, i)
-                    st.rerun()
-            
-            s_tc += tc
-            s_tl += tl
-            s_tg += gan
-        
-        color_total_gan = "#2e7d32" if s_tg >= 0 else "#d32f2f"
-        st.markdown(f"""
-            <div style="background-color:#ffffff; border:1px solid #cccccc; padding:15px; border-radius:10px; margin:20px 0; color:#000000;">
-                <div style="display:flex; justify-content:space-around; text-align:center;">
-                    <div><p style="margin:0; font-size:0.8rem; color:#616161;">TOTAL CATÁLOGO</p><strong style="font-size:1.2rem;">${fmt(s_tc)}</strong></div>
-                    <div><p style="margin:0; font-size:0.8rem; color:#616161;">TOTAL LISTA</p><strong style="font-size:1.2rem;">${fmt(s_tl)}</strong></div>
-                    <div><p style="margin:0; font-size:0.8rem; color:{color_total_gan};">GANANCIA TOTAL</p><strong style="font-size:1.5rem; color:{color_total_gan};">${fmt(s_tg)}</strong></div>
-                </div>
+def mostrar_factura(idx):
+    """Dibuja el editor completo de la factura activa"""
+    factura_actual = st.session_state.facturas[idx]
+    fid = factura_actual["id"]
+    key_f = f"f_{fid}"
+    
+    lineas_factura(key_f)
+    
+    c1, c2 = st.columns(2)
+    with c1:
+        nom_cli = st.text_input(
+            "Cliente", 
+            value=cliente_factura(factura_actual),
+            key=f"cliente_{fid}_{idx}"
+        )
+    
+    with c2:
+        fec_p = st.date_input(
+            "Fecha de Pago", 
+            factura_actual.get("fecha", date.today()), 
+            key=f"fecha_{fid}_{idx}"
+        )
+    
+    # Los widgets de facturas no visibles se descartan: cliente y fecha viven en la factura
+    factura_actual["fecha"] = fec_p
+    if nom_cli and nom_cli != factura_actual["name"]:
+        st.session_state.facturas[idx]["name"] = nom_cli
+    
+    if catalogo is not None:
+        buscador_catalogo(key_f, fid, idx, catalogo)
+    
+    with perfil.tramo("app.editor"):
+        if modo_editor == "Tabla":
+            totales = editor_tabla(key_f, fid, idx)
+        else:
+            totales = editor_filas_paginado(key_f, fid, idx, filas_por_pagina, catalogo)
+    if MODO_DEPURACION and not acumulado(key_f).coincide(st.session_state.datos[key_f]):
+        st.error("Depuración: los totales incrementales no coinciden con el cálculo completo; se recalculan.")
+        st.session_state.acumulados.pop(key_f)
+        totales = acumulado(key_f).totales()
+    s_tc, s_tl, s_tg = totales["T_Cat"], totales["T_List"], totales["Gan"]
+    
+    color_total_gan = "#2e7d32" if s_tg >= 0 else "#d32f2f"
+    st.markdown(f"""
+        <div style="background-color:#ffffff; border:1px solid #cccccc; padding:15px; border-radius:10px; margin:20px 0; color:#000000;">
+            <div style="display:flex; justify-content:space-around; text-align:center;">
+                <div><p style="margin:0; font-size:0.8rem; color:#616161;">TOTAL CATÁLOGO</p><strong style="font-size:1.2rem;">${fmt(s_tc)}</strong></div>
+                <div><p style="margin:0; font-size:0.8rem; color:#616161;">TOTAL LISTA</p><strong style="font-size:1.2rem;">${fmt(s_tl)}</strong></div>
+                <div><p style="margin:0; font-size:0.8rem; color:{color_total_gan};">GANANCIA TOTAL</p><strong style="font-size:1.5rem; color:{color_total_gan};">${fmt(s_tg)}</strong></div>
             </div>
-        """, unsafe_allow_html=True)
-        
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            if st.button("➕ Agregar Nueva Fila", key=f"add_{fid}_{idx}", use_container_width=True):
-                nueva_fila = {"Pag": "", "Prod": "", "Cant": 1, "Cat_U": 0, "List_U": 0}
-                st.session_state.datos[key_f].append(nueva_fila)
-                st.rerun()
-        
-        with col2:
-            if st.button("🧹 Limpiar Todo", key=f"clear_{fid}_{idx}", type="secondary", use_container_width=True):
-                st.session_state.datos[key_f] = [{"Pag": "", "Prod": "", "Cant": 1, "Cat_U": 0, "List_U": 0}]
-                st.rerun()
-        
-        # GENERACIÓN DE PDF CON FUENTES MÁS GRANDES
-        if st.session_state.datos[key_f]:
-            filas_validas = [f for f in st.session_state.datos[key_f] if f.get('Prod', '').strip() != ""]
+        </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.button("➕ Agregar Nueva Fila", key=f"add_{fid}_{idx}", use_container_width=True,
+                  on_click=agregar_fila, args=(key_f, fid, idx))
+    
+    with col2:
+        st.button("🧹 Limpiar Todo", key=f"clear_{fid}_{idx}", type="secondary", use_container_width=True,
+                  on_click=limpiar_filas, args=(key_f, fid, idx))
+    
+    # GENERACIÓN DE PDF CON FUENTES MÁS GRANDES (en segundo plano)
+    if st.session_state.datos[key_f]:
+        # Las líneas con producto ya están contadas en los totales incrementales
+        if acumulado(key_f).lineas:
+            filas_pdf = st.session_state.datos[key_f]
+            cola = obtener_cola_trabajos()
+            if st.button("🚀 GENERAR PDF", key=f"pdf_{fid}_{idx}", type="primary", use_container_width=True):
+                generar_pdf(key_f, nom_cli, fec_p, filas_pdf)
+            
+            trabajo = cola.estado(st.session_state.trabajos_pdf.get(key_f))
+            if trabajo is not None and trabajo["clave"] != clave_factura(key_f, nom_cli, fec_p):
+                # La factura cambió: el PDF anterior ya no es el de esta sesión. No se borra
+                # de la caché (otra sesión puede estar ofreciéndolo); sale solo por LRU
+                del st.session_state.trabajos_pdf[key_f]
+                trabajo = None
             
-            if filas_validas:
-                df_pdf = pd.DataFrame(filas_validas)
-                
-                if st.button("🚀 GENERAR PDF", key=f"pdf_{fid}_{idx}", type="primary", use_container_width=True):
-                    with st.spinner("Generando PDF..."):
-                        try:
-                            # PDF EN FORMATO CARTA
-                            pdf = FPDF(orientation='P', unit='mm', format='letter')
-                            pdf.add_page()
-                            
-                            # Márgenes
-                            pdf.set_left_margin(10)
-                            pdf.set_right_margin(10)
-                            pdf.set_top_margin(15)
-                            
-                            # Logo revista
-                            if logo_rev:
-                                try:
-                                    agregar_imagen_segura(pdf, logo_rev, 10, 15, 25)
-                                except:
-                                    pass
-                            
-                            # Título PRINCIPAL - FUENTE GRANDE
-                            pdf.set_font("Arial", 'B', 16)
-                            pdf.set_xy(0, 15)
-                            pdf.cell(0, 10, txt=nombre_rev.upper(), ln=True, align='C')
-                            
-                            # Información del cliente - FUENTE LEGIBLE
-                            pdf.set_font("Arial", '', 11)
-                            cliente_text = f"CLIENTE: {nom_cli.upper()} | FECHA DE PAGO: {fec_p.strftime('%d-%m-%Y')}"
-                            pdf.cell(0, 7, cliente_text, ln=True, align='C')
-                            pdf.ln(8)
-                            
-                            # ANCHOS DE COLUMNAS
-                            # Ancho total: 215.9mm - 20mm márgenes = 195.9mm
-                            # Distribución: Pág(12) + Producto(90) + Cant(12) + P.Cat(18) + T.Cat(18) + P.List(18) + T.List(18) + Gan(18)
-                            cw = [12, 90, 12, 18, 18, 18, 18, 18]
-                            
-                            # Ajustar ancho de producto dinámicamente
-                            ancho_total_fijo = sum(cw) - cw[1]  # Suma de todas menos producto
-                            cw[1] = 195.9 - ancho_total_fijo  # Producto toma el espacio restante
-                            
-                            # Encabezados con FUENTE LEGIBLE
-                            pdf.set_fill_color(240, 240, 240)
-                            pdf.set_font("Arial", 'B', 9)
-                            
-                            headers = ["Pág", "Producto", "Cant", "P.Cat", "T.Cat", "P.List", "T.List", "Gan."]
-                            for i, header in enumerate(headers):
-                                pdf.cell(cw[i], 8, header, 1, 0, 'C', True)
-                            pdf.ln()
-                            
-                            pdf.set_font("Arial", '', 8)  # CONTENIDO LEGIBLE
-                            
-                            # Variables para totales
-                            total_tc = 0
-                            total_tl = 0
-                            total_gan = 0
-                            
-                            for _, r in df_pdf.iterrows():
-                                # Calcular valores
-                                v_tc = r['Cant'] * r['Cat_U']
-                                v_tl = r['Cant'] * r['List_U']
-                                gan_fila = v_tc - v_tl
-                                
-                                # Actualizar totales
-                                total_tc += v_tc
-                                total_tl += v_tl
-                                total_gan += gan_fila
-                                
-                                # Preparar texto del producto
-                                prod_text = limpiar_texto_para_pdf(str(r['Prod']))
-                                
-                                # DIVIDIR TEXTO EN LÍNEAS
-                                pdf.set_font("Arial", '', 8)
-                                lineas = []
-                                palabras = prod_text.split()
-                                linea_actual = ""
-                                
-                                for palabra in palabras:
-                                    prueba = f"{linea_actual} {palabra}".strip()
-                                    if pdf.get_string_width(prueba) <= cw[1] - 4:
-                                        linea_actual = prueba
-                                    else:
-                                        if linea_actual:
-                                            lineas.append(linea_actual)
-                                        linea_actual = palabra
-                                
-                                if linea_actual:
-                                    lineas.append(linea_actual)
-                                
-                                if not lineas:
-                                    lineas = [prod_text[:45] + "..." if len(prod_text) > 45 else prod_text]
-                                
-                                num_lineas = len(lineas)
-                                altura_fila = max(8, num_lineas * 4)  # ALTURA ADECUADA
-                                
-                                # Verificar si necesitamos nueva página
-                                if pdf.get_y() + altura_fila > 260:
-                                    pdf.add_page()
-                                    # Reimprimir encabezados
-                                    pdf.set_fill_color(240, 240, 240)
-                                    pdf.set_font("Arial", 'B', 9)
-                                    for i, header in enumerate(headers):
-                                        pdf.cell(cw[i], 8, header, 1, 0, 'C', True)
-                                    pdf.ln()
-                                    pdf.set_font("Arial", '', 8)
-                                
-                                # Guardar posición inicial
-                                x_inicial = pdf.get_x()
-                                y_inicial = pdf.get_y()
-                                
-                                # Columna 1: Página
-                                pdf.cell(cw[0], altura_fila, str(r['Pag']), 1, 0, 'C')
-                                
-                                # Columna 2: Producto (MÚLTIPLES LÍNEAS)
-                                # Dibujar celda completa
-                                pdf.cell(cw[1], altura_fila, "", 1, 0, 'L')
-                                
-                                # Escribir cada línea
-                                for j, linea in enumerate(lineas):
-                                    pdf.set_xy(x_inicial + cw[0], y_inicial + (j * altura_fila/num_lineas))
-                                    pdf.cell(cw[1], altura_fila/num_lineas, linea, 0, 0, 'L')
-                                
-                                # Volver a posición
-                                pdf.set_xy(x_inicial + cw[0] + cw[1], y_inicial)
-                                
-                                # Columna 3: Cantidad
-                                pdf.cell(cw[2], altura_fila, str(r['Cant']), 1, 0, 'C')
-                                
-                                # Columna 4: Precio Catálogo
-                                pdf.cell(cw[3], altura_fila, f"${fmt(r['Cat_U'])}", 1, 0, 'R')
-                                
-                                # Columna 5: Total Catálogo
-                                pdf.set_fill_color(225, 245, 254)
-                                pdf.cell(cw[4], altura_fila, f"${fmt(v_tc)}", 1, 0, 'R', True)
-                                
-                                # Columna 6: Precio Lista
-                                pdf.set_fill_color(255, 255, 255)
-                                pdf.cell(cw[5], altura_fila, f"${fmt(r['List_U'])}", 1, 0, 'R')
-                                
-                                # Columna 7: Total Lista
-                                pdf.set_fill_color(255, 243, 224)
-                                pdf.cell(cw[6], altura_fila, f"${fmt(v_tl)}", 1, 0, 'R', True)
-                                
-                                # Columna 8: Ganancia
-                                if gan_fila >= 0:
-                                    pdf.set_fill_color(232, 245, 233)
-                                else:
-                                    pdf.set_fill_color(255, 230, 230)
-                                
-                                pdf.cell(cw[7], altura_fila, f"${fmt(gan_fila)}", 1, 1, 'R', True)
-                                
-                                # Restaurar color
-                                pdf.set_fill_color(255, 255, 255)
-                            
-                            # LÍNEA DE TOTALES CON FUENTE GRANDE
-                            pdf.set_fill_color(230, 230, 230)
-                            pdf.set_font("Arial", 'B', 10)
-                            
-                            ancho_totales = cw[0] + cw[1] + cw[2]
-                            
-                            pdf.cell(ancho_totales, 9, "TOTALES:", 1, 0, 'R', True)
-                            pdf.cell(cw[3], 9, "", 1, 0, 'C', True)
-                            pdf.cell(cw[4], 9, f"${fmt(total_tc)}", 1, 0, 'R', True)
-                            pdf.cell(cw[5], 9, "", 1, 0, 'C', True)
-                            pdf.cell(cw[6], 9, f"${fmt(total_tl)}", 1, 0, 'R', True)
-                            
-                            if total_gan >= 0:
-                                pdf.set_fill_color(232, 245, 233)
-                            else:
-                                pdf.set_fill_color(255, 230, 230)
-                            
-                            pdf.cell(cw[7], 9, f"${fmt(total_gan)}", 1, 1, 'R', True)
-                            
-                            # INFORMACIÓN DE PAGO
-                            pdf.ln(10)
-                            
-                            y_pos = pdf.get_y()
-                            
-                            # Logo de pago
-                            if logo_pago:
-                                try:
-                                    agregar_imagen_segura(pdf, logo_pago, 10, y_pos, 25)
-                                except:
-                                    pass
-                            
-                            # Información de pago - FUENTE GRANDE
-                            pdf.set_xy(45, y_pos + 8)
-                            pdf.set_font("Arial", 'B', 12)
-                            if num_pago:
-                                pdf.cell(0, 7, f"Pagar a: {num_pago}")
-                            else:
-                                pdf.cell(0, 7, "Información de pago no configurada")
-                            
-                            # QR GRANDE
-                            if qr_pago:
-                                try:
-                                    qr_x = 150
-                                    qr_y = y_pos + 3
-                                    qr_size = 40
-                                    agregar_imagen_segura(pdf, qr_pago, qr_x, qr_y, qr_size)
-                                except:
-                                    pass
-                            
-                            # Generar PDF
-                            res_pdf = pdf.output(dest='S').encode('latin-1')
-                            
-                            st.success("✅ PDF generado exitosamente")
-                            st.download_button(
-                                label="⬇️ Descargar PDF",
-                                data=res_pdf,
-                                file_name=f"Factura_{nom_cli.replace(' ', '_')}.pdf",
-                                mime="application/pdf",
-                                key=f"download_{fid}_{idx}"
-                            )
-                            
-                        except Exception as e:
-                            st.error(f"Error al generar el PDF: {str(e)}")
-                            
-                            # MÉTODO ALTERNATIVO SIMPLIFICADO
-                            try:
-                                pdf = FPDF(orientation='P', unit='mm', format='letter')
-                                pdf.add_page()
-                                
-                                pdf.set_font("Arial", 'B', 16)
-                                pdf.cell(0, 12, f"FACTURA: {nom_cli}", 0, 1, 'C')
-                                pdf.set_font("Arial", '', 12)
-                                pdf.cell(0, 7, f"Fecha: {fec_p.strftime('%d-%m-%Y')}", 0, 1, 'C')
-                                pdf.ln(8)
-                                
-                                # Tabla simplificada con 5 columnas
-                                pdf.set_font("Arial", 'B', 10)
-                                encabezados = ["Pág", "Producto", "Cant", "Total Cat.", "Ganancia"]
-                                anchos = [15, 120, 15, 25, 25]
-                                
-                                for i, header in enumerate(encabezados):
-                                    pdf.cell(anchos[i], 8, header, 1, 0, 'C', True)
-                                pdf.ln()
-                                
-                                pdf.set_font("Arial", '', 9)
-                                
-                                for _, r in df_pdf.iterrows():
-                                    v_tc = r['Cant'] * r['Cat_U']
-                                    v_tl = r['Cant'] * r['List_U']
-                                    gan_fila = v_tc - v_tl
-                                    
-                                    # Dividir producto
-                                    prod_text = str(r['Prod'])
-                                    lineas = []
-                                    palabras = prod_text.split()
-                                    linea_actual = ""
-                                    
-                                    for palabra in palabras:
-                                        prueba = f"{linea_actual} {palabra}".strip()
-                                        if pdf.get_string_width(prueba) <= anchos[1] - 4:
-                                            linea_actual = prueba
-                                        else:
-                                            if linea_actual:
-                                                lineas.append(linea_actual)
-                                            linea_actual = palabra
-                                    
-                                    if linea_actual:
-                                        lineas.append(linea_actual)
-                                    
-                                    if not lineas:
-                                        lineas = [prod_text[:50] + "..." if len(prod_text) > 50 else prod_text]
-                                    
-                                    altura = max(8, len(lineas) * 4)
-                                    
-                                    # Página
-                                    pdf.cell(anchos[0], altura, str(r['Pag']), 1, 0, 'C')
-                                    
-                                    # Producto
-                                    x = pdf.get_x()
-                                    y = pdf.get_y()
-                                    for j, linea in enumerate(lineas):
-                                        if j == 0:
-                                            pdf.cell(anchos[1], altura/len(lineas), linea, 'LR', 0, 'L')
-                                        else:
-                                            pdf.set_xy(x, y + (j * altura/len(lineas)))
-                                            pdf.cell(anchos[1], altura/len(lineas), linea, 'LR', 0, 'L')
-                                    
-                                    pdf.set_xy(x + anchos[1], y)
-                                    
-                                    # Cantidad
-                                    pdf.cell(anchos[2], altura, str(r['Cant']), 1, 0, 'C')
-                                    
-                                    # Total
-                                    pdf.cell(anchos[3], altura, f"${fmt(v_tc)}", 1, 0, 'R')
-                                    
-                                    # Ganancia
-                                    pdf.cell(anchos[4], altura, f"${fmt(gan_fila)}", 1, 1, 'R')
-                                
-                                # Totales
-                                pdf.set_font("Arial", 'B', 11)
-                                pdf.cell(150, 9, "TOTALES:", 1, 0, 'R', True)
-                                pdf.cell(25, 9, f"${fmt(s_tc)}", 1, 0, 'R', True)
-                                pdf.cell(25, 9, f"${fmt(s_tg)}", 1, 1, 'R', True)
-                                
-                                # Información de pago
-                                pdf.ln(8)
-                                
-                                if logo_pago:
-                                    try:
-                                        agregar_imagen_segura(pdf, logo_pago, 10, pdf.get_y(), 20)
-                                    except:
-                                        pass
-                                
-                                pdf.set_xy(40, pdf.get_y() + 5)
-                                pdf.set_font("Arial", 'B', 12)
-                                if num_pago:
-                                    pdf.cell(0, 7, f"Pagar a: {num_pago}")
-                                
-                                if qr_pago:
-                                    try:
-                                        agregar_imagen_segura(pdf, qr_pago, 150, pdf.get_y() - 5, 35)
-                                    except:
-                                        pass
-                                
-                                res_pdf_simple = pdf.output(dest='S').encode('latin-1')
-                                
-                                st.download_button(
-                                    label="⬇️ Descargar PDF Simplificado",
-                                    data=res_pdf_simple,
-                                    file_name=f"Factura_{nom_cli.replace(' ', '_')}_simple.pdf",
-                                    mime="application/pdf"
-                                )
-                                
-                            except Exception as e2:
-                                st.error(f"Error crítico: {str(e2)}")
+            if trabajo is None:
+                pass
+            elif trabajo["estado"] == PENDIENTE:
+                esperar_trabajos([trabajo["id"]], "Generando PDF en segundo plano")
+            elif trabajo["estado"] == ERROR:
+                st.error(f"Error crítico: {trabajo['error']}")
             else:
-                st.warning("Agrega al menos un producto con nombre para generar el PDF.")
+                # La descarga es diferida: el PDF se lee del archivo de la caché recién al hacer clic
+                leer_pdf = lambda i=trabajo["id"]: cola.archivo(i) or b""
+                if not cola.disponible(trabajo["id"]):
+                    st.info("El PDF ya no está en memoria; vuelve a generarlo.")
+                elif trabajo["simplificada"]:
+                    st.error(f"Error al generar el PDF: {trabajo['error']}")
+                    st.download_button(
+                        label="⬇️ Descargar PDF Simplificado",
+                        data=leer_pdf,
+                        file_name=f"Factura_{nom_cli.replace(' ', '_')}_simple.pdf",
+                        mime="application/pdf",
+                        key=f"download_{fid}_{idx}",
+                        on_click="ignore",
+                    )
+                else:
+                    st.success("✅ PDF generado exitosamente")
+                    st.download_button(
+                        label="⬇️ Descargar PDF",
+                        data=leer_pdf,
+                        file_name=f"Factura_{nom_cli.replace(' ', '_')}.pdf",
+                        mime="application/pdf",
+                        key=f"download_{fid}_{idx}",
+                        on_click="ignore",
+                    )
         else:
             st.warning("Agrega al menos un producto con nombre para generar el PDF.")
+    else:
+        st.warning("Agrega al menos un producto con nombre para generar el PDF.")
+
+def resumen_factura(key_f, nombre):
+    """Resumen de una factura que no está abierta, desde sus totales incrementales"""
+    acum = acumulado(key_f)
+    totales = acum.totales()
+    return {"Cliente": nombre, "Líneas": acum.lineas, "Total Catálogo": totales["T_Cat"],
+            "Total Lista": totales["T_List"], "Ganancia": totales["Gan"]}
+
+# Solo la factura activa ejecuta sus widgets; las demás muestran su resumen guardado
+ids_facturas = [f["id"] for f in st.session_state.facturas]
+nombres_facturas = {f["id"]: f["name"] for f in st.session_state.facturas}
+if st.session_state.get("factura_activa") not in ids_facturas:
+    st.session_state.factura_activa = ids_facturas[0]
+fid_activa = st.radio(
+    "Factura activa",
+    ids_facturas,
+    format_func=lambda i: nombres_facturas[i],
+    horizontal=True,
+    key="factura_activa",
+    label_visibility="collapsed",
+)
+
+if len(ids_facturas) > 1:
+    if st.button("🚀 Generar PDF de todas las facturas abiertas"):
+        # Todas las pestañas se renderizan a la vez en el pool mientras se sigue editando
+        st.session_state.lote_pdf = [
+            generar_pdf(f"f_{f['id']}", cliente_factura(f), f.get("fecha", date.today()), st.session_state.datos[f"f_{f['id']}"])
+            for f in st.session_state.facturas
+            if filas_validas(st.session_state.datos.get(f"f_{f['id']}", []))
+        ]
+    lote_pdf = st.session_state.lote_pdf
+    if lote_pdf:
+        cola = obtener_cola_trabajos()
+        estados = [cola.estado(i) for i in lote_pdf]
+        if any(t is not None and t["estado"] == PENDIENTE for t in estados):
+            esperar_trabajos(lote_pdf, "Generando facturas")
+        else:
+            errores = sum(1 for t in estados if t is not None and t["estado"] == ERROR)
+            st.success(f"✅ {len(lote_pdf) - errores} PDF listos; descárgalos desde cada factura."
+                       + (f" {errores} con error." if errores else ""))
+    
+    # Exportación de todas las pestañas: el archivo se arma recién al hacer clic.
+    # Solo entran las facturas con productos válidos; sin ninguna el botón se desactiva
+    abiertas = [
+        {"cliente": cliente_factura(f), "fecha": f.get("fecha", date.today()), "productos": st.session_state.datos.get(f"f_{f['id']}", [])}
+        for f in st.session_state.facturas
+        if acumulado(f"f_{f['id']}").lineas
+    ]
+    c_formato, c_exportar = st.columns([1, 2])
+    with c_formato:
+        formato = st.radio("Exportar como", ["PDF combinado", "ZIP"], horizontal=True, key="formato_exportacion")
+    with c_exportar:
+        extension = "zip" if formato == "ZIP" else "pdf"
+        cache_render = obtener_cache_render()
+        st.download_button(
+            "⬇️ Exportar todas las facturas",
+            data=lambda: exportar_abiertas(abiertas, marca, extension, cache_render),
+            file_name=f"Facturas_{date.today().strftime('%d-%m-%Y')}.{extension}",
+            mime="application/zip" if extension == "zip" else "application/pdf",
+            on_click="ignore",
+            disabled=not abiertas,
+            use_container_width=True,
+        )
+        if not abiertas:
+            st.caption("No hay facturas con productos para exportar.")
+        else:
+            st.caption("Las facturas que no se puedan generar se listan en el archivo (al final del PDF o en NO_INCLUIDAS.txt).")
+    
+    with st.expander(f"📋 Facturas abiertas ({len(ids_facturas)})", expanded=False):
+        resumenes = [
+            resumen_factura(f"f_{f['id']}", f["name"]) for f in st.session_state.facturas if f["id"] != fid_activa
+        ]
+        st.dataframe(resumenes, hide_index=True, use_container_width=True)
+
+mostrar_factura(ids_facturas.index(fid_activa))
+
+# Después del editor: la analítica ya ve las ediciones de este rerun
+panel_analitica()
 
+# --- CIERRE DEL RERUN ---
+# Con la página ya enviada se arranca (una vez por proceso) el pool que genera los PDFs
+obtener_cola_trabajos()
+if perfil.activo():
+    perfil.registrar("app.rerun", time.perf_counter() - inicio_rerun)
+if 'perfil_en_curso' in st.session_state:
+    st.session_state.perfil_resultado = perfil.detener_perfil(st.session_state.pop('perfil_en_curso'))
+if PANEL_PERFIL:
+    with st.sidebar:
+        resultado_perfil()
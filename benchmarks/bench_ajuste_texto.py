@@ -0,0 +1,111 @@
+"""Micro-benchmark del ajuste de texto de la columna Producto.
+
+Compara el método anterior (medir con `get_string_width` el prefijo completo
+en cada palabra) con `ajuste_texto.ajustar_texto`, en frío y con la caché
+caliente, sobre descripciones de catálogo realistas.
+
+    python benchmarks/bench_ajuste_texto.py [--facturas 300] [--filas 40]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf import FPDF
+
+import ajuste_texto
+from factura_pdf import limpiar_texto_para_pdf
+
+MARCAS = ["Esika", "L'Bel", "Cyzone", "Natura", "Avon", "Yanbal", "Ebel", "Nivea"]
+PRODUCTOS = [
+    "Crema hidratante facial con ácido hialurónico y vitamina E",
+    "Perfume para dama Bleu Intense edición limitada 50 ml",
+    "Base de maquillaje líquida matificante larga duración FPS 15 tono",
+    "Set de regalo colonia + desodorante roll-on + loción corporal",
+    "Labial líquido mate con aplicador de precisión tono rojo pasión",
+    "Shampoo reparación profunda para cabello teñido y maltratado 400 ml",
+    "Máscara de pestañas a prueba de agua volumen extremo negro intenso",
+    "Reloj análogo para caballero correa de cuero sintético",
+    "Juego de ollas antiadherentes de aluminio 5 piezas con tapa de vidrio",
+    "Colonia infantil sin alcohol aroma frutal & suave 200 ml",
+]
+
+def catalogo(n, semilla=7):
+    rnd = random.Random(semilla)
+    return [
+        limpiar_texto_para_pdf(f"{rnd.choice(MARCAS)} {rnd.choice(PRODUCTOS)} ref. {rnd.randint(1000, 9999)}")
+        for _ in range(n)
+    ]
+
+def ajuste_anterior(pdf, texto, ancho, max_corte):
+    lineas = []
+    linea_actual = ""
+    for palabra in texto.split():
+        prueba = f"{linea_actual} {palabra}".strip()
+        if pdf.get_string_width(prueba) <= ancho:
+            linea_actual = prueba
+        else:
+            if linea_actual:
+                lineas.append(linea_actual)
+            linea_actual = palabra
+    if linea_actual:
+        lineas.append(linea_actual)
+    if not lineas:
+        lineas = [texto[:max_corte] + "..." if len(texto) > max_corte else texto]
+    return lineas
+
+def medir(nombre, funcion, textos, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(textos)
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"{nombre:<28} {mejor * 1000:9.2f} ms  ({mejor / len(textos) * 1e6:7.2f} µs/fila)")
+    return mejor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facturas", type=int, default=300)
+    parser.add_argument("--filas", type=int, default=40)
+    parser.add_argument("--productos", type=int, default=500, help="Tamaño del catálogo del que salen las filas")
+    args = parser.parse_args()
+
+    nombres = catalogo(args.productos)
+    rnd = random.Random(11)
+    textos = [rnd.choice(nombres) for _ in range(args.facturas * args.filas)]
+    # Columna Producto del PDF: 195.9 - 102 mm, menos 4 mm de margen
+    ancho, tamano = 195.9 - 102 - 4, 8
+
+    pdf = FPDF(unit='mm')
+    pdf.add_page()
+    pdf.set_font("Arial", '', tamano)
+
+    def anterior(ts):
+        for t in ts:
+            ajuste_anterior(pdf, t, ancho, 45)
+
+    def nuevo(ts):
+        for t in ts:
+            ajuste_texto.ajustar_texto(t, "helvetica", "", tamano, ancho, 45)
+
+    def nuevo_frio(ts):
+        ajuste_texto.ajustar_texto.cache_clear()
+        ajuste_texto.ancho_palabra.cache_clear()
+        nuevo(ts)
+
+    # Mismos cortes de línea que el método anterior
+    for t in set(textos):
+        assert tuple(ajuste_anterior(pdf, t, ancho, 45)) == ajuste_texto.ajustar_texto(t, "helvetica", "", tamano, ancho, 45), t
+
+    print(f"{len(textos)} filas ({args.facturas} facturas x {args.filas}), catálogo de {len(nombres)} productos")
+    base = medir("anterior (get_string_width)", anterior, textos)
+    frio = medir("nuevo, caché fría", nuevo_frio, textos)
+    caliente = medir("nuevo, caché caliente", nuevo, textos)
+    print(f"aceleración: {base / frio:.1f}x en frío, {base / caliente:.1f}x con caché")
+
+if __name__ == "__main__":
+    main()
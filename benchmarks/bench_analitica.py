@@ -0,0 +1,61 @@
+"""Micro-benchmark de la analítica de campaña (tabla columnar y agrupaciones).
+
+Arma facturas sintéticas (por defecto 1.000 facturas de 100 líneas = 100.000
+líneas), mide cuánto tarda en armarse la tabla de la campaña y cada
+agrupación, y lo compara con recorrer las líneas fila a fila en Python.
+
+    python benchmarks/bench_analitica.py [--facturas 1000] [--lineas 100]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analitica import AGRUPACIONES, agrupar, tabla_campana
+from lineas import LineasFactura
+from suite import factura_sintetica
+
+def medir(nombre, funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"{nombre:<28} p50 {statistics.median(tiempos) * 1000:9.1f} ms   mín {min(tiempos) * 1000:9.1f} ms")
+    return resultado
+
+def por_producto_fila_a_fila(facturas):
+    """Lo que había que hacer antes: recorrer cada línea de cada factura"""
+    grupos = defaultdict(lambda: [0, 0, 0])
+    for factura in facturas:
+        for fila in factura["productos"]:
+            if fila["Prod"].strip():
+                grupo = grupos[fila["Prod"]]
+                grupo[0] += fila["Cant"] * fila["Cat_U"]
+                grupo[1] += fila["Cant"] * fila["List_U"]
+                grupo[2] += fila["Cant"] * (fila["Cat_U"] - fila["List_U"])
+    return grupos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facturas", type=int, default=1000)
+    parser.add_argument("--lineas", type=int, default=100)
+    args = parser.parse_args()
+
+    facturas = [
+        {"cliente": f"Cliente {i}", "productos": LineasFactura(factura_sintetica(args.lineas, semilla=i))}
+        for i in range(args.facturas)
+    ]
+    tabla_campana(facturas[:1])  # importa pandas fuera de la medición
+    tabla = medir(f"tabla ({args.facturas * args.lineas} líneas)", lambda: tabla_campana(facturas))
+    for nombre, columna in AGRUPACIONES.items():
+        medir(f"agrupar por {nombre.lower()}", lambda: agrupar(tabla, columna))
+    medir("fila a fila (antes)", lambda: por_producto_fila_a_fila(facturas), repeticiones=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark de arranque en frío de la app: primer pintado y costo de cada rerun.
+
+Cada medición corre en un proceso nuevo (como un worker recién creado por el
+autoscaler) con Streamlit ya importado, igual que en el servidor. Se mide el
+primer `run()` de la app (imports + script), los reruns siguientes y qué
+librerías pesadas quedaron cargadas tras el primer pintado.
+
+    python benchmarks/bench_arranque.py [--repeticiones 5] [--reruns 10]
+    python benchmarks/bench_arranque.py --comparar /ruta/a/otra/copia/app.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PESADAS = ["pandas", "pyarrow", "fpdf", "pypdf", "PIL", "numpy"]
+
+def medir_en_proceso(app, reruns):
+    """Se ejecuta en el proceso hijo: imprime un JSON con los tiempos"""
+    import streamlit  # noqa: F401 (el servidor ya lo tiene cargado)
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+    at = AppTest.from_file(app, default_timeout=120)
+    inicio = time.perf_counter()
+    at.run()
+    primer_pintado = time.perf_counter() - inicio
+    cargadas = [m for m in PESADAS if m in sys.modules]
+
+    tiempos = []
+    for _ in range(reruns):
+        inicio = time.perf_counter()
+        at.run()
+        tiempos.append(time.perf_counter() - inicio)
+    print(json.dumps({
+        "primer_pintado": primer_pintado, "reruns": tiempos, "cargadas": cargadas,
+        "error": str(at.exception[0].value) if at.exception else None,
+    }))
+
+def medir(app, repeticiones, reruns):
+    primeros, reruns_p50, cargadas = [], [], None
+    for _ in range(repeticiones):
+        entorno = dict(os.environ, FACTURAS_DB=os.path.join(tempfile.mkdtemp(), "facturas.db"))
+        salida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--hijo", app, "--reruns", str(reruns)],
+            capture_output=True, text=True, env=entorno, check=True,
+        ).stdout
+        resultado = json.loads(salida.strip().splitlines()[-1])
+        if resultado["error"]:
+            raise RuntimeError(resultado["error"])
+        primeros.append(resultado["primer_pintado"])
+        reruns_p50.append(statistics.median(resultado["reruns"]))
+        cargadas = resultado["cargadas"]
+    return {
+        "primer_pintado_ms": statistics.median(primeros) * 1000,
+        "rerun_ms": statistics.median(reruns_p50) * 1000,
+        "cargadas": cargadas,
+    }
+
+def imprimir(nombre, r):
+    print(f"{nombre:<10} primer pintado {r['primer_pintado_ms']:8.1f} ms   rerun p50 {r['rerun_ms']:7.1f} ms"
+          f"   cargadas: {', '.join(r['cargadas']) or '—'}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(RAIZ, "app.py"))
+    parser.add_argument("--comparar", help="Otra app.py (p. ej. una copia de una versión anterior)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        medir_en_proceso(args.hijo, args.reruns)
+        return
+
+    actual = medir(args.app, args.repeticiones, args.reruns)
+    imprimir("actual", actual)
+    if args.comparar:
+        otra = medir(args.comparar, args.repeticiones, args.reruns)
+        imprimir("comparada", otra)
+        print(f"primer pintado {otra['primer_pintado_ms'] / actual['primer_pintado_ms']:.2f}x más rápido, "
+              f"rerun {otra['rerun_ms'] / actual['rerun_ms']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Micro-benchmark del índice de catálogo (autocompletado y precios automáticos).
+
+Arma un catálogo sintético en CSV, mide cuánto tarda en construirse el índice y
+la latencia por consulta (prefijo, texto interno, código y búsqueda exacta por
+página + nombre), comparada con recorrer la lista completa.
+
+    python benchmarks/bench_catalogo.py [--productos 20000] [--consultas 2000]
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalogo import IndiceCatalogo, normalizar
+
+MARCAS = ["Esika", "L'Bel", "Cyzone", "Natura", "Avon", "Yanbal", "Ebel", "Nivea"]
+PRODUCTOS = [
+    "Crema hidratante facial con ácido hialurónico y vitamina E",
+    "Perfume para dama Bleu Intense edición limitada 50 ml",
+    "Base de maquillaje líquida matificante larga duración FPS 15",
+    "Set de regalo colonia + desodorante roll-on + loción corporal",
+    "Labial líquido mate con aplicador de precisión tono rojo pasión",
+    "Shampoo reparación profunda para cabello teñido 400 ml",
+    "Reloj análogo para caballero correa de cuero sintético",
+    "Juego de ollas antiadherentes 5 piezas con tapa de vidrio",
+]
+
+def catalogo_csv(n, semilla=3):
+    rnd = random.Random(semilla)
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(["Pag", "Prod", "Cat_U", "List_U", "Codigo"])
+    for i in range(n):
+        escritor.writerow([
+            rnd.randint(1, 180), f"{rnd.choice(MARCAS)} {rnd.choice(PRODUCTOS)} ref. {i}",
+            rnd.randint(50, 2500) * 100, rnd.randint(30, 1800) * 100, f"{rnd.choice('ABCDEFG')}{i:05d}",
+        ])
+    return salida.getvalue().encode("utf-8")
+
+def medir(nombre, funcion, consultas):
+    tiempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        funcion(consulta)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+    print(f"{nombre:<26} p50 {statistics.median(tiempos) * 1e6:9.1f} µs   p95 {p95 * 1e6:9.1f} µs")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--productos", type=int, default=20000)
+    parser.add_argument("--consultas", type=int, default=2000)
+    args = parser.parse_args()
+
+    datos = catalogo_csv(args.productos)
+    inicio = time.perf_counter()
+    indice = IndiceCatalogo.desde_archivo(datos, "catalogo.csv")
+    print(f"Índice de {len(indice)} productos en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    rnd = random.Random(11)
+    elegidos = [rnd.choice(indice.productos) for _ in range(args.consultas)]
+    prefijos = [p["Prod"][:rnd.randint(2, 12)] for p in elegidos]
+    internos = [p["Prod"].split()[rnd.randint(1, 4)][:6] for p in elegidos]
+    codigos = [p["Codigo"][:4] for p in elegidos]
+
+    medir("prefijo", indice.buscar, prefijos)
+    medir("texto interno", indice.buscar, internos)
+    medir("código", indice.buscar, codigos)
+    medir("exacto (página + nombre)", lambda p: indice.producto(p["Pag"], p["Prod"]), elegidos)
+
+    nombres = [normalizar(p["Prod"]) for p in indice.productos]
+    recorrido = lambda texto: [n for n in nombres if normalizar(texto) in n][:8]
+    medir("recorrido lineal (antes)", recorrido, internos[:200])
+
+if __name__ == "__main__":
+    main()
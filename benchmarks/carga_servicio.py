@@ -0,0 +1,115 @@
+"""Prueba de carga del servicio HTTP de facturas (servicio.py).
+
+Levanta el servicio en un puerto libre (o usa uno ya corriendo con --url),
+envía facturas sintéticas desde varios hilos a la vez y reporta rendimiento,
+latencias p50/p95/p99, respuestas por código (503 = sin cupo) y las métricas
+que publica el propio servicio.
+
+    python benchmarks/carga_servicio.py [--peticiones 200] [--concurrencia 8] [--lineas 50]
+    python benchmarks/carga_servicio.py --url http://127.0.0.1:8502 --concurrencia 32
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import factura_sintetica
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def obtener_json(url):
+    with urllib.request.urlopen(url, timeout=5) as respuesta:
+        return json.loads(respuesta.read())
+
+def esperar_servicio(url, limite=60):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        try:
+            return obtener_json(url + "/salud")
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El servicio no respondió en {limite}s")
+
+def enviar(url, cuerpo):
+    """(código HTTP, segundos, bytes recibidos)"""
+    peticion = urllib.request.Request(url + "/factura", data=cuerpo, headers={"Content-Type": "application/json"})
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(peticion, timeout=120) as respuesta:
+            datos = respuesta.read()
+            return respuesta.status, time.perf_counter() - inicio, len(datos)
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, time.perf_counter() - inicio, 0
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Servicio ya corriendo; si no se indica se levanta uno")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del servicio que se levanta")
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--lineas", type=int, default=50)
+    args = parser.parse_args()
+
+    proceso = None
+    url = args.url
+    if url is None:
+        puerto = puerto_libre()
+        url = f"http://127.0.0.1:{puerto}"
+        comando = [sys.executable, os.path.join(RAIZ, "servicio.py"), "--puerto", str(puerto)]
+        if args.procesos:
+            comando += ["--procesos", str(args.procesos)]
+        proceso = subprocess.Popen(comando, cwd=RAIZ)
+    try:
+        inicio = time.perf_counter()
+        salud = esperar_servicio(url)
+        print(f"Servicio listo ({salud['procesos']} procesos) en {time.perf_counter() - inicio:.1f}s")
+
+        cuerpos = [
+            json.dumps({"cliente": f"Cliente {i}", "fecha": "2026-01-15",
+                        "productos": factura_sintetica(args.lineas, semilla=i)}).encode("utf-8")
+            for i in range(args.peticiones)
+        ]
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as hilos:
+            resultados = list(hilos.map(lambda cuerpo: enviar(url, cuerpo), cuerpos))
+        segundos = time.perf_counter() - inicio
+
+        codigos = Counter(codigo for codigo, _, _ in resultados)
+        ok = [t for codigo, t, _ in resultados if codigo == 200]
+        print(f"{len(resultados)} peticiones ({args.concurrencia} a la vez, {args.lineas} líneas) en {segundos:.2f}s "
+              f"→ {len(ok) / segundos:.1f} PDF/s")
+        print("Códigos: " + ", ".join(f"{codigo}: {n}" for codigo, n in sorted(codigos.items())))
+        if ok:
+            print(f"Latencia p50 {statistics.median(ok) * 1000:.1f} ms   p95 {percentil(ok, 0.95) * 1000:.1f} ms   "
+                  f"p99 {percentil(ok, 0.99) * 1000:.1f} ms")
+        metricas = obtener_json(url + "/metricas")
+        renderizar = metricas["latencias"].get("renderizar", {})
+        print(f"Servicio: {metricas['atendidas']} atendidas, {metricas['rechazadas']} rechazadas, "
+              f"cola {metricas['cola']}, renderizar p50 {renderizar.get('p50_s', 0) * 1000:.1f} ms "
+              f"p95 {renderizar.get('p95_s', 0) * 1000:.1f} ms")
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+if __name__ == "__main__":
+    main()
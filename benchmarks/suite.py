@@ -0,0 +1,257 @@
+"""Suite de benchmarks: renderizado de PDF, re-importación y costo de un rerun de la app.
+
+Genera facturas sintéticas (1, 50, 500 y 5.000 líneas, con y sin logos/QR) y
+mide latencia p50/p95, memoria pico (tracemalloc) y tamaño de salida. El
+renderizado se mide devolviendo los bytes y en modo streaming (`/streaming`),
+escribiendo cada página en un archivo temporal. La importación se mide con los
+datos embebidos, por texto y con el PDF ya conocido por su huella (`/conocido`).
+
+    python benchmarks/suite.py                          # todo, imprime la tabla
+    python benchmarks/suite.py --rapido                 # menos repeticiones, sin 5.000 líneas
+    python benchmarks/suite.py --guardar benchmarks/baseline.json
+    python benchmarks/suite.py --comparar benchmarks/baseline.json [--tolerancia 0.15]
+
+benchmarks/baseline.json es la línea base versionada; guarda la máquina y la
+versión de Python con que se midió, y --comparar las muestra junto a las actuales.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from PIL import Image
+
+from factura_pdf import marca_vacia, renderizar_factura
+from importador import huella_archivo, importar_datos_pdf, importar_lote
+
+TAMANOS = [1, 50, 500, 5000]
+
+PRODUCTOS = [
+    "Crema hidratante facial con ácido hialurónico y vitamina E",
+    "Perfume para dama Bleu Intense edición limitada 50 ml",
+    "Base de maquillaje líquida matificante larga duración FPS 15",
+    "Set de regalo colonia + desodorante roll-on + loción corporal",
+    "Labial líquido mate tono rojo pasión",
+    "Shampoo reparación profunda 400 ml",
+    "Reloj análogo para caballero",
+    "Juego de ollas antiadherentes 5 piezas con tapa de vidrio templado",
+]
+
+# --- DATOS SINTÉTICOS ---
+def factura_sintetica(n_lineas, semilla=0):
+    rnd = random.Random(semilla)
+    return [
+        {
+            "Pag": str(rnd.randint(1, 180)),
+            "Prod": rnd.choice(PRODUCTOS),
+            "Cant": rnd.randint(1, 6),
+            "Cat_U": rnd.randint(5, 250) * 100,
+            "List_U": rnd.randint(3, 180) * 100,
+        }
+        for _ in range(n_lineas)
+    ]
+
+def _imagen(modo, tamano, formato, color):
+    buffer = io.BytesIO()
+    Image.new(modo, tamano, color).save(buffer, formato)
+    return buffer.getvalue()
+
+def marca_sintetica(con_imagenes):
+    marca = marca_vacia()
+    marca["num_pago"] = "Nequi 300 000 0000"
+    if con_imagenes:
+        marca["logo_rev"] = _imagen("RGBA", (300, 120), "PNG", (200, 30, 90, 180))
+        marca["logo_pago"] = _imagen("RGB", (200, 200), "JPEG", (90, 20, 160))
+        marca["qr_pago"] = _imagen("L", (400, 400), "PNG", 0)
+    return marca
+
+# --- MEDICIÓN ---
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+def medir(funcion, repeticiones, calentamiento=1):
+    """Ejecuta `funcion` y devuelve p50/p95 (ms), memoria pico (KiB) y el último resultado"""
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    # La memoria se mide en una corrida aparte: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_ms": round(statistics.median(tiempos) * 1000, 3),
+        "p95_ms": round(percentil(tiempos, 0.95) * 1000, 3),
+        "pico_kib": round(pico / 1024, 1),
+        "n": repeticiones,
+    }, resultado
+
+def _repeticiones(n_lineas, rapido):
+    base = 3 if rapido else 15
+    return max(2, base if n_lineas <= 500 else base // 3)
+
+def bench_renderizado(tamanos, rapido):
+    resultados = {}
+    for con_imagenes in (False, True):
+        marca = marca_sintetica(con_imagenes)
+        for n in tamanos:
+            filas = factura_sintetica(n, semilla=n)
+            nombre = f"render/{n}_lineas/{'con' if con_imagenes else 'sin'}_marca"
+            metricas, pdf = medir(lambda: renderizar_factura("Cliente Benchmark", date(2026, 1, 15), filas, marca),
+                                  _repeticiones(n, rapido))
+            metricas["bytes"] = len(pdf)
+            resultados[nombre] = metricas
+            _imprimir_render(nombre, metricas)
+
+            nombre += "/streaming"
+            metricas, escritos = medir(lambda: _renderizar_streaming(filas, marca), _repeticiones(n, rapido))
+            metricas["bytes"] = escritos
+            resultados[nombre] = metricas
+            _imprimir_render(nombre, metricas)
+    return resultados
+
+def _renderizar_streaming(filas, marca):
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as destino:
+        return renderizar_factura("Cliente Benchmark", date(2026, 1, 15), filas, marca, destino)
+
+def _imprimir_render(nombre, metricas):
+    print(f"  {nombre:<46} p50 {metricas['p50_ms']:>9.2f} ms  p95 {metricas['p95_ms']:>9.2f} ms  "
+          f"pico {metricas['pico_kib']:>9.1f} KiB  {metricas['bytes']:>9} B", flush=True)
+
+def bench_importacion(tamanos, rapido):
+    resultados = {}
+    marca = marca_sintetica(False)
+    for n in tamanos:
+        pdf = renderizar_factura("Cliente Benchmark", date(2026, 1, 15), factura_sintetica(n, semilla=n), marca)
+        # "conocido": el mismo PDF ya está en el índice de huellas y no se abre
+        conocidas = {huella_archivo(pdf): {"cliente": "Cliente Benchmark"}}
+        importar = {
+            "embebido": lambda: importar_datos_pdf(pdf, usar_embebidos=True),
+            "texto": lambda: importar_datos_pdf(pdf, usar_embebidos=False),
+            "conocido": lambda: next(importar_lote([("factura.pdf", pdf)], conocida=conocidas.get)),
+        }
+        for modo, funcion in importar.items():
+            nombre = f"import/{n}_lineas/{modo}"
+            metricas, res = medir(funcion, _repeticiones(n, rapido))
+            metricas["filas"] = len(res["productos"] or [])
+            resultados[nombre] = metricas
+            print(f"  {nombre:<36} p50 {metricas['p50_ms']:>9.2f} ms  p95 {metricas['p95_ms']:>9.2f} ms  "
+                  f"pico {metricas['pico_kib']:>9.1f} KiB  {metricas['filas']:>6} filas", flush=True)
+    return resultados
+
+def bench_rerun(tamanos, rapido, n_facturas=(1, 10)):
+    """Tiempo de un rerun completo del script (AppTest) con facturas ya cargadas"""
+    from streamlit.testing.v1 import AppTest
+
+    resultados = {}
+    tmp = tempfile.mkdtemp(prefix="bench_app_")
+    os.environ["FACTURAS_DB"] = os.path.join(tmp, "facturas.db")
+    for facturas in n_facturas:
+        for n in tamanos:
+            if n > 500:
+                continue  # El editor por filas no está pensado para 5.000 widgets
+            at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=600)
+            at.session_state["facturas"] = [{"id": i, "name": f"Cliente {i}"} for i in range(facturas)]
+            at.session_state["next_factura_id"] = facturas
+            at.session_state["datos"] = {f"f_{i}": factura_sintetica(n, semilla=i) for i in range(facturas)}
+            at.run()
+            nombre = f"rerun/{facturas}_facturas/{n}_lineas"
+            metricas, _ = medir(at.run, _repeticiones(n, rapido), calentamiento=0)
+            resultados[nombre] = metricas
+            print(f"  {nombre:<36} p50 {metricas['p50_ms']:>9.2f} ms  p95 {metricas['p95_ms']:>9.2f} ms  "
+                  f"pico {metricas['pico_kib']:>9.1f} KiB", flush=True)
+    return resultados
+
+# --- LÍNEA BASE ---
+def _procesador():
+    """Modelo de CPU (platform.processor() suele venir vacío en Linux)"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            return next(l.split(":", 1)[1].strip() for l in f if l.startswith("model name"))
+    except (OSError, StopIteration):
+        return platform.processor()
+
+def _entorno(datos):
+    return (f"Python {datos['python']} ({datos.get('implementacion', '?')}), {datos.get('sistema', '?')}, "
+            f"{datos.get('procesador') or datos['maquina']}, {datos['cpus']} CPU")
+
+def comparar(actual, base, tolerancia):
+    """Imprime las diferencias contra la línea base; devuelve la cantidad de regresiones"""
+    regresiones = 0
+    print(f"\nComparación con la línea base ({base['fecha']}, tolerancia {tolerancia:.0%}):")
+    print(f"  base:   {_entorno(base)}\n  actual: {_entorno(actual)}")
+    if _entorno(base) != _entorno(actual):
+        print("  (otra máquina o versión de Python: las diferencias no son solo del código)")
+    for nombre, metricas in actual["resultados"].items():
+        previo = base["resultados"].get(nombre)
+        if not previo:
+            continue
+        cambio = metricas["p50_ms"] / previo["p50_ms"] - 1 if previo["p50_ms"] else 0.0
+        marca = "REGRESIÓN" if cambio > tolerancia else ""
+        regresiones += bool(marca)
+        print(f"  {nombre:<36} {previo['p50_ms']:>9.2f} → {metricas['p50_ms']:>9.2f} ms  {cambio:+7.1%}  {marca}")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rapido", action="store_true")
+    parser.add_argument("--solo", choices=["render", "import", "rerun"], action="append")
+    parser.add_argument("--guardar", help="Escribe los resultados como línea base JSON")
+    parser.add_argument("--comparar", help="Compara contra una línea base JSON")
+    parser.add_argument("--tolerancia", type=float, default=0.15)
+    args = parser.parse_args()
+
+    tamanos = TAMANOS[:-1] if args.rapido else TAMANOS
+    grupos = args.solo or ["render", "import", "rerun"]
+    resultados = {}
+    if "render" in grupos:
+        print("Renderizado de PDF:")
+        resultados.update(bench_renderizado(tamanos, args.rapido))
+    if "import" in grupos:
+        print("Importación de PDF:")
+        resultados.update(bench_importacion(tamanos, args.rapido))
+    if "rerun" in grupos:
+        print("Rerun de la app (AppTest):")
+        resultados.update(bench_rerun(tamanos, args.rapido))
+
+    actual = {
+        "fecha": date.today().isoformat(),
+        "python": platform.python_version(),
+        "implementacion": platform.python_implementation(),
+        "sistema": platform.platform(),
+        "maquina": platform.machine(),
+        "procesador": _procesador(),
+        "cpus": os.cpu_count(),
+        "resultados": resultados,
+    }
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(actual, f, indent=2, ensure_ascii=False)
+        print(f"\nLínea base guardada en {args.guardar}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(actual, base, args.tolerancia):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import hashlib
+import io
+import json
+import os
+import threading
+
+from lineas import filas_validas
+from imagenes import huella_imagen
+
+# --- CACHÉ DE PDF RENDERIZADOS ---
+# La clave es un hash del contenido de la factura (cliente, fecha, filas, marca
+# y huellas de sus imágenes): cualquier edición cambia la clave, y dos facturas
+# idénticas (o una descarga repetida) comparten el mismo PDF ya generado.
+# Una entrada son los bytes del PDF o la ruta del archivo donde se escribió
+# (`guardar_archivo`): así el PDF no pasa por la memoria hasta que se sirve.
+
+MAX_BYTES_POR_DEFECTO = 64 * 1024 * 1024
+
+def clave_render(cliente, fecha, filas, marca, variante="completa"):
+    """Hash del contenido que determina el PDF"""
+    imagenes = {
+        campo: huella_imagen(marca[campo]) if marca.get(campo) else None
+        for campo in ("logo_rev", "logo_pago", "qr_pago")
+    }
+    validas = filas_validas(filas)
+    contenido = [
+        variante, cliente, fecha.isoformat(),
+        [list(f) for f in zip(validas.pag, validas.prod, *(validas.columna(c).tolist() for c in ("Cant", "Cat_U", "List_U")))],
+        marca.get("nombre_rev", ""), marca.get("num_pago", ""), imagenes,
+    ]
+    return hashlib.sha256(json.dumps(contenido, ensure_ascii=False, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+class CacheRender:
+    """LRU de PDFs renderizados acotada por el total de bytes guardados (en memoria o en disco)"""
+
+    def __init__(self, max_bytes=MAX_BYTES_POR_DEFECTO):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # clave -> (bytes | ruta, tamaño)
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _buscar(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def obtener(self, clave):
+        """Bytes del PDF guardado, o None"""
+        valor = self._buscar(clave)
+        if not isinstance(valor, str):
+            return valor
+        try:
+            with open(valor, "rb") as archivo:
+                return archivo.read()
+        except OSError:
+            self.descartar(clave)
+            return None
+
+    def abrir(self, clave):
+        """Archivo binario (abierto, al principio) con el PDF guardado, o None; lo cierra quien lo usa"""
+        valor = self._buscar(clave)
+        if not isinstance(valor, str):
+            return None if valor is None else io.BytesIO(valor)
+        try:
+            return open(valor, "rb")
+        except OSError:
+            self.descartar(clave)
+            return None
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._entradas
+
+    def guardar(self, clave, datos):
+        self._agregar(clave, datos, len(datos))
+
+    def guardar_archivo(self, clave, ruta):
+        """Guarda el PDF ya escrito en `ruta`; el archivo pasa a ser de la caché y se borra al salir"""
+        self._agregar(clave, ruta, os.path.getsize(ruta))
+
+    def _agregar(self, clave, valor, tamano):
+        if tamano > self.max_bytes:
+            _borrar(valor)
+            return
+        expulsados = []
+        with self._lock:
+            previo = self._entradas.pop(clave, None)
+            if previo is not None:
+                self.bytes -= previo[1]
+                expulsados.append(previo[0])
+            self._entradas[clave] = (valor, tamano)
+            self.bytes += tamano
+            while self.bytes > self.max_bytes:
+                _, (expulsado, tamano_expulsado) = self._entradas.popitem(last=False)
+                self.bytes -= tamano_expulsado
+                expulsados.append(expulsado)
+        for expulsado in expulsados:
+            if expulsado != valor:
+                _borrar(expulsado)
+
+    def descartar(self, clave):
+        with self._lock:
+            entrada = self._entradas.pop(clave, None)
+            if entrada is not None:
+                self.bytes -= entrada[1]
+        if entrada is not None:
+            _borrar(entrada[0])
+
+    def obtener_o_renderizar(self, clave, renderizar):
+        """Devuelve el PDF guardado o lo genera con `renderizar()` y lo guarda"""
+        datos = self.obtener(clave)
+        if datos is None:
+            datos = renderizar()
+            self.guardar(clave, datos)
+        return datos
+
+    def __len__(self):
+        return len(self._entradas)
+
+def _borrar(valor):
+    # Solo las entradas en disco dejan algo que borrar
+    if isinstance(valor, str):
+        try:
+            os.remove(valor)
+        except OSError:
+            pass
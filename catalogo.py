@@ -0,0 +1,137 @@
+import bisect
+import csv
+import io
+import os
+import unicodedata
+
+from lineas import a_entero
+
+# --- CATÁLOGO DE PRODUCTOS ---
+# El catálogo de la campaña (CSV o Excel con las columnas Pag, Prod, Cat_U,
+# List_U y opcionalmente Codigo) se carga una vez en un índice en memoria:
+#   * nombres normalizados ordenados, para buscar por prefijo con bisect;
+#   * trigramas de cada nombre, para encontrar un texto en cualquier parte;
+#   * dicts por (página, nombre/código) y por nombre/código, para completar precios.
+#
+# producto = {"Pag": str, "Prod": str, "Cat_U": int, "List_U": int, "Codigo": str}
+
+COLUMNA_CODIGO = ("Codigo", "Código")
+
+# Resultados que devuelve una búsqueda por defecto
+MAX_SUGERENCIAS = 8
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con un solo espacio entre palabras"""
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def _producto(registro):
+    codigo = next((registro[c] for c in COLUMNA_CODIGO if registro.get(c) not in (None, "")), "")
+    return {
+        "Pag": str(registro.get("Pag") or "").strip(),
+        "Prod": str(registro.get("Prod") or "").strip(),
+        "Cat_U": a_entero(registro.get("Cat_U")),
+        "List_U": a_entero(registro.get("List_U")),
+        "Codigo": str(codigo).strip(),
+    }
+
+def _registros_csv(datos):
+    return csv.DictReader(io.StringIO(datos.decode("utf-8-sig")))
+
+def _registros_excel(datos):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Leer Excel requiere openpyxl: pip install openpyxl")
+    libro = load_workbook(io.BytesIO(datos), read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        columnas = [str(c).strip() if c is not None else "" for c in next(filas, ())]
+        return [dict(zip(columnas, fila)) for fila in filas]
+    finally:
+        libro.close()
+
+def leer_catalogo(datos, nombre):
+    """Productos de un catálogo CSV o Excel (bytes del archivo); `nombre` define el formato"""
+    ext = os.path.splitext(nombre)[1].lower()
+    if ext == ".csv":
+        registros = _registros_csv(datos)
+    elif ext in (".xlsx", ".xlsm"):
+        registros = _registros_excel(datos)
+    else:
+        raise ValueError(f"Formato de catálogo no soportado: {ext}")
+    return [p for p in map(_producto, registros) if p["Prod"]]
+
+class IndiceCatalogo:
+    """Índice en memoria del catálogo: autocompletado por nombre y precios por página/código"""
+
+    def __init__(self, productos):
+        self.productos = list(productos)
+        self._normalizados = []
+        self._trigramas = {}
+        self._por_pagina = {}
+        self._por_clave = {}
+        for i, producto in enumerate(self.productos):
+            nombre = normalizar(producto["Prod"])
+            self._normalizados.append(nombre)
+            for trigrama in trigramas(nombre):
+                self._trigramas.setdefault(trigrama, []).append(i)
+            pagina = producto["Pag"].strip()
+            for clave in filter(None, (nombre, normalizar(producto["Codigo"]))):
+                # Ante repetidos gana la primera aparición en el archivo
+                self._por_pagina.setdefault((pagina, clave), i)
+                self._por_clave.setdefault(clave, i)
+        # Prefijos: nombres y códigos en un mismo arreglo ordenado
+        codigos = ((normalizar(p["Codigo"]), i) for i, p in enumerate(self.productos) if p["Codigo"])
+        self._nombres = sorted([(n, i) for i, n in enumerate(self._normalizados)] + list(codigos))
+        self._solo_nombres = [n for n, _ in self._nombres]
+
+    @classmethod
+    def desde_archivo(cls, datos, nombre):
+        return cls(leer_catalogo(datos, nombre))
+
+    def __len__(self):
+        return len(self.productos)
+
+    def buscar(self, texto, limite=MAX_SUGERENCIAS):
+        """Productos cuyo nombre o código empieza por `texto` y luego los que lo contienen"""
+        consulta = normalizar(texto)
+        if not consulta:
+            return []
+        encontrados = []
+        vistos = set()
+        posicion = bisect.bisect_left(self._solo_nombres, consulta)
+        while (len(encontrados) < limite and posicion < len(self._nombres)
+               and self._solo_nombres[posicion].startswith(consulta)):
+            i = self._nombres[posicion][1]
+            if i not in vistos:
+                encontrados.append(i)
+                vistos.add(i)
+            posicion += 1
+        if len(encontrados) < limite and len(consulta) >= 3:
+            for i in self._contienen(consulta):
+                if i not in vistos:
+                    encontrados.append(i)
+                    if len(encontrados) >= limite:
+                        break
+        return [self.productos[i] for i in encontrados]
+
+    def _contienen(self, consulta):
+        """Ids cuyo nombre contiene `consulta`, en orden, recorriendo solo los del trigrama más raro"""
+        listas = [self._trigramas.get(t, ()) for t in trigramas(consulta)]
+        candidatos = min(listas, key=len)
+        return (i for i in candidatos if consulta in self._normalizados[i])
+
+    def producto(self, pag, prod):
+        """Producto del catálogo para una línea (por página y nombre o código), o None"""
+        clave = normalizar(prod)
+        if not clave:
+            return None
+        i = self._por_pagina.get((str(pag or "").strip(), clave))
+        if i is None:
+            i = self._por_clave.get(clave)
+        return None if i is None else self.productos[i]
@@ -0,0 +1,111 @@
+import tempfile
+
+from cache_pdf import clave_render
+from factura_pdf import (dibujar_factura, dibujar_factura_simplificada, nuevo_pdf, renderizar_con_respaldo,
+                         salida_pdf)
+from lineas import filas_validas
+from lote import DestinoArchivos, nombre_archivo
+
+# --- EXPORTACIÓN DE VARIAS FACTURAS ---
+# Todas las facturas abiertas en un solo archivo: un PDF combinado (cada factura
+# desde una página nueva, con un marcador por cliente) o un ZIP con un PDF por
+# factura. Se recorren una sola vez y la salida va a un archivo temporal que
+# pasa a disco cuando crece, en lugar de acumular todos los PDFs en memoria.
+#
+# factura = {"cliente": str, "fecha": date, "productos": [filas]}
+
+# Hasta este tamaño el archivo temporal vive en memoria
+MAX_BYTES_EN_MEMORIA = 8 * 1024 * 1024
+
+def _titulo(factura, numero):
+    return factura["cliente"] or f"Factura {numero}"
+
+def _pagina_omitidas(pdf, omitidas):
+    """Última página del PDF combinado con las facturas que no se pudieron dibujar"""
+    pdf.add_page()
+    pdf.set_font(pdf.familia, 'B', 14)
+    pdf.cell(0, 10, pdf.texto("Facturas no incluidas"), 0, 1)
+    pdf.set_font(pdf.familia, '', 11)
+    pdf.multi_cell(0, 6, pdf.texto("No se pudieron generar (ni con el formato simplificado):"))
+    for titulo in omitidas:
+        pdf.cell(0, 6, pdf.texto(f"- {titulo}"), 0, 1)
+
+def exportar_pdf_combinado(facturas, marca, destino):
+    """Escribe en `destino` (vacío) un único PDF con todas las facturas; devuelve (incluidas, omitidas).
+
+    Las imágenes de marca se embeben una sola vez: todas las páginas
+    apuntan al mismo objeto. Cada factura se dibuja en un bloque deshacible:
+    si falla se descartan sus páginas y se prueba el formato simplificado; si
+    ese también falla, la factura se omite y se lista en una página al final.
+    """
+    pdf = nuevo_pdf(destino)
+    total, omitidas = 0, []
+    for factura in facturas:
+        if not filas_validas(factura["productos"]):
+            continue
+        pagina = pdf.page + 1
+        args = (pdf, factura["cliente"], factura["fecha"], factura["productos"], marca)
+        for dibujar in (dibujar_factura, dibujar_factura_simplificada):
+            try:
+                with pdf.deshacible():
+                    dibujar(*args)
+                break
+            except Exception:
+                continue
+        else:
+            omitidas.append(_titulo(factura, total + len(omitidas) + 1))
+            continue
+        pdf.marcador(_titulo(factura, total + len(omitidas) + 1), pagina)
+        total += 1
+    if omitidas:
+        _pagina_omitidas(pdf, omitidas)
+    if total or omitidas:
+        salida_pdf(pdf)
+    return total, omitidas
+
+def exportar_zip(facturas, marca, destino, cache=None):
+    """Escribe en `destino` un ZIP con un PDF por factura; devuelve (incluidas, omitidas).
+
+    Cada PDF se agrega al ZIP apenas se genera. Con `cache` (una `CacheRender`)
+    se reutilizan los PDFs ya generados desde la app. Las facturas que no se
+    pudieron generar se listan en `NO_INCLUIDAS.txt`.
+    """
+    zip_destino = DestinoArchivos(zip_path=destino)
+    total, omitidas = 0, []
+    try:
+        for factura in facturas:
+            cliente, fecha, filas = factura["cliente"], factura["fecha"], factura["productos"]
+            if not filas_validas(filas):
+                continue
+            datos = cache.obtener(clave_render(cliente, fecha, filas, marca)) if cache else None
+            simplificada = False
+            if datos is None:
+                datos, simplificada, _ = renderizar_con_respaldo(cliente, fecha, filas, marca)
+            if datos is None:
+                omitidas.append(_titulo(factura, total + len(omitidas) + 1))
+                continue
+            zip_destino.escribir(nombre_archivo(cliente, simplificada), datos)
+            total += 1
+        if omitidas:
+            zip_destino.escribir("NO_INCLUIDAS.txt", "\n".join(omitidas).encode("utf-8"))
+    finally:
+        zip_destino.cerrar()
+    return total, omitidas
+
+def exportar_facturas(facturas, marca, formato="pdf", cache=None):
+    """Archivo temporal con el PDF combinado (`formato="pdf"`) o el ZIP (`formato="zip"`), listo para leer.
+
+    Queda vacío si no hay facturas válidas. Pasa a disco cuando crece: se
+    entrega tal cual para que se lea (o se sirva) una sola vez; lo cierra quien lo usa.
+    """
+    destino = tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_EN_MEMORIA)
+    try:
+        if formato == "zip":
+            exportar_zip(facturas, marca, destino, cache)
+        else:
+            exportar_pdf_combinado(facturas, marca, destino)
+    except BaseException:
+        destino.close()
+        raise
+    destino.seek(0)
+    return destino
@@ -0,0 +1,802 @@
+from fpdf import FPDF
+from fpdf.php import UTF8ToUTF16BE
+import json
+import zlib
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
+from ajuste_texto import ajustar_texto, ancho_palabra
+from imagenes import CACHE_IMAGENES
+from lineas import filas_validas
+from perfil import tramo
+from tipografia import FAMILIA_UNICODE, codigos_subconjunto, registrar_fuente_unicode, subconjunto_ttf
+from totales import calcular_totales, fmt
+
+# --- RENDERIZADO DE FACTURAS (SIN STREAMLIT) ---
+# Este módulo no usa `st.*`: recibe datos planos y devuelve los bytes del PDF,
+# así la app, los procesos por lotes y los benchmarks comparten el mismo camino.
+#
+# marca = {
+#     "nombre_rev": str, "logo_rev": bytes | None,
+#     "num_pago": str, "logo_pago": bytes | None, "qr_pago": bytes | None,
+# }
+
+ENCABEZADOS = ["Pág", "Producto", "Cant", "P.Cat", "T.Cat", "P.List", "T.List", "Gan."]
+
+# Datos estructurados que viajan dentro del PDF para re-importarlo sin leer el texto
+ADJUNTO_DATOS = "factura.json"
+VERSION_DATOS = 1
+
+# CMap de identidad: en las fuentes Unicode el código de cada glifo es su punto de código.
+# Solo cubre los códigos del subconjunto: un lector de texto expande cada rango
+# código a código, y con <0000> <FFFF> eso eran 65.536 entradas por fuente
+_CMAP_INICIO = (
+    "/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+    "/CIDSystemInfo\n<</Registry (Adobe)\n/Ordering (UCS)\n/Supplement 0\n>> def\n"
+    "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+    "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+)
+_CMAP_FIN = "endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend"
+
+@lru_cache(maxsize=64)
+def _cmap_identidad(codigos):
+    """ToUnicode de identidad para `codigos` (ordenados), en rangos que no cruzan un byte alto"""
+    rangos = []
+    for codigo in codigos:
+        if rangos and codigo == rangos[-1][1] + 1 and codigo % 256:
+            rangos[-1][1] = codigo
+        else:
+            rangos.append([codigo, codigo])
+    # Cada sección bfrange admite hasta 100 entradas
+    secciones = [
+        "%d beginbfrange\n%s\nendbfrange\n" % (len(bloque), "\n".join("<%04X> <%04X> <%04X>" % (a, b, a) for a, b in bloque))
+        for bloque in (rangos[i:i + 100] for i in range(0, len(rangos), 100))
+    ]
+    return _CMAP_INICIO + "".join(secciones) + _CMAP_FIN
+
+def limpiar_texto_para_pdf(texto):
+    """Reemplaza caracteres problemáticos para las fuentes estándar (solo latin-1)"""
+    if not isinstance(texto, str):
+        texto = str(texto)
+    reemplazos = {
+        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
+        'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
+        'ñ': 'n', 'Ñ': 'N',
+        '´': "'", '`': "'",
+        '&': 'y'
+    }
+    for char, replacement in reemplazos.items():
+        texto = texto.replace(char, replacement)
+    return texto.encode('latin-1', 'replace').decode('latin-1')
+
+# Estado de dibujo de FPDF que se guarda y restaura alrededor de la grabación de una plantilla
+_ESTADO_DIBUJO = (
+    'font_family', 'font_style', 'font_size_pt', 'font_size', 'current_font', 'underline',
+    'draw_color', 'fill_color', 'text_color', 'color_flag', 'line_width', 'ws', 'lasth',
+)
+
+def marca_vacia():
+    """Marca por defecto, sin imágenes ni datos de pago"""
+    return {"nombre_rev": "MI REVISTA", "logo_rev": None, "num_pago": "", "logo_pago": None, "qr_pago": None}
+
+class _Acumulador:
+    """Reemplazo de `FPDF.buffer`: guarda los trozos en una lista y lleva el largo para los offsets"""
+
+    def __init__(self):
+        self.partes = []
+        self.largo = 0
+
+    def __iadd__(self, texto):
+        self.partes.append(texto)
+        self.largo += len(texto)
+        return self
+
+    def __len__(self):
+        return self.largo
+
+class _Flujo:
+    """Reemplazo de `FPDF.buffer` en modo streaming: escribe cada trozo en `destino` y solo lleva el largo"""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.largo = 0
+
+    def __iadd__(self, texto):
+        self.destino.write(texto.encode('latin-1'))
+        self.largo += len(texto)
+        return self
+
+    def __len__(self):
+        return self.largo
+
+class FacturaPDF(FPDF):
+    """FPDF con fuente Unicode, imágenes desde la caché de imágenes y archivos adjuntos embebidos.
+
+    Con `destino` (un archivo binario vacío) el documento se escribe en modo
+    streaming: cada página va al archivo apenas se termina y en memoria queda
+    solo la página en curso. El PDF se declara 1.4 desde la cabecera, porque
+    ya no se puede corregir si más adelante aparece una imagen con transparencia.
+    """
+
+    def __init__(self, *args, destino=None, **kwargs):
+        FPDF.__init__(self, *args, **kwargs)
+        self.destino = destino
+        if destino is None:
+            self.buffer = _Acumulador()
+        else:
+            self.buffer = _Flujo(destino)
+            self.pdf_version = '1.4'
+        self._adjuntos = []
+        self._objetos_adjuntos = []
+        self._marcadores = []
+        self._plantillas = {}
+        self._objeto_marcadores = None
+        self._retenidas = None
+        self.unicode = registrar_fuente_unicode(self)
+        self.familia = FAMILIA_UNICODE if self.unicode else "Arial"
+
+    def _beginpage(self, orientation):
+        if self.destino is not None and self.page == 0:
+            self._putheader()
+        FPDF._beginpage(self, orientation)
+        self._contenido = []
+
+    def _endpage(self):
+        # El contenido de la página se junta en una lista y se une una sola vez:
+        # `self.pages[n] += ...` copia la página entera en cada operación
+        self.pages[self.page] = ''.join(self._contenido)
+        FPDF._endpage(self)
+        if self._retenidas is not None:
+            self._retenidas.append(self.page)
+        elif self.destino is not None:
+            self._putpagina(self.page)
+            self.pages[self.page] = ''
+
+    @contextmanager
+    def deshacible(self):
+        """Dibuja en un bloque que se descarta entero si lanza una excepción.
+
+        Mientras dura, las páginas terminadas no se escriben en `destino`: si el
+        bloque falla se quitan las páginas que agregó y la página en curso vuelve
+        al contenido y estado de dibujo que tenía al entrar.
+        """
+        if self._retenidas is not None:
+            self.error('Los bloques deshacibles no se pueden anidar')
+        pagina, estado_pdf = self.page, self.state
+        contenido = list(self._contenido) if estado_pdf == 2 else None
+        estado = {atributo: getattr(self, atributo, None) for atributo in _ESTADO_DIBUJO + ('x', 'y')}
+        self._retenidas = []
+        try:
+            yield self
+        except Exception:
+            for n in range(pagina + 1, self.page + 1):
+                self.pages.pop(n, None)
+                self.orientation_changes.pop(n, None)
+                self.page_links.pop(n, None)
+            self.page, self.state = pagina, estado_pdf
+            if contenido is not None:
+                self.pages[pagina] = ''
+                self._contenido = contenido
+            for atributo, valor in estado.items():
+                setattr(self, atributo, valor)
+            self._retenidas = None
+            raise
+        retenidas, self._retenidas = self._retenidas, None
+        if self.destino is not None and retenidas:
+            # Con la página en curso abierta `_out` escribiría en ella y no en el archivo
+            estado_pdf, self.state = self.state, 1
+            for n in retenidas:
+                self._putpagina(n)
+                self.pages[n] = ''
+            self.state = estado_pdf
+
+    def _putheader(self):
+        # En modo streaming la cabecera ya salió con la primera página
+        if not len(self.buffer):
+            FPDF._putheader(self)
+
+    def _tamano_pt(self):
+        if self.def_orientation == 'P':
+            return self.fw_pt, self.fh_pt
+        return self.fh_pt, self.fw_pt
+
+    def _putpagina(self, n):
+        """Escribe el objeto de la página `n` y su contenido, como `FPDF._putpages` (sin enlaces ni alias {nb})"""
+        w_pt, h_pt = self._tamano_pt()
+        self._newobj()
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        if n in self.orientation_changes:
+            self._out('/MediaBox [0 0 %.2f %.2f]' % (h_pt, w_pt))
+        self._out('/Resources 2 0 R')
+        if self.pdf_version > '1.3':
+            self._out('/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>')
+        self._out('/Contents %d 0 R>>' % (self.n + 1))
+        self._out('endobj')
+        contenido = self.pages[n].encode('latin-1')
+        if self.compress:
+            contenido = zlib.compress(contenido)
+        self._newobj()
+        self._out('<<%s/Length %d>>' % ('/Filter /FlateDecode ' if self.compress else '', len(contenido)))
+        self._putstream(contenido)
+        self._out('endobj')
+
+    def _putpages(self):
+        if self.destino is None:
+            FPDF._putpages(self)
+            return
+        # Las páginas ya están escritas (objetos 3, 5, 7...): solo falta la raíz /Pages
+        w_pt, h_pt = self._tamano_pt()
+        self.offsets[1] = len(self.buffer)
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ''.join('%d 0 R ' % (3 + 2 * i) for i in range(self.page)) + ']')
+        self._out('/Count %d' % self.page)
+        self._out('/MediaBox [0 0 %.2f %.2f]' % (w_pt, h_pt))
+        self._out('>>')
+        self._out('endobj')
+
+    def _out(self, s):
+        if self.state == 2:
+            self._contenido.append((s.decode('latin1') if isinstance(s, bytes) else s) + '\n')
+        else:
+            FPDF._out(self, s)
+
+    def _enddoc(self):
+        FPDF._enddoc(self)
+        if self.destino is None:
+            self.buffer = ''.join(self.buffer.partes)
+
+    def texto(self, valor):
+        """Texto listo para la fuente del documento (solo se translitera sin fuente Unicode)"""
+        return str(valor) if self.unicode else limpiar_texto_para_pdf(valor)
+
+    def adjuntar(self, nombre, datos, mime="application/json"):
+        """Embebe `datos` (bytes) como archivo adjunto del documento"""
+        self._adjuntos.append((nombre, datos, mime))
+
+    def marcador(self, titulo, pagina=None):
+        """Agrega una entrada al índice (marcadores) del documento apuntando a `pagina`"""
+        self._marcadores.append((titulo, pagina or self.page))
+
+    def _putresources(self):
+        FPDF._putresources(self)
+        self._putmarcadores()
+        for nombre, datos, mime in self._adjuntos:
+            comprimido = zlib.compress(datos)
+            self._newobj()
+            self._out('<</Type /EmbeddedFile /Subtype /%s /Filter /FlateDecode /Params <</Size %d>> /Length %d>>'
+                      % (mime.replace('/', '#2F'), len(datos), len(comprimido)))
+            self._putstream(comprimido)
+            self._out('endobj')
+            self._newobj()
+            self._out('<</Type /Filespec /F %s /UF %s /EF <</F %d 0 R>>>>'
+                      % (self._textstring(nombre), self._textstring(nombre), self.n - 1))
+            self._out('endobj')
+            self._objetos_adjuntos.append((nombre, self.n))
+
+    def get_string_width(self, s):
+        # Con la fuente Unicode el ancho sale de la tabla memoizada de palabras (misma aritmética)
+        if self.unifontsubset:
+            return ancho_palabra(s, self.font_family, self.font_style) * self.font_size / 1000.0
+        return FPDF.get_string_width(self, s)
+
+    def _putfonts(self):
+        # Las fuentes TTF se escriben aparte, con el subconjunto ya comprimido de la caché
+        ttf = {clave: f for clave, f in self.fonts.items() if f['type'] == 'TTF'}
+        for clave in ttf:
+            del self.fonts[clave]
+        try:
+            FPDF._putfonts(self)
+        finally:
+            self.fonts.update(ttf)
+        for fuente in sorted(ttf.values(), key=lambda f: f['i']):
+            self._putfuente_unicode(fuente)
+
+    def _putfuente_unicode(self, fuente):
+        codigos = codigos_subconjunto(fuente['subset'])
+        sub = subconjunto_ttf(fuente['ttffile'], codigos)
+        nombre = 'MPDFAA+' + fuente['name']
+        desc = fuente['desc']
+        fuente['n'] = self.n + 1
+
+        self._newobj()
+        self._out('<</Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H /DescendantFonts [%d 0 R] /ToUnicode %d 0 R>>'
+                  % (nombre, self.n + 1, self.n + 2))
+        self._out('endobj')
+
+        self._newobj()
+        dw = ' /DW %d' % desc['MissingWidth'] if desc.get('MissingWidth') else ''
+        self._out('<</Type /Font /Subtype /CIDFontType2 /BaseFont /%s /CIDSystemInfo %d 0 R /FontDescriptor %d 0 R%s /W [%s] /CIDToGIDMap %d 0 R>>'
+                  % (nombre, self.n + 2, self.n + 3, dw, sub['anchos'], self.n + 4))
+        self._out('endobj')
+
+        cmap = _cmap_identidad(codigos)
+        self._newobj()
+        self._out('<</Length %d>>' % len(cmap))
+        self._putstream(cmap)
+        self._out('endobj')
+
+        self._newobj()
+        self._out('<</Registry (Adobe) /Ordering (UCS) /Supplement 0>>')
+        self._out('endobj')
+
+        self._newobj()
+        campos = ' '.join(
+            '/%s %s' % (k, (desc[k] | 4) & ~32 if k == 'Flags' else desc[k])
+            for k in ('Ascent', 'Descent', 'CapHeight', 'Flags', 'FontBBox', 'ItalicAngle', 'StemV', 'MissingWidth')
+        )
+        self._out('<</Type /FontDescriptor /FontName /%s %s /FontFile2 %d 0 R>>' % (nombre, campos, self.n + 2))
+        self._out('endobj')
+
+        self._newobj()
+        self._out('<</Length %d /Filter /FlateDecode>>' % len(sub['mapa']))
+        self._putstream(sub['mapa'])
+        self._out('endobj')
+
+        self._newobj()
+        self._out('<</Length %d /Filter /FlateDecode /Length1 %d>>' % (len(sub['fuente']), sub['tamano']))
+        self._putstream(sub['fuente'])
+        self._out('endobj')
+
+    def _putmarcadores(self):
+        if not self._marcadores:
+            return
+        # Raíz del índice seguida de una entrada por marcador, en objetos consecutivos
+        raiz = self.n + 1
+        total = len(self._marcadores)
+        self._newobj()
+        self._out('<</Type /Outlines /First %d 0 R /Last %d 0 R /Count %d>>' % (raiz + 1, raiz + total, total))
+        self._out('endobj')
+        for i, (titulo, pagina) in enumerate(self._marcadores):
+            obj = raiz + 1 + i
+            self._newobj()
+            enlaces = ''.join([
+                ' /Prev %d 0 R' % (obj - 1) if i > 0 else '',
+                ' /Next %d 0 R' % (obj + 1) if i < total - 1 else '',
+            ])
+            # Los objetos de página de FPDF son 3, 5, 7...
+            self._out('<</Title (%s) /Parent %d 0 R%s /Dest [%d 0 R /XYZ 0 %.2F null]>>'
+                      % (self._escape(UTF8ToUTF16BE(titulo, True)), raiz, enlaces, 1 + 2 * pagina, self.h * self.k))
+            self._out('endobj')
+        self._objeto_marcadores = raiz
+
+    def _putcatalog(self):
+        FPDF._putcatalog(self)
+        if self._objeto_marcadores:
+            self._out('/Outlines %d 0 R /PageMode /UseOutlines' % self._objeto_marcadores)
+        if self._objetos_adjuntos:
+            nombres = ' '.join('%s %d 0 R' % (self._textstring(n), obj) for n, obj in self._objetos_adjuntos)
+            self._out('/Names <</EmbeddedFiles <</Names [%s]>>>>' % nombres)
+
+    def plantilla(self, nombre, x, y, dibujar, *args):
+        """Coloca en (x, y) la plantilla `nombre` y deja el cursor donde lo dejaría el dibujo.
+
+        La primera vez lo que dibuja `dibujar(self, *args)` desde (x, y) se graba
+        en un Form XObject del documento; las siguientes (en esta u otras páginas
+        y facturas del mismo PDF) la página solo lleva una referencia desplazada.
+        """
+        plantilla = self._plantillas.get(nombre)
+        if plantilla is None:
+            plantilla = self._plantillas[nombre] = self._grabar_plantilla(x, y, dibujar, args)
+        dx, dy = x - plantilla["x"], y - plantilla["y"]
+        self._out('q 1 0 0 1 %.2F %.2F cm /TPL%d Do Q' % (dx * self.k, -dy * self.k, plantilla["i"]))
+        self.x = plantilla["fin_x"] + dx
+        self.y = plantilla["fin_y"] + dy
+        self.lasth = plantilla["lasth"]
+
+    def _grabar_plantilla(self, x, y, dibujar, args):
+        estado = {atributo: getattr(self, atributo, None) for atributo in _ESTADO_DIBUJO}
+        pagina, contenido, self._contenido = self.page, self._contenido, []
+        salto = self.auto_page_break
+        # Sin fuente "actual" la plantilla declara la suya aunque coincida con la de la página;
+        # sin salto automático lo grabado nunca queda repartido entre dos páginas
+        self.font_family = ''
+        self.auto_page_break = 0
+        try:
+            self.set_xy(x, y)
+            dibujar(self, *args)
+            grabado = ''.join(self._contenido)
+            plantilla = {"i": len(self._plantillas) + 1, "x": x, "y": y, "fin_x": self.x, "fin_y": self.y,
+                         "lasth": self.lasth, "contenido": grabado, "n": None}
+        finally:
+            self._contenido = contenido
+            self.auto_page_break = salto
+            # Después de `Do` la página vuelve al estado que tenía antes de la plantilla
+            for atributo, valor in estado.items():
+                setattr(self, atributo, valor)
+        if self.page != pagina:
+            self.error('Una plantilla no puede agregar páginas')
+        return plantilla
+
+    def _putimages(self):
+        FPDF._putimages(self)
+        for plantilla in sorted(self._plantillas.values(), key=lambda p: p["i"]):
+            contenido = plantilla["contenido"].encode('latin-1')
+            filtro = ''
+            if self.compress:
+                contenido = zlib.compress(contenido)
+                filtro = '/Filter /FlateDecode '
+            self._newobj()
+            self._out('<</Type /XObject /Subtype /Form /BBox [0 0 %.2F %.2F] /Resources 2 0 R %s/Length %d>>'
+                      % (self.w_pt, self.h_pt, filtro, len(contenido)))
+            self._putstream(contenido)
+            self._out('endobj')
+            plantilla["n"] = self.n
+
+    def _putxobjectdict(self):
+        FPDF._putxobjectdict(self)
+        for plantilla in sorted(self._plantillas.values(), key=lambda p: p["i"]):
+            self._out('/TPL%d %d 0 R' % (plantilla["i"], plantilla["n"]))
+
+    def imagen_bytes(self, datos, x, y, w):
+        clave, info = CACHE_IMAGENES.obtener(datos)
+        if clave not in self.images:
+            # Copia propia: FPDF borra 'data' de la imagen al cerrar el documento
+            info = dict(info)
+            info['i'] = len(self.images) + 1
+            self.images[clave] = info
+            if 'smask' in info and self.pdf_version < '1.4':
+                self.pdf_version = '1.4'
+        self.image(clave, x=x, y=y, w=w)
+
+def agregar_imagen_segura(pdf, datos, x, y, w):
+    if datos:
+        with tramo("pdf.imagen"):
+            try:
+                pdf.imagen_bytes(datos, x, y, w)
+            except:
+                pass
+
+def ajustar_lineas(pdf, texto, ancho, max_corte):
+    """Divide el texto en líneas que caben en `ancho` con la fuente actual"""
+    with tramo("pdf.ajuste_texto"):
+        return ajustar_texto(texto, pdf.font_family, pdf.font_style, pdf.font_size_pt, ancho, max_corte, pdf.k)
+
+def datos_factura(cliente, fecha, df):
+    """JSON con los datos exactos de la factura (sin limpiar ni cortar el texto)"""
+    productos = [
+        {"Pag": pag, "Prod": prod, "Cant": int(cant), "Cat_U": int(cat_u), "List_U": int(list_u)}
+        for pag, prod, cant, cat_u, list_u, _, _, _ in _recorrer_filas(df)
+    ]
+    datos = {"version": VERSION_DATOS, "cliente": cliente, "fecha": fecha.isoformat(), "productos": productos}
+    return json.dumps(datos, ensure_ascii=False).encode("utf-8")
+
+def _recorrer_filas(df):
+    """Itera las filas del motor de totales como tuplas de Python, sin iterrows"""
+    columnas = ["Pag", "Prod", "Cant", "Cat_U", "List_U", "T_Cat", "T_List", "Gan"]
+    return zip(*(df[c].tolist() for c in columnas))
+
+def _anchos_columnas():
+    # ANCHOS DE COLUMNAS
+    # Ancho total: 215.9mm - 20mm márgenes = 195.9mm
+    # Distribución: Pág(12) + Producto(90) + Cant(12) + P.Cat(18) + T.Cat(18) + P.List(18) + T.List(18) + Gan(18)
+    cw = [12, 90, 12, 18, 18, 18, 18, 18]
+
+    # Ajustar ancho de producto dinámicamente
+    ancho_total_fijo = sum(cw) - cw[1]  # Suma de todas menos producto
+    cw[1] = 195.9 - ancho_total_fijo  # Producto toma el espacio restante
+    return tuple(cw)
+
+# La geometría de la tabla es fija: se calcula una sola vez
+ANCHOS_COLUMNAS = _anchos_columnas()
+
+# --- PLANTILLAS ---
+# Lo que no cambia entre páginas ni entre facturas de un mismo PDF (marca,
+# encabezado de la tabla y bloque de pago) se dibuja con `pdf.plantilla`: se
+# graba una vez como Form XObject y cada página solo lo referencia.
+
+def _encabezado_tabla(pdf, cw):
+    pdf.set_fill_color(240, 240, 240)
+    pdf.set_font(pdf.familia, 'B', 9)
+    for i, header in enumerate(ENCABEZADOS):
+        pdf.cell(cw[i], 8, header, 1, 0, 'C', True)
+    pdf.ln()
+
+def _poner_encabezado(pdf, cw):
+    pdf.plantilla("encabezado", pdf.l_margin, pdf.get_y(), _encabezado_tabla, cw)
+
+def _marca_revista(pdf, marca):
+    # Logo revista
+    agregar_imagen_segura(pdf, marca.get("logo_rev"), 10, 15, 25)
+
+    # Título PRINCIPAL - FUENTE GRANDE
+    pdf.set_font(pdf.familia, 'B', 16)
+    pdf.set_xy(0, 15)
+    pdf.cell(0, 10, txt=pdf.texto(marca.get("nombre_rev", "").upper()), ln=True, align='C')
+
+def nuevo_pdf(destino=None):
+    """Documento vacío en formato carta (con `destino`, en modo streaming)"""
+    return FacturaPDF(orientation='P', unit='mm', format='letter', destino=destino)
+
+def dibujar_factura(pdf, cliente, fecha, filas, marca):
+    """Dibuja la factura completa desde una página nueva de `pdf`; devuelve las filas calculadas"""
+    df, totales = calcular_totales(filas_validas(filas))
+
+    pdf.add_page()
+
+    # Márgenes
+    pdf.set_left_margin(10)
+    pdf.set_right_margin(10)
+    pdf.set_top_margin(15)
+
+    # Logo y título de la revista
+    pdf.plantilla("marca", 0, 15, _marca_revista, marca)
+
+    # Información del cliente - FUENTE LEGIBLE
+    pdf.set_font(pdf.familia, '', 11)
+    cliente_text = f"CLIENTE: {cliente.upper()} | FECHA DE PAGO: {fecha.strftime('%d-%m-%Y')}"
+    pdf.cell(0, 7, pdf.texto(cliente_text), ln=True, align='C')
+    pdf.ln(8)
+
+    cw = ANCHOS_COLUMNAS
+
+    # Encabezados con FUENTE LEGIBLE
+    _poner_encabezado(pdf, cw)
+
+    pdf.set_font(pdf.familia, '', 8)  # CONTENIDO LEGIBLE
+
+    with tramo("pdf.tabla"):
+        _dibujar_filas(pdf, df, cw)
+
+    # LÍNEA DE TOTALES CON FUENTE GRANDE
+    _dibujar_totales(pdf, cw, totales)
+
+    # INFORMACIÓN DE PAGO
+    _dibujar_pago(pdf, marca)
+
+    return df
+
+def _dibujar_filas(pdf, df, cw):
+    for pag, prod, cant, cat_u, list_u, v_tc, v_tl, gan_fila in _recorrer_filas(df):
+        # Preparar texto del producto
+        prod_text = pdf.texto(prod)
+
+        # DIVIDIR TEXTO EN LÍNEAS
+        pdf.set_font(pdf.familia, '', 8)
+        lineas = ajustar_lineas(pdf, prod_text, cw[1] - 4, 45)
+
+        num_lineas = len(lineas)
+        altura_fila = max(8, num_lineas * 4)  # ALTURA ADECUADA
+
+        # Verificar si necesitamos nueva página
+        if pdf.get_y() + altura_fila > 260:
+            with tramo("pdf.salto_pagina"):
+                pdf.add_page()
+                # Reimprimir encabezados
+                _poner_encabezado(pdf, cw)
+                pdf.set_font(pdf.familia, '', 8)
+
+        # Guardar posición inicial
+        x_inicial = pdf.get_x()
+        y_inicial = pdf.get_y()
+
+        # Columna 1: Página
+        pdf.cell(cw[0], altura_fila, pdf.texto(pag), 1, 0, 'C')
+
+        # Columna 2: Producto (MÚLTIPLES LÍNEAS)
+        # Dibujar celda completa
+        pdf.cell(cw[1], altura_fila, "", 1, 0, 'L')
+
+        # Escribir cada línea
+        for j, linea in enumerate(lineas):
+            pdf.set_xy(x_inicial + cw[0], y_inicial + (j * altura_fila/num_lineas))
+            pdf.cell(cw[1], altura_fila/num_lineas, linea, 0, 0, 'L')
+
+        # Volver a posición
+        pdf.set_xy(x_inicial + cw[0] + cw[1], y_inicial)
+
+        # Columna 3: Cantidad
+        pdf.cell(cw[2], altura_fila, str(cant), 1, 0, 'C')
+
+        # Columna 4: Precio Catálogo
+        pdf.cell(cw[3], altura_fila, f"${fmt(cat_u)}", 1, 0, 'R')
+
+        # Columna 5: Total Catálogo
+        pdf.set_fill_color(225, 245, 254)
+        pdf.cell(cw[4], altura_fila, f"${fmt(v_tc)}", 1, 0, 'R', True)
+
+        # Columna 6: Precio Lista
+        pdf.set_fill_color(255, 255, 255)
+        pdf.cell(cw[5], altura_fila, f"${fmt(list_u)}", 1, 0, 'R')
+
+        # Columna 7: Total Lista
+        pdf.set_fill_color(255, 243, 224)
+        pdf.cell(cw[6], altura_fila, f"${fmt(v_tl)}", 1, 0, 'R', True)
+
+        # Columna 8: Ganancia
+        if gan_fila >= 0:
+            pdf.set_fill_color(232, 245, 233)
+        else:
+            pdf.set_fill_color(255, 230, 230)
+
+        pdf.cell(cw[7], altura_fila, f"${fmt(gan_fila)}", 1, 1, 'R', True)
+
+        # Restaurar color
+        pdf.set_fill_color(255, 255, 255)
+
+def _dibujar_totales(pdf, cw, totales):
+    pdf.set_fill_color(230, 230, 230)
+    pdf.set_font(pdf.familia, 'B', 10)
+
+    ancho_totales = cw[0] + cw[1] + cw[2]
+
+    pdf.cell(ancho_totales, 9, "TOTALES:", 1, 0, 'R', True)
+    pdf.cell(cw[3], 9, "", 1, 0, 'C', True)
+    pdf.cell(cw[4], 9, f"${fmt(totales['T_Cat'])}", 1, 0, 'R', True)
+    pdf.cell(cw[5], 9, "", 1, 0, 'C', True)
+    pdf.cell(cw[6], 9, f"${fmt(totales['T_List'])}", 1, 0, 'R', True)
+
+    if totales['Gan'] >= 0:
+        pdf.set_fill_color(232, 245, 233)
+    else:
+        pdf.set_fill_color(255, 230, 230)
+
+    pdf.cell(cw[7], 9, f"${fmt(totales['Gan'])}", 1, 1, 'R', True)
+
+def _dibujar_pago(pdf, marca):
+    pdf.ln(10)
+
+    if pdf.get_y() + 15 <= pdf.page_break_trigger:
+        pdf.plantilla("pago", pdf.get_x(), pdf.get_y(), _bloque_pago, marca)
+    else:
+        # El texto de pago pasa a la página siguiente: se dibuja sin plantilla
+        _bloque_pago(pdf, marca)
+
+def _bloque_pago(pdf, marca):
+    y_pos = pdf.get_y()
+
+    # Logo de pago
+    agregar_imagen_segura(pdf, marca.get("logo_pago"), 10, y_pos, 25)
+
+    # Información de pago - FUENTE GRANDE
+    pdf.set_xy(45, y_pos + 8)
+    pdf.set_font(pdf.familia, 'B', 12)
+    if marca.get("num_pago"):
+        pdf.cell(0, 7, pdf.texto(f"Pagar a: {marca['num_pago']}"))
+    else:
+        pdf.cell(0, 7, "Información de pago no configurada")
+
+    # QR GRANDE
+    agregar_imagen_segura(pdf, marca.get("qr_pago"), 150, y_pos + 3, 40)
+
+def salida_pdf(pdf):
+    """Cierra el documento y devuelve sus bytes (en modo streaming, cuántos bytes escribió)"""
+    with tramo("pdf.output"):
+        if pdf.destino is not None:
+            pdf.close()
+            return len(pdf.buffer)
+        return pdf.output(dest='S').encode('latin-1')
+
+def renderizar_factura(cliente, fecha, filas, marca, destino=None):
+    """Genera el PDF completo de una factura y devuelve sus bytes.
+
+    Con `destino` (archivo binario vacío) las páginas se escriben ahí a medida
+    que se terminan y se devuelve cuántos bytes se escribieron.
+    """
+    pdf = nuevo_pdf(destino)
+    df = dibujar_factura(pdf, cliente, fecha, filas, marca)
+    pdf.adjuntar(ADJUNTO_DATOS, datos_factura(cliente, fecha, df))
+    return salida_pdf(pdf)
+
+def dibujar_factura_simplificada(pdf, cliente, fecha, filas, marca):
+    """MÉTODO ALTERNATIVO SIMPLIFICADO: tabla de 5 columnas, sin colores"""
+    df, totales = calcular_totales(filas_validas(filas))
+
+    pdf.add_page()
+
+    # Estado de dibujo propio: en un PDF combinado la página viene después de
+    # otra factura (o de un intento fallido de la completa) y heredaría sus colores
+    pdf.set_draw_color(0)
+    pdf.set_fill_color(255)
+    pdf.set_text_color(0)
+    pdf.set_line_width(0.2)
+    pdf.set_font(pdf.familia, 'B', 16)
+    pdf.cell(0, 12, pdf.texto(f"FACTURA: {cliente}"), 0, 1, 'C')
+    pdf.set_font(pdf.familia, '', 12)
+    pdf.cell(0, 7, f"Fecha: {fecha.strftime('%d-%m-%Y')}", 0, 1, 'C')
+    pdf.ln(8)
+
+    # Tabla simplificada con 5 columnas
+    pdf.set_font(pdf.familia, 'B', 10)
+    encabezados = ["Pág", "Producto", "Cant", "Total Cat.", "Ganancia"]
+    anchos = [15, 120, 15, 25, 25]
+
+    for i, header in enumerate(encabezados):
+        pdf.cell(anchos[i], 8, header, 1, 0, 'C', True)
+    pdf.ln()
+
+    pdf.set_font(pdf.familia, '', 9)
+
+    for pag, prod, cant, cat_u, list_u, v_tc, v_tl, gan_fila in _recorrer_filas(df):
+        # Dividir producto
+        prod_text = pdf.texto(prod)
+        lineas = ajustar_lineas(pdf, prod_text, anchos[1] - 4, 50)
+
+        altura = max(8, len(lineas) * 4)
+
+        # Página
+        pdf.cell(anchos[0], altura, pdf.texto(pag), 1, 0, 'C')
+
+        # Producto
+        x = pdf.get_x()
+        y = pdf.get_y()
+        for j, linea in enumerate(lineas):
+            if j == 0:
+                pdf.cell(anchos[1], altura/len(lineas), linea, 'LR', 0, 'L')
+            else:
+                pdf.set_xy(x, y + (j * altura/len(lineas)))
+                pdf.cell(anchos[1], altura/len(lineas), linea, 'LR', 0, 'L')
+
+        pdf.set_xy(x + anchos[1], y)
+
+        # Cantidad
+        pdf.cell(anchos[2], altura, str(cant), 1, 0, 'C')
+
+        # Total
+        pdf.cell(anchos[3], altura, f"${fmt(v_tc)}", 1, 0, 'R')
+
+        # Ganancia
+        pdf.cell(anchos[4], altura, f"${fmt(gan_fila)}", 1, 1, 'R')
+
+    # Totales
+    pdf.set_font(pdf.familia, 'B', 11)
+    pdf.cell(150, 9, "TOTALES:", 1, 0, 'R', True)
+    pdf.cell(25, 9, f"${fmt(totales['T_Cat'])}", 1, 0, 'R', True)
+    pdf.cell(25, 9, f"${fmt(totales['Gan'])}", 1, 1, 'R', True)
+
+    # Información de pago
+    pdf.ln(8)
+
+    agregar_imagen_segura(pdf, marca.get("logo_pago"), 10, pdf.get_y(), 20)
+
+    pdf.set_xy(40, pdf.get_y() + 5)
+    pdf.set_font(pdf.familia, 'B', 12)
+    if marca.get("num_pago"):
+        pdf.cell(0, 7, pdf.texto(f"Pagar a: {marca['num_pago']}"))
+
+    agregar_imagen_segura(pdf, marca.get("qr_pago"), 150, pdf.get_y() - 5, 35)
+
+    return df
+
+def renderizar_factura_simplificada(cliente, fecha, filas, marca, destino=None):
+    """Genera el PDF simplificado de una factura y devuelve sus bytes (o los escribe en `destino`)"""
+    pdf = nuevo_pdf(destino)
+    df = dibujar_factura_simplificada(pdf, cliente, fecha, filas, marca)
+    pdf.adjuntar(ADJUNTO_DATOS, datos_factura(cliente, fecha, df))
+    return salida_pdf(pdf)
+
+def precalentar(marca=None):
+    """Deja en la caché del proceso las métricas, el subconjunto de glifos más común y las imágenes de `marca`"""
+    renderizar_factura("Precalentar", date.today(), [{"Pag": "1", "Prod": "Ñandú ácido ÁÉÍÓÚ", "Cant": 1}],
+                       marca or marca_vacia())
+
+def renderizar_con_respaldo(cliente, fecha, filas, marca, destino=None):
+    """Renderiza la factura completa o, si falla, la simplificada.
+
+    Devuelve (bytes | None, simplificada, error) sin lanzar excepciones, para
+    los procesos que generan PDFs fuera del hilo de la app. Con `destino` el
+    primer valor es la cantidad de bytes escritos en el archivo.
+    """
+    with tramo("pdf.renderizar"):
+        try:
+            return renderizar_factura(cliente, fecha, filas, marca, destino), False, None
+        except Exception as e:
+            try:
+                if destino is not None:
+                    # Se descartan las páginas que la versión completa alcanzó a escribir
+                    destino.seek(0)
+                    destino.truncate()
+                return renderizar_factura_simplificada(cliente, fecha, filas, marca, destino), True, str(e)
+            except Exception as e2:
+                return None, False, str(e2)
+
+def renderizar_en_archivo(ruta, cliente, fecha, filas, marca):
+    """`renderizar_con_respaldo` escribiendo el PDF en `ruta` página a página.
+
+    Devuelve (bytes escritos | None, simplificada, error). El PDF no vuelve por
+    la tubería del pool: quien lo pidió lo lee (o lo sirve) desde el archivo.
+    """
+    with open(ruta, "wb") as destino:
+        return renderizar_con_respaldo(cliente, fecha, filas, marca, destino)
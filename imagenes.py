@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import hashlib
+import io
+import threading
+import zlib
+
+# --- CACHÉ DE IMÁGENES DE MARCA ---
+# Los logos y el QR se repiten en todas las facturas: se decodifican una vez,
+# se guardan ya preparados para FPDF (mismo formato que devuelven
+# `_parsejpg`/`_parsepng`) y se insertan desde memoria, sin archivos temporales.
+
+def huella_imagen(datos):
+    """Clave de contenido de una imagen"""
+    return hashlib.sha256(datos).hexdigest()
+
+def _filas_con_predictor(canal, ancho):
+    # FPDF declara la máscara alfa con /Predictor 15: cada fila lleva un byte de filtro (0 = ninguno)
+    crudo = canal.tobytes()
+    return b"".join(b"\x00" + crudo[i:i + ancho] for i in range(0, len(crudo), ancho))
+
+def decodificar_imagen(datos):
+    """Convierte bytes PNG/JPEG/GIF en el diccionario de imagen que usa FPDF"""
+    from PIL import Image
+
+    im = Image.open(io.BytesIO(datos))
+    ancho, alto = im.size
+
+    # Los JPEG se insertan tal cual (DCTDecode), sin recomprimir
+    if im.format == "JPEG" and im.mode in ("RGB", "L", "CMYK"):
+        espacio = {"RGB": "DeviceRGB", "L": "DeviceGray", "CMYK": "DeviceCMYK"}[im.mode]
+        return {"w": ancho, "h": alto, "cs": espacio, "bpc": 8, "f": "DCTDecode", "data": datos}
+
+    if im.mode == "P" or "transparency" in im.info:
+        im = im.convert("RGBA")
+    alfa = None
+    if "A" in im.getbands():
+        alfa = im.getchannel("A")
+        im = im.convert("L" if im.mode == "LA" else "RGB")
+        if alfa.getextrema() == (255, 255):
+            alfa = None  # Totalmente opaca: no hace falta máscara
+    elif im.mode not in ("RGB", "L"):
+        im = im.convert("RGB")
+
+    info = {
+        "w": ancho, "h": alto,
+        "cs": "DeviceGray" if im.mode == "L" else "DeviceRGB",
+        "bpc": 8, "f": "FlateDecode", "pal": "", "trns": "",
+        "data": zlib.compress(im.tobytes()),
+    }
+    if alfa is not None:
+        info["smask"] = zlib.compress(_filas_con_predictor(alfa, ancho))
+    return info
+
+class CacheImagenes:
+    """LRU acotada de imágenes decodificadas, indexada por el hash del contenido"""
+
+    def __init__(self, max_entradas=32):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, datos):
+        """Devuelve (clave, info) decodificando solo la primera vez que se ve la imagen"""
+        clave = huella_imagen(datos)
+        with self._lock:
+            info = self._entradas.get(clave)
+            if info is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return clave, info
+        info = decodificar_imagen(datos)
+        with self._lock:
+            self.fallos += 1
+            self._entradas[clave] = info
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return clave, info
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+# Caché compartida por todo el proceso (app, lotes y benchmarks)
+CACHE_IMAGENES = CacheImagenes()
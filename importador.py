@@ -0,0 +1,340 @@
+"""Importación de facturas PDF generadas anteriormente.
+
+Uso (migrar un archivo histórico al almacén SQLite):
+    python importador.py facturas_2025/ --db facturas.db
+    python importador.py temporada.zip --procesos 8 --campana C-05
+
+Los PDFs ya importados (mismos bytes) se omiten sin abrirlos, y los que repiten
+cliente y líneas de una factura ya guardada se informan y no se duplican.
+"""
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+from pypdf import PdfReader
+
+from factura_pdf import ADJUNTO_DATOS
+from perfil import activo, ejecutar_medido, registrar_muestras, tramo
+from trabajos import CONTEXTO_PROCESOS
+
+# --- EXTRACCIÓN ---
+PATRON_CLIENTE = re.compile(r"CLIENTE:\s*(.*)\s*\|")
+PATRON_FILA = re.compile(r"(\d+)\s+(.*?)\s+(\d+)\s+\$([\d\.]+)\s+\$([\d\.]+)\s+\$([\d\.]+)\s+\$([\d\.]+)\s+\$([\d\.]+)")
+
+# Con pocos archivos no compensa arrancar procesos
+MIN_ARCHIVOS_PARALELO = 4
+
+def textos_paginas(reader):
+    """Texto de cada página, extraído a medida que se pide"""
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+def datos_embebidos(reader):
+    """Datos JSON que el renderizador adjunta al PDF, o None si es una factura antigua"""
+    try:
+        adjunto = reader.attachments.get(ADJUNTO_DATOS)
+    except Exception:
+        return None
+    if not adjunto:
+        return None
+    datos = json.loads(adjunto[0])
+    productos = [
+        {"Pag": str(p.get("Pag", "")), "Prod": str(p.get("Prod", "")), "Cant": int(p.get("Cant", 1)),
+         "Cat_U": int(p.get("Cat_U", 0)), "List_U": int(p.get("List_U", 0))}
+        for p in datos.get("productos") or []
+    ]
+    return {
+        "cliente": datos.get("cliente") or "Cliente Importado",
+        "fecha": date.fromisoformat(datos["fecha"]) if datos.get("fecha") else None,
+        "productos": productos if productos else None,
+    }
+
+def importar_datos_pdf(archivo, usar_embebidos=True):
+    """Lee cliente y productos de una factura PDF (ruta, bytes o archivo abierto).
+
+    Devuelve {"cliente": str, "fecha": date | None, "productos": list | None}.
+    Si el PDF trae los datos embebidos se usan tal cual; si no, se extrae el
+    texto y se aplican las expresiones regulares. Los errores de lectura se
+    propagan para que quien llama decida cómo mostrarlos.
+    """
+    if isinstance(archivo, (bytes, bytearray)):
+        archivo = io.BytesIO(archivo)
+    with tramo("importar.abrir"):
+        reader = PdfReader(archivo)
+
+    with tramo("importar.embebidos"):
+        embebidos = datos_embebidos(reader) if usar_embebidos else None
+    if embebidos is not None:
+        return embebidos
+
+    cliente = None
+    productos = []
+    paginas = textos_paginas(reader)
+    while True:
+        with tramo("importar.extraer_texto"):
+            texto = next(paginas, None)
+        if texto is None:
+            break
+        with tramo("importar.regex"):
+            if cliente is None:
+                cliente_match = PATRON_CLIENTE.search(texto)
+                if cliente_match:
+                    cliente = cliente_match.group(1).strip()
+            for m in PATRON_FILA.findall(texto):
+                productos.append({
+                    "Pag": m[0],
+                    "Prod": m[1].strip(),
+                    "Cant": int(m[2]),
+                    "Cat_U": int(m[3].replace('.', '')),
+                    "List_U": int(m[5].replace('.', ''))
+                })
+    return {"cliente": cliente or "Cliente Importado", "fecha": None, "productos": productos if productos else None}
+
+# --- HUELLAS ---
+# Dos hashes por archivo: el de los bytes (el mismo PDF subido otra vez) y el del
+# cliente y las líneas normalizados (la misma factura regenerada o reexportada).
+
+def huella_archivo(fuente):
+    """SHA-256 de los bytes del PDF (bytes, ruta o par (ruta_zip, miembro))"""
+    if isinstance(fuente, (bytes, bytearray)):
+        return hashlib.sha256(fuente).hexdigest()
+    if isinstance(fuente, tuple):
+        return hashlib.sha256(_leer_fuente(fuente)).hexdigest()
+    h = hashlib.sha256()
+    with open(fuente, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _normalizar(texto):
+    return " ".join(str(texto).split()).casefold()
+
+def huella_contenido(cliente, productos):
+    """SHA-256 del cliente y las líneas con producto, sin importar orden, espacios ni mayúsculas"""
+    filas = sorted(
+        (_normalizar(p["Pag"]), _normalizar(p["Prod"]), int(p["Cant"]), int(p["Cat_U"]), int(p["List_U"]))
+        for p in productos if str(p["Prod"]).strip()
+    )
+    return hashlib.sha256(json.dumps([_normalizar(cliente), filas], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+# --- IMPORTACIÓN POR LOTES ---
+def _es_pdf(nombre):
+    return nombre.lower().endswith(".pdf") and not os.path.basename(nombre).startswith(".")
+
+def tareas_importacion(origen):
+    """(nombre, fuente) por cada PDF de una carpeta, un ZIP o una lista de (nombre, bytes).
+
+    La fuente es una ruta, un par (ruta_zip, miembro) o los bytes del PDF, de
+    modo que cada proceso lee su archivo sin pasar el contenido por la cola.
+    """
+    if isinstance(origen, (list, tuple)):
+        for nombre, datos in origen:
+            if nombre.lower().endswith(".zip"):
+                yield from tareas_importacion(datos)
+            else:
+                yield nombre, datos
+    elif isinstance(origen, (bytes, bytearray)):
+        with zipfile.ZipFile(io.BytesIO(origen)) as zf:
+            for nombre in zf.namelist():
+                if _es_pdf(nombre):
+                    yield nombre, zf.read(nombre)
+    elif os.path.isdir(origen):
+        for raiz, _, archivos in os.walk(origen):
+            for nombre in sorted(archivos):
+                if _es_pdf(nombre):
+                    ruta = os.path.join(raiz, nombre)
+                    yield os.path.relpath(ruta, origen), ruta
+    elif zipfile.is_zipfile(origen):
+        with zipfile.ZipFile(origen) as zf:
+            nombres = [n for n in zf.namelist() if _es_pdf(n)]
+        for nombre in nombres:
+            yield nombre, (origen, nombre)
+    else:
+        yield os.path.basename(origen), origen
+
+def _leer_fuente(fuente):
+    if isinstance(fuente, tuple):
+        ruta_zip, miembro = fuente
+        with zipfile.ZipFile(ruta_zip) as zf:
+            return zf.read(miembro)
+    return fuente
+
+def _resultado(nombre, **valores):
+    return {"archivo": nombre, "cliente": None, "fecha": None, "productos": None, "error": None,
+            "huella": None, "huella_contenido": None, "duplicado": None, "segundos": 0.0, **valores}
+
+def importar_archivo(tarea):
+    """Importa un PDF y devuelve el resultado con su tiempo y sus huellas, sin lanzar excepciones"""
+    nombre, fuente = tarea
+    inicio = time.perf_counter()
+    resultado = _resultado(nombre)
+    try:
+        datos = _leer_fuente(fuente)
+        resultado["huella"] = huella_archivo(datos)
+        resultado.update(importar_datos_pdf(datos))
+        if not resultado["productos"]:
+            resultado["error"] = "No se detectaron productos legibles"
+        else:
+            resultado["huella_contenido"] = huella_contenido(resultado["cliente"], resultado["productos"])
+    except Exception as e:
+        resultado["error"] = str(e) or type(e).__name__
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+def _solo_nuevas(tareas, conocida, omitidas):
+    """Deja pasar los archivos no vistos; los repetidos van a `omitidas` sin abrir el PDF"""
+    vistas = {}
+    for nombre, fuente in tareas:
+        try:
+            huella = huella_archivo(fuente)
+        except (OSError, KeyError):
+            # El error de lectura se informa al importarlo
+            yield nombre, fuente
+            continue
+        previa = vistas.get(huella) or (conocida(huella) if conocida else None)
+        if previa:
+            omitidas.append(_resultado(nombre, cliente=previa.get("cliente"), huella=huella,
+                                       duplicado={"tipo": "archivo", **previa}))
+            continue
+        vistas[huella] = {"archivo": nombre}
+        yield nombre, fuente
+
+def importar_lote(origen, procesos=None, en_vuelo=None, conocida=None):
+    """Importa todos los PDF de `origen` en paralelo; genera un resultado por archivo al terminar cada uno.
+
+    Un archivo con los mismos bytes que otro del lote, o que `conocida(huella)`
+    reconoce (p. ej. `AlmacenFacturas.buscar_huella`), no se lee: sale enseguida
+    con "duplicado" = {"tipo": "archivo", ...} y sin productos. Si lo que se lee
+    repite cliente y líneas de otro archivo del lote, se marca "tipo": "contenido".
+    """
+    omitidas = deque()
+    tareas = _solo_nuevas(tareas_importacion(origen), conocida, omitidas)
+    contenidos = {}
+
+    def marcar(resultado):
+        huella = resultado["huella_contenido"]
+        if huella in contenidos:
+            resultado["duplicado"] = {"tipo": "contenido", "archivo": contenidos[huella]}
+        elif huella:
+            contenidos[huella] = resultado["archivo"]
+        return resultado
+
+    def vaciar():
+        while omitidas:
+            yield omitidas.popleft()
+
+    primeras = []
+    for tarea in tareas:
+        primeras.append(tarea)
+        if len(primeras) >= MIN_ARCHIVOS_PARALELO:
+            break
+    yield from vaciar()
+    if len(primeras) < MIN_ARCHIVOS_PARALELO:
+        for tarea in primeras:
+            yield marcar(importar_archivo(tarea))
+        return
+
+    procesos = procesos or os.cpu_count() or 1
+    en_vuelo = en_vuelo or procesos * 4
+    # Con la instrumentación encendida cada proceso devuelve también sus tramos
+    medido = activo()
+
+    def recoger(futuro):
+        if not medido:
+            return marcar(futuro.result())
+        resultado, muestras = futuro.result()
+        registrar_muestras(muestras)
+        return marcar(resultado)
+
+    pendientes = set()
+    # Sin fork, como la cola de trabajos: la app llama a esta función desde sus hilos
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=CONTEXTO_PROCESOS) as pool:
+        for tarea in itertools.chain(primeras, tareas):
+            yield from vaciar()
+            if len(pendientes) >= en_vuelo:
+                hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    yield recoger(futuro)
+            if medido:
+                pendientes.add(pool.submit(ejecutar_medido, importar_archivo, tarea))
+            else:
+                pendientes.add(pool.submit(importar_archivo, tarea))
+        yield from vaciar()
+        while pendientes:
+            hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                yield recoger(futuro)
+
+# --- LÍNEA DE COMANDOS ---
+def main(argv=None):
+    from almacen import RUTA_POR_DEFECTO, AlmacenFacturas
+
+    parser = argparse.ArgumentParser(description="Importa facturas PDF anteriores al almacén SQLite.")
+    parser.add_argument("origen", help="Carpeta, archivo ZIP o PDF")
+    parser.add_argument("--db", default=RUTA_POR_DEFECTO, help="Archivo SQLite de destino")
+    parser.add_argument("--campana", default="")
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=200, help="Facturas por transacción")
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenFacturas(args.db)
+    inicio = time.perf_counter()
+    buffer, importadas, repetidas, errores = [], 0, 0, 0
+    # huella de contenido -> factura de este lote (en el buffer o ya guardada)
+    por_contenido = {}
+
+    def volcar():
+        for factura, fid in zip(buffer, almacen.guardar(buffer)):
+            factura["id"] = fid
+        buffer.clear()
+
+    for res in importar_lote(args.origen, procesos=args.procesos, conocida=almacen.buscar_huella):
+        if res["error"]:
+            errores += 1
+            print(f"ERROR {res['archivo']}: {res['error']} ({res['segundos'] * 1000:.0f} ms)", file=sys.stderr)
+            continue
+        duplicado = res["duplicado"]
+        if duplicado and duplicado["tipo"] == "archivo":
+            repetidas += 1
+            print(f"igual {res['archivo']}: ya importado como {duplicado.get('nombre') or duplicado.get('archivo')}")
+            continue
+        huella = {"archivo": res["huella"], "contenido": res["huella_contenido"], "nombre": res["archivo"]}
+        similar = por_contenido.get(huella["contenido"]) or almacen.buscar_contenido(huella["contenido"])
+        if similar:
+            # Misma factura en otro PDF: no se duplica, pero el archivo queda reconocido para la próxima vez
+            repetidas += 1
+            print(f"igual {res['archivo']}: mismo cliente y líneas que una factura de {similar['cliente']}")
+            fid = similar.get("factura_id", similar.get("id"))
+            if fid is None:
+                similar["huellas"].append(huella)
+            else:
+                almacen.registrar_huellas(fid, [huella])
+            continue
+        importadas += 1
+        print(f"ok    {res['archivo']}: {res['cliente']}, {len(res['productos'])} líneas ({res['segundos'] * 1000:.0f} ms)")
+        factura = {"cliente": res["cliente"], "fecha": res["fecha"], "campana": args.campana,
+                   "productos": res["productos"], "huellas": [huella]}
+        buffer.append(factura)
+        por_contenido[huella["contenido"]] = factura
+        if len(buffer) >= args.lote:
+            volcar()
+    if buffer:
+        volcar()
+
+    segundos = time.perf_counter() - inicio
+    print(f"{importadas} facturas importadas, {repetidas} repetidas, {errores} errores en {segundos:.2f}s "
+          f"({importadas / segundos if segundos else 0:.1f}/s)")
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import itertools
+import sys
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import numpy as np
+
+# --- LÍNEAS DE FACTURA EN COLUMNAS ---
+# Cada factura guarda sus líneas como columnas: enteros en arreglos int64
+# contiguos (con capacidad de sobra para agregar sin copiar) y textos
+# internados, que se comparten entre todas las facturas y sesiones del proceso.
+# El motor de totales trabaja sobre vistas de esos arreglos, sin copiarlos.
+
+COLUMNAS = ["Pag", "Prod", "Cant", "Cat_U", "List_U"]
+
+FILA_VACIA = {"Pag": "", "Prod": "", "Cant": 1, "Cat_U": 0, "List_U": 0}
+
+_ENTEROS = {"Cant": "_cant", "Cat_U": "_cat_u", "List_U": "_list_u"}
+_TEXTOS = {"Pag": "pag", "Prod": "prod"}
+
+_CAPACIDAD_INICIAL = 8
+
+# Cada creación o edición toma un número nuevo: (facturas, revisiones) identifica un contenido
+_REVISIONES = itertools.count(1)
+
+def _texto(valor):
+    return sys.intern(valor if type(valor) is str else str(valor))
+
+def _entero(fila, campo):
+    return int(fila.get(campo, FILA_VACIA[campo]) or 0)
+
+def _arreglo(valores=(), capacidad=0):
+    datos = np.fromiter(valores, dtype=np.int64)
+    if capacidad > len(datos):
+        datos = np.concatenate([datos, np.zeros(capacidad - len(datos), dtype=np.int64)])
+    return datos
+
+def a_entero(valor, defecto=0):
+    """Convierte precios/cantidades de CSV o Excel ("35.900", "35900.0", "35,90", "$1.000") a int.
+
+    Un "." o "," seguido de 1 o 2 dígitos al final separa decimales (se redondea
+    ,5 hacia arriba); cualquier otro separa miles. NaN e infinito dan ValueError.
+    """
+    if valor is None or valor == "": return defecto
+    if isinstance(valor, bool): return int(valor)
+    if isinstance(valor, int): return valor
+    if isinstance(valor, float):
+        numero = Decimal(repr(valor))
+    else:
+        texto = str(valor).strip().replace("$", "").replace(" ", "")
+        entero, decimales = texto, "0"
+        separador = max(texto.rfind("."), texto.rfind(","))
+        if separador >= 0 and 1 <= len(texto) - separador - 1 <= 2:
+            entero, decimales = texto[:separador], texto[separador + 1:]
+        entero = entero.replace(".", "").replace(",", "")
+        if entero.lstrip("+-").lower() in ("nan", "inf", "infinity"):
+            raise ValueError(f"Valor no numérico: {valor!r}")
+        try:
+            numero = Decimal(f"{entero or 0}.{decimales}")
+        except InvalidOperation:
+            return defecto
+    if not numero.is_finite():
+        raise ValueError(f"Valor no numérico: {valor!r}")
+    return int(numero.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, float):
+        return int(round(valor))
+    texto = str(valor).strip().replace("$", "").replace(" ", "")
+    entero, decimales = texto, "0"
+    separador = max(texto.rfind("."), texto.rfind(","))
+    if separador >= 0 and 1 <= len(texto) - separador - 1 <= 2:
+        entero, decimales = texto[:separador], texto[separador + 1:]
+    entero = entero.replace(".", "").replace(",", "")
+    try:
+        return int(round(float(f"{entero or 0}.{decimales}")))
+    except ValueError:
+        return defecto
+
+def filas_validas(filas):
+    """Filas que tienen nombre de producto (las únicas que van al PDF), como `LineasFactura`"""
+    return LineasFactura.desde(filas).validas()
+
+class LineasFactura:
+    """Líneas de una factura en columnas tipadas (int64 y textos internados)"""
+
+    __slots__ = ("pag", "prod", "_cant", "_cat_u", "_list_u", "_n", "revision")
+
+    def __init__(self, filas=()):
+        filas = list(filas)
+        self.pag = [_texto(f.get("Pag", "")) for f in filas]
+        self.prod = [_texto(f.get("Prod", "")) for f in filas]
+        capacidad = max(_CAPACIDAD_INICIAL, len(filas))
+        self._cant = _arreglo((_entero(f, "Cant") for f in filas), capacidad)
+        self._cat_u = _arreglo((_entero(f, "Cat_U") for f in filas), capacidad)
+        self._list_u = _arreglo((_entero(f, "List_U") for f in filas), capacidad)
+        self._n = len(filas)
+        self.revision = next(_REVISIONES)
+
+    @classmethod
+    def desde(cls, filas):
+        """Las mismas líneas si ya son columnas; si no, las convierte desde una lista de dicts"""
+        return filas if isinstance(filas, cls) else cls(filas)
+
+    @classmethod
+    def desde_columnas(cls, pag, prod, cant, cat_u, list_u):
+        lineas = cls.__new__(cls)
+        lineas.pag = [_texto(p) for p in pag]
+        lineas.prod = [_texto(p) for p in prod]
+        lineas._cant = np.array(cant, dtype=np.int64)
+        lineas._cat_u = np.array(cat_u, dtype=np.int64)
+        lineas._list_u = np.array(list_u, dtype=np.int64)
+        lineas._n = len(lineas.pag)
+        lineas.revision = next(_REVISIONES)
+        return lineas
+
+    # --- Lectura ---
+    def __len__(self):
+        return self._n
+
+    def columna(self, campo):
+        """Vista (sin copia) de una columna entera; sigue a la factura si se edita"""
+        return getattr(self, _ENTEROS[campo])[:self._n]
+
+    def fila(self, i):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return {"Pag": self.pag[i], "Prod": self.prod[i], "Cant": int(self._cant[i]),
+                "Cat_U": int(self._cat_u[i]), "List_U": int(self._list_u[i])}
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._seleccionar(range(*i.indices(self._n)))
+        return self.fila(i)
+
+    def __iter__(self):
+        return (self.fila(i) for i in range(self._n))
+
+    def validas(self):
+        """Líneas con nombre de producto (las únicas que van al PDF), como columnas nuevas"""
+        return self._seleccionar([i for i, p in enumerate(self.prod) if p.strip() != ""])
+
+    def contar_validas(self):
+        return sum(1 for p in self.prod if p.strip() != "")
+
+    def _seleccionar(self, indices):
+        indices = list(indices)
+        return LineasFactura.desde_columnas(
+            [self.pag[i] for i in indices], [self.prod[i] for i in indices],
+            self._cant[indices], self._cat_u[indices], self._list_u[indices],
+        )
+
+    def a_filas(self):
+        """Lista de dicts (para JSON y SQL)"""
+        return list(self)
+
+    def a_dataframe(self):
+        import pandas as pd
+
+        return pd.DataFrame({
+            "Pag": self.pag, "Prod": self.prod,
+            "Cant": self.columna("Cant").copy(), "Cat_U": self.columna("Cat_U").copy(),
+            "List_U": self.columna("List_U").copy(),
+        }, columns=COLUMNAS)
+
+    # --- Edición ---
+    def agregar(self, fila):
+        if self._n == len(self._cant):
+            # Se duplica la capacidad: agregar cuesta O(1) amortizado
+            for atributo in _ENTEROS.values():
+                viejo = getattr(self, atributo)
+                nuevo = np.zeros(max(_CAPACIDAD_INICIAL, 2 * len(viejo)), dtype=np.int64)
+                nuevo[:self._n] = viejo[:self._n]
+                setattr(self, atributo, nuevo)
+        i = self._n
+        self.pag.append(_texto(fila.get("Pag", "")))
+        self.prod.append(_texto(fila.get("Prod", "")))
+        self._cant[i] = _entero(fila, "Cant")
+        self._cat_u[i] = _entero(fila, "Cat_U")
+        self._list_u[i] = _entero(fila, "List_U")
+        self._n += 1
+        self.revision = next(_REVISIONES)
+
+    def borrar(self, i):
+        """Quita la línea `i` y la devuelve como dict"""
+        fila = self.fila(i)
+        del self.pag[i]
+        del self.prod[i]
+        for atributo in _ENTEROS.values():
+            arreglo = getattr(self, atributo)
+            arreglo[i:self._n - 1] = arreglo[i + 1:self._n]
+        self._n -= 1
+        self.revision = next(_REVISIONES)
+        return fila
+
+    def asignar(self, i, campo, valor):
+        if campo in _TEXTOS:
+            getattr(self, _TEXTOS[campo])[i] = _texto(valor)
+        else:
+            getattr(self, _ENTEROS[campo])[i] = int(valor or 0)
+        self.revision = next(_REVISIONES)
+
+    # --- Serialización (procesos y caché de sesión) ---
+    def __getstate__(self):
+        return (self.pag, self.prod, self.columna("Cant").copy(), self.columna("Cat_U").copy(),
+                self.columna("List_U").copy())
+
+    def __setstate__(self, estado):
+        pag, prod, cant, cat_u, list_u = estado
+        self.pag = [_texto(p) for p in pag]
+        self.prod = [_texto(p) for p in prod]
+        self._cant, self._cat_u, self._list_u = cant, cat_u, list_u
+        self._n = len(pag)
+        self.revision = next(_REVISIONES)
+
+    def __repr__(self):
+        return f"LineasFactura({self._n} líneas)"
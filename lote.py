@@ -0,0 +1,271 @@
+"""Generación de facturas por lotes desde la línea de comandos.
+
+Uso:
+    python lote.py clientes.csv --salida facturas/
+    python lote.py clientes.jsonl --zip facturas.zip --procesos 8 --nombre-rev "MI REVISTA"
+
+Formatos de entrada (se leen en streaming, sin cargar el archivo completo):
+  * CSV / Excel (.xlsx): una fila por producto con las columnas
+    Cliente, Fecha, Pag, Prod, Cant, Cat_U, List_U. Las filas consecutivas del
+    mismo cliente forman una factura.
+  * JSON Lines (.jsonl) o arreglo JSON (.json): un objeto por factura
+    {"cliente": ..., "fecha": ..., "productos": [{"Pag", "Prod", "Cant", "Cat_U", "List_U"}, ...]}
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime
+
+from factura_pdf import marca_vacia, renderizar_con_respaldo
+from lineas import a_entero
+
+# --- LECTURA DE ENTRADA ---
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    if valor:
+        for formato in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"):
+            try:
+                return datetime.strptime(str(valor).strip(), formato).date()
+            except ValueError:
+                pass
+    return date.today()
+
+def _fila(registro):
+    return {
+        "Pag": str(registro.get("Pag") or "").strip(),
+        "Prod": str(registro.get("Prod") or "").strip(),
+        "Cant": a_entero(registro.get("Cant"), 1),
+        "Cat_U": a_entero(registro.get("Cat_U")),
+        "List_U": a_entero(registro.get("List_U")),
+    }
+
+def _agrupar_por_cliente(registros):
+    """Agrupa filas consecutivas del mismo cliente en facturas, sin acumular el archivo"""
+    actual = None
+    for registro in registros:
+        cliente = str(registro.get("Cliente") or "").strip() or "Cliente"
+        fecha = registro.get("Fecha")
+        if actual is None or (cliente, fecha) != (actual["cliente"], actual["_fecha"]):
+            if actual is not None:
+                yield _cerrar_factura(actual)
+            actual = {"cliente": cliente, "_fecha": fecha, "productos": []}
+        actual["productos"].append(_fila(registro))
+    if actual is not None:
+        yield _cerrar_factura(actual)
+
+def _cerrar_factura(actual):
+    return {"cliente": actual["cliente"], "fecha": _fecha(actual["_fecha"]), "productos": actual["productos"]}
+
+def _leer_csv(ruta):
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        yield from _agrupar_por_cliente(csv.DictReader(f))
+
+def _leer_excel(ruta):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        sys.exit("Leer Excel requiere openpyxl: pip install openpyxl")
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        columnas = [str(c).strip() if c is not None else "" for c in next(filas, ())]
+        yield from _agrupar_por_cliente(dict(zip(columnas, fila)) for fila in filas)
+    finally:
+        libro.close()
+
+def factura_json(obj):
+    """Factura normalizada desde un objeto JSON {"cliente", "fecha", "productos"}"""
+    return {
+        "cliente": str(obj.get("cliente") or "Cliente").strip(),
+        "fecha": _fecha(obj.get("fecha")),
+        "productos": [_fila(p) for p in obj.get("productos") or []],
+    }
+
+def _leer_jsonl(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                yield factura_json(json.loads(linea))
+
+def _leer_json(ruta, tam_bloque=1 << 16):
+    """Recorre un arreglo JSON de facturas objeto por objeto"""
+    decodificador = json.JSONDecoder()
+    with open(ruta, encoding="utf-8") as f:
+        buffer = f.read(tam_bloque).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError("Se esperaba un arreglo JSON de facturas")
+        buffer = buffer[1:]
+        fin_archivo = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                obj, pos = decodificador.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if fin_archivo:
+                    raise
+                bloque = f.read(tam_bloque)
+                fin_archivo = not bloque
+                buffer += bloque
+                continue
+            yield factura_json(obj)
+            buffer = buffer[pos:]
+
+def leer_facturas(ruta):
+    """Generador de facturas {"cliente", "fecha", "productos"} según la extensión del archivo"""
+    ext = os.path.splitext(ruta)[1].lower()
+    if ext == ".csv":
+        return _leer_csv(ruta)
+    if ext in (".xlsx", ".xlsm"):
+        return _leer_excel(ruta)
+    if ext == ".jsonl":
+        return _leer_jsonl(ruta)
+    if ext == ".json":
+        return _leer_json(ruta)
+    raise ValueError(f"Formato no soportado: {ext}")
+
+# --- RENDERIZADO EN PROCESOS ---
+_marca_proceso = None
+
+def _iniciar_proceso(marca):
+    # La marca (con sus imágenes) viaja una sola vez por proceso, no por factura
+    global _marca_proceso
+    _marca_proceso = marca
+
+def _renderizar(factura):
+    return renderizar_con_respaldo(factura["cliente"], factura["fecha"], factura["productos"], _marca_proceso)
+
+def nombre_archivo(cliente, simplificada=False):
+    base = re.sub(r'[\\/:*?"<>|]+', "", cliente).strip().replace(" ", "_") or "Cliente"
+    return f"Factura_{base}{'_simple' if simplificada else ''}.pdf"
+
+class DestinoArchivos:
+    """Escribe PDFs en un directorio o en un único ZIP, evitando nombres repetidos"""
+
+    def __init__(self, salida=None, zip_path=None):
+        self.usados = {}
+        self.zip = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) if zip_path else None
+        self.salida = salida
+        if salida:
+            os.makedirs(salida, exist_ok=True)
+
+    def _unico(self, nombre):
+        n = self.usados.get(nombre, 0)
+        self.usados[nombre] = n + 1
+        if n == 0:
+            return nombre
+        base, ext = os.path.splitext(nombre)
+        return f"{base}_{n + 1}{ext}"
+
+    def escribir(self, nombre, datos):
+        nombre = self._unico(nombre)
+        if self.zip:
+            self.zip.writestr(nombre, datos)
+        else:
+            with open(os.path.join(self.salida, nombre), "wb") as f:
+                f.write(datos)
+
+    def cerrar(self):
+        if self.zip:
+            self.zip.close()
+
+def generar_lote(facturas, marca, salida=None, zip_path=None, procesos=None, en_vuelo=None, informar=None):
+    """Renderiza un iterable de facturas en paralelo. Devuelve un resumen con el rendimiento"""
+    procesos = procesos or os.cpu_count() or 1
+    # Límite de facturas pendientes: la memoria no crece con el tamaño del archivo
+    en_vuelo = en_vuelo or procesos * 4
+    destino = DestinoArchivos(salida, zip_path)
+    resumen = {"facturas": 0, "simplificadas": 0, "errores": []}
+    inicio = time.perf_counter()
+
+    def recoger(hechos):
+        for futuro in hechos:
+            cliente = pendientes.pop(futuro)
+            datos, simplificada, error = futuro.result()
+            if datos is None:
+                resumen["errores"].append((cliente, error))
+                continue
+            destino.escribir(nombre_archivo(cliente, simplificada), datos)
+            resumen["facturas"] += 1
+            resumen["simplificadas"] += simplificada
+            if informar and resumen["facturas"] % 100 == 0:
+                informar(resumen["facturas"], time.perf_counter() - inicio)
+
+    pendientes = {}
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso, initargs=(marca,)) as pool:
+            for factura in facturas:
+                if len(pendientes) >= en_vuelo:
+                    hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                    recoger(hechos)
+                pendientes[pool.submit(_renderizar, factura)] = factura["cliente"]
+            while pendientes:
+                hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                recoger(hechos)
+    finally:
+        destino.cerrar()
+
+    resumen["segundos"] = time.perf_counter() - inicio
+    resumen["por_segundo"] = resumen["facturas"] / resumen["segundos"] if resumen["segundos"] else 0.0
+    return resumen
+
+# --- LÍNEA DE COMANDOS ---
+def leer_imagen(ruta):
+    if not ruta:
+        return None
+    with open(ruta, "rb") as f:
+        return f.read()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera una factura PDF por cliente a partir de un CSV/JSON/Excel.")
+    parser.add_argument("entrada", help="Archivo .csv, .xlsx, .json o .jsonl")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--salida", help="Directorio donde escribir los PDF")
+    grupo.add_argument("--zip", help="Archivo ZIP donde guardar todos los PDF")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, todos los núcleos)")
+    parser.add_argument("--nombre-rev", default=marca_vacia()["nombre_rev"])
+    parser.add_argument("--logo-rev")
+    parser.add_argument("--num-pago", default="")
+    parser.add_argument("--logo-pago")
+    parser.add_argument("--qr-pago")
+    args = parser.parse_args(argv)
+
+    marca = {
+        "nombre_rev": args.nombre_rev,
+        "logo_rev": leer_imagen(args.logo_rev),
+        "num_pago": args.num_pago,
+        "logo_pago": leer_imagen(args.logo_pago),
+        "qr_pago": leer_imagen(args.qr_pago),
+    }
+
+    def informar(n, segundos):
+        print(f"  {n} facturas ({n / segundos:.1f}/s)", file=sys.stderr)
+
+    try:
+        resumen = generar_lote(
+            leer_facturas(args.entrada), marca,
+            salida=args.salida, zip_path=args.zip, procesos=args.procesos, informar=informar,
+        )
+    except ValueError as e:
+        sys.exit(f"Entrada inválida en {args.entrada}: {e}")
+    for cliente, error in resumen["errores"]:
+        print(f"Error en {cliente}: {error}", file=sys.stderr)
+    print(
+        f"{resumen['facturas']} facturas en {resumen['segundos']:.2f}s "
+        f"({resumen['por_segundo']:.1f} facturas/s), "
+        f"{resumen['simplificadas']} simplificadas, {len(resumen['errores'])} errores"
+    )
+    return 1 if resumen["errores"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import cProfile
+import importlib.util
+import io
+import json
+import marshal
+import math
+import os
+import pstats
+import threading
+import time
+from contextlib import nullcontext
+
+# --- INSTRUMENTACIÓN (OPCIONAL) ---
+# Tramos con nombre alrededor de las fases del renderizado, la importación y la
+# interfaz. Cada duración se suma a un histograma del proceso y, si el hilo
+# tiene uno asignado, al de la sesión de Streamlit. Apagado (lo normal) cada
+# tramo es un contexto vacío compartido y no mide nada.
+#
+# Se enciende con FACTURAS_PERFIL=1 o desde el panel de depuración de la app.
+
+_activo = os.environ.get("FACTURAS_PERFIL") == "1"
+_local = threading.local()
+_NULO = nullcontext()
+
+# Subdivisiones por cada potencia de 2 en los histogramas (escala logarítmica en µs)
+CUBETAS_POR_OCTAVA = 4
+
+def activo():
+    return _activo
+
+def activar(valor=True):
+    global _activo
+    _activo = bool(valor)
+
+class Histograma:
+    """Duraciones de un tramo en cubetas logarítmicas: cuenta, total, extremos y percentiles aproximados"""
+
+    __slots__ = ("cuenta", "total", "minimo", "maximo", "cubetas")
+
+    def __init__(self):
+        self.cuenta = 0
+        self.total = 0.0
+        self.minimo = math.inf
+        self.maximo = 0.0
+        self.cubetas = {}
+
+    def agregar(self, segundos):
+        self.cuenta += 1
+        self.total += segundos
+        self.minimo = min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+        cubeta = int(math.log2(max(segundos * 1e6, 1.0)) * CUBETAS_POR_OCTAVA)
+        self.cubetas[cubeta] = self.cubetas.get(cubeta, 0) + 1
+
+    def percentil(self, p):
+        """Límite superior de la cubeta donde cae el percentil `p` (0-100), en segundos"""
+        if not self.cuenta:
+            return 0.0
+        objetivo = p / 100 * self.cuenta
+        acumulado = 0
+        for cubeta in sorted(self.cubetas):
+            acumulado += self.cubetas[cubeta]
+            if acumulado >= objetivo:
+                return min(2 ** ((cubeta + 1) / CUBETAS_POR_OCTAVA) / 1e6, self.maximo)
+        return self.maximo
+
+    def a_dict(self):
+        return {
+            "cuenta": self.cuenta, "total_s": self.total,
+            "min_s": self.minimo if self.cuenta else 0.0, "max_s": self.maximo,
+            "p50_s": self.percentil(50), "p95_s": self.percentil(95), "p99_s": self.percentil(99),
+            "cubetas_us": {f"{2 ** (c / CUBETAS_POR_OCTAVA):.0f}": n for c, n in sorted(self.cubetas.items())},
+        }
+
+class RegistroTramos:
+    """Histogramas por nombre de tramo (uno por proceso y uno por sesión)"""
+
+    def __init__(self):
+        self._histogramas = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, nombre, segundos):
+        with self._lock:
+            histograma = self._histogramas.get(nombre)
+            if histograma is None:
+                histograma = self._histogramas[nombre] = Histograma()
+            histograma.agregar(segundos)
+
+    def limpiar(self):
+        with self._lock:
+            self._histogramas.clear()
+
+    def __len__(self):
+        return len(self._histogramas)
+
+    def a_dict(self):
+        with self._lock:
+            return {nombre: h.a_dict() for nombre, h in sorted(self._histogramas.items())}
+
+    def tabla(self):
+        """Una fila por tramo, en milisegundos, ordenada por tiempo total"""
+        filas = [
+            {"Tramo": nombre, "N": h["cuenta"], "Total ms": round(h["total_s"] * 1000, 1),
+             "Media ms": round(h["total_s"] / h["cuenta"] * 1000, 3) if h["cuenta"] else 0.0,
+             "p50 ms": round(h["p50_s"] * 1000, 3), "p95 ms": round(h["p95_s"] * 1000, 3),
+             "Máx ms": round(h["max_s"] * 1000, 3)}
+            for nombre, h in self.a_dict().items()
+        ]
+        return sorted(filas, key=lambda f: f["Total ms"], reverse=True)
+
+PROCESO = RegistroTramos()
+
+def usar_registro(registro):
+    """Asigna el registro de la sesión al hilo actual (None para ninguno)"""
+    _local.registro = registro
+
+def registrar(nombre, segundos):
+    PROCESO.agregar(nombre, segundos)
+    registro = getattr(_local, "registro", None)
+    if registro is not None:
+        registro.agregar(nombre, segundos)
+    capturas = getattr(_local, "capturas", None)
+    if capturas is not None:
+        capturas.append((nombre, segundos))
+
+def registrar_muestras(muestras):
+    """Suma las muestras que devolvió otro proceso (ver `ejecutar_medido`)"""
+    for nombre, segundos in muestras:
+        registrar(nombre, segundos)
+
+class _Tramo:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+def tramo(nombre):
+    """Contexto que mide un tramo con nombre (no hace nada si la instrumentación está apagada)"""
+    return _Tramo(nombre) if _activo else _NULO
+
+def ejecutar_medido(funcion, *args, **kwargs):
+    """Ejecuta `funcion` con la instrumentación encendida y devuelve (resultado, muestras).
+
+    Pensado para los pools de procesos: el proceso que envía el trabajo recibe
+    las muestras y las suma con `registrar_muestras`.
+    """
+    global _activo
+    anterior, _activo = _activo, True
+    _local.capturas = muestras = []
+    try:
+        return funcion(*args, **kwargs), muestras
+    finally:
+        _local.capturas = None
+        _activo = anterior
+
+def exportar_json(sesion=None):
+    """Histogramas del proceso (y de la sesión, si se pasa su registro) como JSON"""
+    datos = {"generado": time.strftime("%Y-%m-%dT%H:%M:%S"), "pid": os.getpid(), "proceso": PROCESO.a_dict()}
+    if sesion is not None:
+        datos["sesion"] = sesion.a_dict()
+    return json.dumps(datos, indent=2, ensure_ascii=False).encode("utf-8")
+
+# --- PERFIL DE UNA PETICIÓN ---
+def herramientas_perfil():
+    """Perfiladores disponibles: cProfile siempre, pyinstrument si está instalado"""
+    return ["cProfile"] + (["pyinstrument"] if importlib.util.find_spec("pyinstrument") else [])
+
+def iniciar_perfil(herramienta="cProfile"):
+    if herramienta == "pyinstrument":
+        from pyinstrument import Profiler
+        perfilador = Profiler()
+        perfilador.start()
+    else:
+        perfilador = cProfile.Profile()
+        perfilador.enable()
+    return herramienta, perfilador
+
+def detener_perfil(perfil):
+    """Detiene el perfilador y devuelve {"archivo", "mime", "datos", "resumen"}"""
+    herramienta, perfilador = perfil
+    if herramienta == "pyinstrument":
+        perfilador.stop()
+        return {"archivo": "perfil.html", "mime": "text/html", "datos": perfilador.output_html().encode("utf-8"),
+                "resumen": perfilador.output_text(unicode=True)}
+    perfilador.disable()
+    perfilador.create_stats()
+    resumen = io.StringIO()
+    pstats.Stats(perfilador, stream=resumen).sort_stats("cumulative").print_stats(30)
+    # Mismo formato que `cProfile -o`: se abre con pstats o snakeviz
+    return {"archivo": "perfil.prof", "mime": "application/octet-stream", "datos": marshal.dumps(perfilador.stats),
+            "resumen": resumen.getvalue()}
@@ -0,0 +1,271 @@
+"""Servicio HTTP local que genera facturas PDF para otros sistemas (sin pasar por la app).
+
+Uso:
+    python servicio.py --puerto 8502 --procesos 4 --nombre-rev "MI REVISTA" --logo-rev logo.png
+
+Endpoints:
+  * POST /factura   JSON {"cliente": ..., "fecha": ..., "productos": [{"Pag", "Prod", "Cant", "Cat_U", "List_U"}, ...]}
+                    (el mismo esquema de `lote.py`) -> application/pdf. La cabecera
+                    X-Factura-Simplificada vale 1 si salió la versión simplificada.
+  * GET  /salud     {"estado": "ok", "procesos": n}
+  * GET  /metricas  cola (en curso / esperando), contadores y latencias (p50/p95/p99)
+
+Los PDFs se generan en un pool de procesos que arranca con la marca y las
+fuentes ya cargadas. Cada proceso escribe el PDF página a página en un archivo
+temporal y la respuesta se envía desde ese archivo. Si ya hay `--max-en-curso` peticiones generándose, las
+nuevas esperan hasta `--espera` segundos por un cupo y después reciben 503.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from threading import BrokenBarrierError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from factura_pdf import marca_vacia, precalentar, renderizar_en_archivo
+from lineas import filas_validas
+from lote import factura_json, leer_imagen, nombre_archivo
+from perfil import RegistroTramos
+
+# Segundos que una petición espera un cupo antes de recibir 503
+ESPERA_MAXIMA = 2.0
+
+# Cuerpo más grande que se acepta en POST /factura
+MAX_BYTES_PETICION = 16 * 1024 * 1024
+
+# --- RENDERIZADO EN PROCESOS ---
+_marca_proceso = None
+
+# Segundos que un proceso precalentado espera a los demás antes de empezar a atender igual
+ESPERA_ARRANQUE = 120.0
+
+def _iniciar_proceso(marca, barrera=None):
+    # La marca viaja una sola vez por proceso; fuentes e imágenes quedan cargadas antes de la primera petición
+    global _marca_proceso
+    _marca_proceso = marca
+    precalentar(marca)
+    if barrera is not None:
+        # Ningún proceso toma trabajos hasta que todos se precalentaron
+        try:
+            barrera.wait(ESPERA_ARRANQUE)
+        except BrokenBarrierError:
+            pass
+
+def _renderizar(factura, ruta):
+    return renderizar_en_archivo(ruta, factura["cliente"], factura["fecha"], factura["productos"], _marca_proceso)
+
+class ServicioFacturas:
+    """Pool de procesos precalentado, con límite de peticiones simultáneas y métricas"""
+
+    def __init__(self, marca, procesos=None, max_en_curso=None, espera=ESPERA_MAXIMA):
+        self.procesos = procesos or os.cpu_count() or 1
+        self.max_en_curso = max_en_curso or self.procesos * 2
+        self.espera = espera
+        self.latencias = RegistroTramos()
+        self.inicio = time.time()
+        self._cupos = threading.BoundedSemaphore(self.max_en_curso)
+        self._lock = threading.Lock()
+        self._contadores = {"en_curso": 0, "esperando": 0, "atendidas": 0, "simplificadas": 0,
+                            "rechazadas": 0, "errores": 0}
+        self._directorio = tempfile.mkdtemp(prefix="servicio_pdf_")
+        self._ids = itertools.count(1)
+        # Un trabajo vacío por proceso hace arrancar a todos, y la barrera del inicializador
+        # impide que alguno lo ejecute antes de que todos se precalentaron: cuando terminan,
+        # el pool entero está listo y la primera petición no paga el arranque en frío
+        barrera = multiprocessing.Barrier(self.procesos)
+        self._pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=_iniciar_proceso,
+                                         initargs=(marca, barrera))
+        wait([self._pool.submit(os.getpid) for _ in range(self.procesos)])
+
+    def _contar(self, **cambios):
+        with self._lock:
+            for nombre, delta in cambios.items():
+                self._contadores[nombre] += delta
+
+    def renderizar(self, factura):
+        """(ruta del PDF, simplificada), o None si no hubo cupo a tiempo; lanza RuntimeError si el PDF falló.
+
+        El archivo queda para quien lo pidió, que lo borra después de enviarlo.
+        """
+        self._contar(esperando=1)
+        obtenido = self._cupos.acquire(timeout=self.espera)
+        if not obtenido:
+            self._contar(esperando=-1, rechazadas=1)
+            return None
+        self._contar(esperando=-1, en_curso=1)
+        inicio = time.perf_counter()
+        ruta = os.path.join(self._directorio, f"{next(self._ids)}.pdf")
+        try:
+            escritos, simplificada, error = self._pool.submit(_renderizar, factura, ruta).result()
+        finally:
+            self._cupos.release()
+            self._contar(en_curso=-1)
+        self.latencias.agregar("renderizar", time.perf_counter() - inicio)
+        if escritos is None:
+            self._contar(errores=1)
+            _borrar(ruta)
+            raise RuntimeError(error or "No se pudo generar el PDF")
+        self._contar(atendidas=1, simplificadas=int(simplificada))
+        return ruta, simplificada
+
+    def metricas(self):
+        with self._lock:
+            contadores = dict(self._contadores)
+        return {
+            "procesos": self.procesos, "max_en_curso": self.max_en_curso,
+            "segundos_activo": round(time.time() - self.inicio, 1),
+            "cola": {"en_curso": contadores.pop("en_curso"), "esperando": contadores.pop("esperando")},
+            **contadores,
+            "latencias": self.latencias.a_dict(),
+        }
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self._directorio, ignore_errors=True)
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+# --- HTTP ---
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "FacturasPDF/1.0"
+
+    def do_GET(self):
+        servicio = self.server.servicio
+        if self.path == "/salud":
+            self._responder_json(200, {"estado": "ok", "procesos": servicio.procesos})
+        elif self.path == "/metricas":
+            self._responder_json(200, servicio.metricas())
+        else:
+            self._responder_json(404, {"error": "Ruta desconocida"})
+
+    def do_POST(self):
+        if self.path != "/factura":
+            self._responder_json(404, {"error": "Ruta desconocida"})
+            return
+        inicio = time.perf_counter()
+        # El largo se valida antes de leer: sin él (o negativo) `rfile.read` esperaría al cliente
+        cabecera = self.headers.get("Content-Length")
+        if cabecera is None:
+            self._responder_json(411, {"error": "Falta la cabecera Content-Length"})
+            return
+        try:
+            largo = int(cabecera)
+        except ValueError:
+            largo = -1
+        if largo < 0:
+            self._responder_json(400, {"error": f"Content-Length inválido: {cabecera!r}"})
+            return
+        if largo > MAX_BYTES_PETICION:
+            self._responder_json(413, {"error": f"El cuerpo supera {MAX_BYTES_PETICION} bytes"})
+            return
+        # Cualquier falla al leer o validar la factura (p. ej. OverflowError con "Cant": 1e400
+        # o un entero enorme) es culpa de la petición: 400 con el motivo, nunca una conexión cortada
+        try:
+            factura = factura_json(json.loads(self.rfile.read(largo)))
+            validas = filas_validas(factura["productos"])
+        except Exception as e:
+            self._responder_json(400, {"error": f"JSON de factura inválido: {str(e) or type(e).__name__}"})
+            return
+        if not validas:
+            self._responder_json(400, {"error": "La factura no tiene productos con nombre"})
+            return
+
+        servicio = self.server.servicio
+        try:
+            resultado = servicio.renderizar(factura)
+        except Exception as e:
+            self._responder_json(500, {"error": str(e)})
+            return
+        if resultado is None:
+            self._responder_json(503, {"error": "Servicio ocupado, reintenta"}, {"Retry-After": "1"})
+            return
+        ruta, simplificada = resultado
+        try:
+            # El PDF va del archivo al socket por bloques, sin cargarlo entero en memoria
+            with open(ruta, "rb") as archivo:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(os.fstat(archivo.fileno()).st_size))
+                self.send_header("Content-Disposition",
+                                 f"attachment; filename*=UTF-8''{quote(nombre_archivo(factura['cliente'], simplificada))}")
+                self.send_header("X-Factura-Simplificada", str(int(simplificada)))
+                self.end_headers()
+                shutil.copyfileobj(archivo, self.wfile)
+        finally:
+            _borrar(ruta)
+        servicio.latencias.agregar("peticion", time.perf_counter() - inicio)
+
+    def _responder_json(self, estado, cuerpo, cabeceras=None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, formato, *args):
+        if self.server.registrar_accesos:
+            BaseHTTPRequestHandler.log_message(self, formato, *args)
+
+def crear_servidor(servicio, host="127.0.0.1", puerto=8502, registrar_accesos=False):
+    """Servidor HTTP (un hilo por conexión) que atiende con `servicio`"""
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    servidor.servicio = servicio
+    servidor.registrar_accesos = registrar_accesos
+    return servidor
+
+# --- LÍNEA DE COMANDOS ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP local que devuelve facturas PDF.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8502)
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en el pool (por defecto, todos los núcleos)")
+    parser.add_argument("--max-en-curso", type=int, default=None, help="PDFs generándose a la vez (por defecto, 2 por proceso)")
+    parser.add_argument("--espera", type=float, default=ESPERA_MAXIMA, help="Segundos de espera por un cupo antes del 503")
+    parser.add_argument("--registro", action="store_true", help="Imprime cada petición")
+    parser.add_argument("--nombre-rev", default=marca_vacia()["nombre_rev"])
+    parser.add_argument("--logo-rev")
+    parser.add_argument("--num-pago", default="")
+    parser.add_argument("--logo-pago")
+    parser.add_argument("--qr-pago")
+    args = parser.parse_args(argv)
+
+    marca = {
+        "nombre_rev": args.nombre_rev,
+        "logo_rev": leer_imagen(args.logo_rev),
+        "num_pago": args.num_pago,
+        "logo_pago": leer_imagen(args.logo_pago),
+        "qr_pago": leer_imagen(args.qr_pago),
+    }
+    servicio = ServicioFacturas(marca, args.procesos, args.max_en_curso, args.espera)
+    servidor = crear_servidor(servicio, args.host, args.puerto, args.registro)
+    print(f"Sirviendo en http://{args.host}:{servidor.server_address[1]} con {servicio.procesos} procesos "
+          f"(máx. {servicio.max_en_curso} en curso)", file=sys.stderr, flush=True)
+    # Con SIGTERM también se cierra el pool y se borran los PDFs temporales
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lineas import a_entero
+
+def test_separador_de_miles():
+    assert a_entero("35.900") == 35900
+    assert a_entero("$1.000") == 1000
+    assert a_entero("1.234.567") == 1234567
+    assert a_entero("35,900") == 35900
+
+def test_decimales_al_final():
+    assert a_entero("35900.0") == 35900
+    assert a_entero("35900.00") == 35900
+    assert a_entero("35,90") == 36
+    assert a_entero("1.234,6") == 1235
+    assert a_entero("1,234.56") == 1235
+
+def test_numeros_y_vacios():
+    assert a_entero(35900.0) == 35900
+    assert a_entero(7) == 7
+    assert a_entero("") == 0
+    assert a_entero(None, 1) == 1
+    assert a_entero("sin precio", 5) == 5
+
+def test_mitades_hacia_arriba():
+    assert a_entero("34,50") == 35
+    assert a_entero("35,50") == 36
+    assert a_entero("34.5") == 35
+    assert a_entero(34.5) == 35
+    assert a_entero(2.675) == 3
+
+def test_nan_e_infinito():
+    for valor in (float("nan"), float("inf"), float("-inf"), "nan", "inf", "-Infinity"):
+        with pytest.raises(ValueError, match="no numérico"):
+            a_entero(valor)
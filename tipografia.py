@@ -0,0 +1,102 @@
+import os
+import re
+import zlib
+from functools import lru_cache
+
+from fpdf.ttfonts import TTFontFile
+
+from ajuste_texto import registrar_fuente_ttf
+
+# --- FUENTE UNICODE EMBEBIDA ---
+# DejaVu Sans (carpeta `fuentes/`) reemplaza a la Arial estándar para que tildes,
+# eñes y cualquier otro carácter salgan tal cual en el PDF. El TTF se lee una
+# sola vez por proceso; en cada documento solo se embeben los glifos usados.
+# Si los archivos no están, el renderizador vuelve a Arial y translitera.
+
+DIRECTORIO_FUENTES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fuentes")
+FAMILIA_UNICODE = "dejavu"
+ARCHIVOS_UNICODE = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"}
+
+# Los glifos se embeben por bloques de 32 códigos: el subconjunto de casi todas
+# las facturas en español es el mismo y se reutiliza desde la caché
+TAMANO_BLOQUE = 32
+
+@lru_cache(maxsize=None)
+def rutas_unicode():
+    """Ruta de cada estilo de la fuente Unicode, o None si falta algún archivo"""
+    rutas = {estilo: os.path.join(DIRECTORIO_FUENTES, nombre) for estilo, nombre in ARCHIVOS_UNICODE.items()}
+    if not all(os.path.exists(r) for r in rutas.values()):
+        return None
+    return rutas
+
+@lru_cache(maxsize=None)
+def metricas_ttf(ruta):
+    """Métricas de un TTF en el formato de fuente de FPDF (se leen una vez por proceso)"""
+    ttf = TTFontFile()
+    ttf.getMetrics(ruta)
+    desc = {
+        'Ascent': int(round(ttf.ascent, 0)),
+        'Descent': int(round(ttf.descent, 0)),
+        'CapHeight': int(round(ttf.capHeight, 0)),
+        'Flags': ttf.flags,
+        'FontBBox': "[%s %s %s %s]" % tuple(int(round(v, 0)) for v in ttf.bbox),
+        'ItalicAngle': int(ttf.italicAngle),
+        'StemV': int(round(ttf.stemV, 0)),
+        'MissingWidth': int(round(ttf.defaultWidth, 0)),
+    }
+    return {
+        'type': 'TTF',
+        'name': re.sub('[ ()]', '', ttf.fullName),
+        'desc': desc,
+        'up': round(ttf.underlinePosition),
+        'ut': round(ttf.underlineThickness),
+        'cw': ttf.charWidths,
+        'ttffile': ruta,
+        'originalsize': os.stat(ruta).st_size,
+    }
+
+class Glifos(set):
+    """Códigos usados con una fuente; FPDF los agrega con `append` en cada celda"""
+    append = set.add
+
+def codigos_subconjunto(glifos):
+    """Códigos a embeber: los bloques completos que contienen algún glifo usado"""
+    bloques = {c // TAMANO_BLOQUE for c in glifos if c >= 32}
+    return tuple(c for b in sorted(bloques) for c in range(b * TAMANO_BLOQUE, (b + 1) * TAMANO_BLOQUE) if c >= 32)
+
+@lru_cache(maxsize=64)
+def subconjunto_ttf(ruta, codigos):
+    """Flujos ya comprimidos del subconjunto de `ruta` con los `codigos` dados"""
+    ttf = TTFontFile()
+    fuente = ttf.makeSubset(ruta, list(codigos))
+    mapa = bytearray(256 * 256 * 2)
+    for codigo, glifo in ttf.codeToGlyph.items():
+        if codigo < 256 * 256:
+            mapa[codigo * 2] = glifo >> 8
+            mapa[codigo * 2 + 1] = glifo & 0xFF
+
+    cw = metricas_ttf(ruta)['cw']
+    anchos = []
+    for codigo in codigos:
+        ancho = cw[codigo] if codigo < len(cw) else 0
+        if ancho:
+            anchos.append('%d [%d]' % (codigo, 0 if ancho == 65535 else ancho))
+    return {
+        'fuente': zlib.compress(fuente),
+        'tamano': len(fuente),
+        'mapa': zlib.compress(bytes(mapa)),
+        'anchos': ' '.join(anchos),
+    }
+
+def registrar_fuente_unicode(pdf):
+    """Agrega la fuente Unicode a `pdf` sin volver a leer el TTF; devuelve False si no está"""
+    rutas = rutas_unicode()
+    if rutas is None:
+        return False
+    for estilo, ruta in rutas.items():
+        metricas = metricas_ttf(ruta)
+        registrar_fuente_ttf(FAMILIA_UNICODE, estilo, metricas['cw'], metricas['desc']['MissingWidth'])
+        clave = FAMILIA_UNICODE + estilo
+        pdf.fonts[clave] = dict(metricas, i=len(pdf.fonts) + 1, fontkey=clave, subset=Glifos(), unifilename=None)
+        pdf.font_files[clave] = {'length1': metricas['originalsize'], 'type': 'TTF', 'ttffile': ruta}
+    return True
@@ -0,0 +1,133 @@
+import sys
+
+import numpy as np
+
+from lineas import LineasFactura
+
+# --- MOTOR DE TOTALES ---
+# Un solo cálculo columnar (enteros exactos) que consumen la interfaz, el PDF
+# completo y el PDF simplificado, para que nunca discrepen entre sí.
+# pandas se importa solo al armar el DataFrame: la interfaz suma con numpy.
+
+# Por encima de este valor un producto Cant*Precio sumado podría desbordar int64
+_LIMITE_INT64 = 2 ** 62
+
+def fmt(valor):
+    try:
+        return f"{int(valor):,}".replace(",", ".")
+    except:
+        return "0"
+
+def _es_dataframe(filas):
+    # Si pandas no se importó todavía, `filas` no puede ser un DataFrame
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(filas, pd.DataFrame)
+
+def _columnas(filas):
+    """(Pag, Prod, Cant, Cat_U, List_U) de `filas`; las enteras como arreglos int64"""
+    if _es_dataframe(filas):
+        return (
+            filas["Pag"].astype(str).to_numpy(), filas["Prod"].astype(str).to_numpy(),
+            filas["Cant"].to_numpy(dtype=np.int64), filas["Cat_U"].to_numpy(dtype=np.int64),
+            filas["List_U"].to_numpy(dtype=np.int64),
+        )
+    # Vistas de las columnas int64, sin copiar (las operaciones de abajo crean arreglos nuevos)
+    lineas = LineasFactura.desde(filas)
+    return (lineas.pag, lineas.prod) + tuple(lineas.columna(c) for c in ("Cant", "Cat_U", "List_U"))
+
+def _productos(cant, cat_u, list_u):
+    # Enteros exactos: si los valores pudieran desbordar int64 se usan enteros de Python
+    maximo = max(int(np.abs(cat_u).max(initial=0)), int(np.abs(list_u).max(initial=0)))
+    if int(np.abs(cant).max(initial=0)) * maximo * max(len(cant), 1) >= _LIMITE_INT64:
+        cant, cat_u, list_u = (a.astype(object) for a in (cant, cat_u, list_u))
+    t_cat = cant * cat_u
+    t_list = cant * list_u
+    return cant, cat_u, list_u, t_cat, t_list, t_cat - t_list
+
+def totales_por_fila(filas):
+    """(T_Cat, T_List, Gan) por fila como arreglos, sin pasar por pandas"""
+    _, _, cant, cat_u, list_u = _columnas(filas)
+    return totales_columnas(cant, cat_u, list_u)
+
+def totales_columnas(cant, cat_u, list_u):
+    """(T_Cat, T_List, Gan) desde las columnas enteras ya armadas"""
+    return _productos(cant, cat_u, list_u)[3:]
+
+def sumar_totales(filas):
+    """Totales de la factura {"T_Cat", "T_List", "Gan"} sin armar el DataFrame"""
+    t_cat, t_list, gan = totales_por_fila(filas)
+    return {"T_Cat": int(t_cat.sum()), "T_List": int(t_list.sum()), "Gan": int(gan.sum())}
+
+def calcular_totales(filas):
+    """Calcula T_Cat, T_List y Gan por fila y los totales de la factura.
+
+    `filas` son las `LineasFactura` de `st.session_state.datos`, una lista
+    de diccionarios o un DataFrame con las mismas columnas. Devuelve (DataFrame, totales) donde
+    totales = {"T_Cat": int, "T_List": int, "Gan": int}.
+    """
+    import pandas as pd
+
+    pag, prod, cant, cat_u, list_u = _columnas(filas)
+    cant, cat_u, list_u, t_cat, t_list, gan = _productos(cant, cat_u, list_u)
+
+    df = pd.DataFrame({
+        "Pag": pag, "Prod": prod,
+        "Cant": cant.copy(), "Cat_U": cat_u.copy(), "List_U": list_u.copy(),
+        "T_Cat": t_cat, "T_List": t_list, "Gan": gan,
+    })
+    totales = {"T_Cat": int(t_cat.sum()), "T_List": int(t_list.sum()), "Gan": int(gan.sum())}
+    return df, totales
+
+# --- TOTALES INCREMENTALES ---
+# La interfaz no vuelve a sumar todas las filas en cada rerun: cada factura
+# guarda sus totales y cada edición (cambiar una celda, agregar, borrar o
+# limpiar filas) los ajusta restando el aporte viejo y sumando el nuevo.
+
+def aporte(fila):
+    """(T_Cat, T_List, línea válida) con que una fila contribuye a la factura"""
+    cant = int(fila.get("Cant", 1) or 0)
+    return (
+        cant * int(fila.get("Cat_U", 0) or 0),
+        cant * int(fila.get("List_U", 0) or 0),
+        int(str(fila.get("Prod", "")).strip() != ""),
+    )
+
+class AcumuladoTotales:
+    """Totales de una factura mantenidos por diferencias: cada edición cuesta O(1)"""
+
+    __slots__ = ("t_cat", "t_list", "lineas")
+
+    def __init__(self, t_cat=0, t_list=0, lineas=0):
+        self.t_cat = t_cat
+        self.t_list = t_list
+        self.lineas = lineas
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Cálculo completo (una sola vez por factura) con el motor columnar"""
+        filas = LineasFactura.desde(filas)
+        totales = sumar_totales(filas)
+        return cls(totales["T_Cat"], totales["T_List"], filas.contar_validas())
+
+    def sumar(self, fila, signo=1):
+        t_cat, t_list, valida = aporte(fila)
+        self.t_cat += signo * t_cat
+        self.t_list += signo * t_list
+        self.lineas += signo * valida
+
+    def restar(self, fila):
+        self.sumar(fila, -1)
+
+    def cambiar(self, lineas, i, campo, valor):
+        """Asigna `valor` al `campo` de la línea `i` ajustando los totales"""
+        self.restar(lineas.fila(i))
+        lineas.asignar(i, campo, valor)
+        self.sumar(lineas.fila(i))
+
+    def totales(self):
+        return {"T_Cat": self.t_cat, "T_List": self.t_list, "Gan": self.t_cat - self.t_list}
+
+    def coincide(self, filas):
+        """Compara contra un cálculo completo (verificación en modo depuración)"""
+        otro = AcumuladoTotales.desde_filas(filas)
+        return (self.t_cat, self.t_list, self.lineas) == (otro.t_cat, otro.t_list, otro.lineas)
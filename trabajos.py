@@ -0,0 +1,170 @@
+from collections import OrderedDict
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lineas import filas_validas
+from perfil import activo, ejecutar_medido, registrar_muestras
+
+# --- COLA DE RENDERIZADO EN SEGUNDO PLANO ---
+# Los PDFs se generan en un pool de procesos compartido por todas las sesiones:
+# el hilo de Streamlit solo encola el trabajo y sigue respondiendo, y la página
+# consulta el estado hasta que el PDF queda en la caché de renderizado. Cada
+# proceso escribe su PDF página a página en un archivo temporal, que pasa a la
+# caché sin viajar por la tubería del pool.
+#
+# trabajo = {
+#     "id": int, "clave": str (contenido), "clave_pdf": str (en la caché), "cliente": str,
+#     "estado": PENDIENTE | LISTO | ERROR,
+#     "simplificada": bool, "error": str | None, "creado": float, "segundos": float | None,
+# }
+
+PENDIENTE = "pendiente"
+LISTO = "listo"
+ERROR = "error"
+
+# Trabajos terminados que se recuerdan (los más viejos se olvidan primero)
+MAX_TRABAJOS = 1000
+
+def _preparar_proceso():
+    # Cada proceso del pool carga el renderizador y las fuentes antes de su primer trabajo
+    from factura_pdf import precalentar
+
+    precalentar()
+
+# Sin fork: el pool se crea desde un hilo de Streamlit y un proceso copiado con fork
+# heredaría los locks que otros hilos tuvieran tomados en ese momento.
+# forkserver donde existe (Linux, macOS); spawn en el resto. Sin fork cada proceso
+# nuevo vuelve a ejecutar `__main__` si es un script: app.py se declara módulo
+# `__main__` (ver el principio de app.py) para que sus procesos no lo repitan.
+CONTEXTO_PROCESOS = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+class ColaTrabajos:
+    """Encola renderizados en un pool de procesos y guarda los PDFs en una `CacheRender`"""
+
+    def __init__(self, cache, procesos=None, max_trabajos=MAX_TRABAJOS):
+        self.cache = cache
+        self.max_trabajos = max_trabajos
+        self._pool = ProcessPoolExecutor(max_workers=procesos or os.cpu_count() or 1, mp_context=CONTEXTO_PROCESOS,
+                                         initializer=_preparar_proceso)
+        # Arranca el pool ya: el primer PDF no paga el inicio del proceso
+        self._pool.submit(int)
+        self._trabajos = OrderedDict()
+        self._por_clave = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._directorio = tempfile.mkdtemp(prefix="facturas_pdf_")
+
+    def enviar(self, clave, cliente, fecha, filas, marca):
+        """Encola el PDF de una factura y devuelve el id del trabajo.
+
+        Si el mismo contenido ya se está generando se reutiliza ese trabajo, y
+        si ya está en la caché el trabajo nace terminado.
+        """
+        with self._lock:
+            previo = self._trabajos.get(self._por_clave.get(clave))
+            if previo is not None and previo["estado"] == PENDIENTE:
+                return previo["id"]
+            trabajo = {
+                "id": next(self._ids), "clave": clave, "clave_pdf": clave, "cliente": cliente, "estado": PENDIENTE,
+                "simplificada": False, "error": None, "creado": time.time(), "segundos": None,
+            }
+            self._registrar(trabajo)
+        if clave in self.cache:
+            self._terminar(trabajo, LISTO)
+            return trabajo["id"]
+
+        # El renderizador (fpdf, fuentes) se carga recién con el primer PDF
+        from factura_pdf import renderizar_en_archivo
+
+        # Copia de las filas (columnas nuevas): la sesión las sigue editando mientras el trabajo espera
+        filas = filas_validas(filas)
+        # Con la instrumentación encendida el proceso devuelve también sus tramos
+        medido = activo()
+        ruta = os.path.join(self._directorio, f"{trabajo['id']}.pdf")
+        try:
+            if medido:
+                futuro = self._pool.submit(ejecutar_medido, renderizar_en_archivo, ruta, cliente, fecha, filas, marca)
+            else:
+                futuro = self._pool.submit(renderizar_en_archivo, ruta, cliente, fecha, filas, marca)
+        except Exception as e:
+            self._terminar(trabajo, ERROR, error=str(e) or type(e).__name__)
+            return trabajo["id"]
+        futuro.add_done_callback(lambda f: self._recibir(trabajo, ruta, f, medido))
+        return trabajo["id"]
+
+    def _registrar(self, trabajo):
+        self._trabajos[trabajo["id"]] = trabajo
+        self._por_clave[trabajo["clave"]] = trabajo["id"]
+        while len(self._trabajos) > self.max_trabajos:
+            _, viejo = self._trabajos.popitem(last=False)
+            if self._por_clave.get(viejo["clave"]) == viejo["id"]:
+                del self._por_clave[viejo["clave"]]
+
+    def _recibir(self, trabajo, ruta, futuro, medido=False):
+        try:
+            if medido:
+                resultado, muestras = futuro.result()
+                registrar_muestras(muestras)
+            else:
+                resultado = futuro.result()
+            escritos, simplificada, error = resultado
+        except Exception as e:
+            escritos, simplificada, error = None, False, str(e) or type(e).__name__
+        if escritos is None:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+            self._terminar(trabajo, ERROR, error=error)
+            return
+        # Las versiones simplificadas se guardan con su propia clave para no
+        # confundirlas con el PDF completo del mismo contenido
+        clave = trabajo["clave"] + ":simplificada" if simplificada else trabajo["clave"]
+        self.cache.guardar_archivo(clave, ruta)
+        self._terminar(trabajo, LISTO, clave_pdf=clave, simplificada=simplificada, error=error)
+
+    def _terminar(self, trabajo, estado, **cambios):
+        with self._lock:
+            trabajo.update(estado=estado, segundos=time.time() - trabajo["creado"], **cambios)
+
+    def estado(self, trabajo_id):
+        """Copia del trabajo, o None si ya se olvidó"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return dict(trabajo) if trabajo else None
+
+    def disponible(self, trabajo_id):
+        """Si el PDF de un trabajo terminado sigue en la caché"""
+        trabajo = self.estado(trabajo_id)
+        return trabajo is not None and trabajo["estado"] == LISTO and trabajo["clave_pdf"] in self.cache
+
+    def resultado(self, trabajo_id):
+        """Bytes del PDF de un trabajo terminado, o None si no está (o salió de la caché)"""
+        trabajo = self.estado(trabajo_id)
+        if trabajo is None or trabajo["estado"] != LISTO:
+            return None
+        return self.cache.obtener(trabajo["clave_pdf"])
+
+    def archivo(self, trabajo_id):
+        """Como `resultado`, pero devuelve el archivo abierto para leerlo (o servirlo) sin copiarlo a memoria"""
+        trabajo = self.estado(trabajo_id)
+        if trabajo is None or trabajo["estado"] != LISTO:
+            return None
+        return self.cache.abrir(trabajo["clave_pdf"])
+
+    def pendientes(self):
+        with self._lock:
+            return sum(1 for t in self._trabajos.values() if t["estado"] == PENDIENTE)
+
+    def cerrar(self):
+        """Cancela lo pendiente y espera a que terminen los procesos del pool"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self._directorio, ignore_errors=True)